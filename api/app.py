@@ -1,12 +1,10 @@
-import json
 import os
 import traceback
 from datetime import datetime, timedelta, timezone
 
 import click
-import sqlalchemy as sqla
 from celery import Celery
-from flask import Blueprint, Flask, Response, jsonify, make_response
+from flask import Blueprint, Flask, Response, g, jsonify, make_response
 from flask.cli import AppGroup
 from flask_compress import Compress
 from flask_cors import CORS
@@ -21,6 +19,10 @@ from marshmallow.exceptions import ValidationError
 from werkzeug.exceptions import HTTPException
 from werkzeug.middleware.profiler import ProfilerMiddleware
 
+from api.util.cache import (BoardSnapshotCache, IdentityCache,
+                            PermissionCache, RevocationStore)
+from api.util.json_provider import init_json_provider
+from api.util.password import PasswordHasher
 from config import Config
 
 # TODO: investigate if disabling autoflush has a performance impact
@@ -32,11 +34,17 @@ mail = Mail()
 compress = Compress()
 socketio = SocketIO()
 celery = Celery(__name__)
+board_cache = BoardSnapshotCache()
+permission_cache = PermissionCache()
+revocation_store = RevocationStore()
+identity_cache = IdentityCache()
+password_hasher = PasswordHasher()
 
 
 def create_app() -> Flask:
     app = Flask(__name__)
     app.config.from_object(Config)
+    init_json_provider(app)
 
     if app.config["PROFILER_ENABLED"]:
         app.wsgi_app = ProfilerMiddleware(
@@ -59,6 +67,22 @@ def create_app() -> Flask:
     jwt.init_app(app)
 
     mail.init_app(app)
+    board_cache.init_app(app)
+    permission_cache.init_app(app)
+    revocation_store.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+
+    # Track board changes for the snapshot cache and change journal
+    from api.util import revision
+    # Ranks new lists, cards and checklist items
+    from api.util import rank
+
+    # Board members and permissions resolved once per request
+    from api.util.permission import permission_resolver
+    permission_resolver.init_app(app)
+    from api.util.login_history import login_history
+    login_history.init_app(app)
 
     # Create the API base blueprint
     api_bp = Blueprint("api_bp", __name__, url_prefix="/api/v1",
@@ -93,31 +117,28 @@ def create_app() -> Flask:
     def user_identity_lookup(user):
         return user.id
 
+    # Cached identity and revocation lookups, no queries on the common path
+    from api.util import identity
+
     @jwt.user_lookup_loader
     def user_lookup_callback(_jwt_header, jwt_data):
-        return user.User.query.filter(
-            user.User.id == jwt_data["sub"]).one_or_none()
+        return identity.load_user(jwt_data["sub"])
 
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload: dict) -> bool:
-        token = db.session.query(
-            user.Token.id
-        ).filter(
-            sqla.and_(
-                user.Token.jti == jwt_payload["jti"],
-                user.Token.revoked == True
-            )
-        ).scalar()
-        return token is not None
+        return revocation_store.is_revoked(
+            jwt_payload["jti"], user.Token.is_revoked)
 
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
+        g.skip_jwt_refresh = True
         resp = make_response(jsonify({"message": "Token revoked"}), 401)
         unset_jwt_cookies(resp)
         return resp
 
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
+        g.skip_jwt_refresh = True
         resp = make_response(jsonify({"message": "Token expired"}), 401)
         unset_jwt_cookies(resp)
         return resp
@@ -142,14 +163,19 @@ def create_app() -> Flask:
             )
             db.session.add(usr)
         db.session.commit()
+        # Only a fingerprint lookup unless permissions changed, run
+        # "flask check_permissions" on deploy to update roles up front.
         check_permission_integrity()
+        if revocation_store.needs_sync():
+            revocation_store.sync(user.Token.revoked_jtis())
 
     @app.after_request
     def refresh_expiring_jwts(response):
+        # Decided from request state only, the response body is never read
+        # (streamed and large responses pass through untouched).
+        if g.get("skip_jwt_refresh"):
+            return response
         try:
-            # FIXME: Very hacky way to handle logout.
-            if "Token revoked" in str(response.get_data()) or "Token expired" in str(response.get_data()):
-                return response
             exp_timestamp = get_jwt()["exp"]
             now = datetime.now(timezone.utc)
             target_timestamp = datetime.timestamp(now + timedelta(minutes=30))
@@ -164,7 +190,7 @@ def create_app() -> Flask:
     def handle_validation_exception(e):
         return Response(
             status=400,
-            response=json.dumps(
+            response=app.json.dumps(
                 {
                     "message": "validation_error",
                     "errors": e.messages
@@ -177,7 +203,7 @@ def create_app() -> Flask:
     def handle_http_exception(e):
         return Response(
             status=e.code,
-            response=json.dumps(
+            response=app.json.dumps(
                 {
                     "code": e.code,
                     "message": e.description,
@@ -192,7 +218,7 @@ def create_app() -> Flask:
             app.logger.exception(traceback.format_exc())
             return Response(
                 status=500,
-                response=json.dumps({
+                response=app.json.dumps({
                     'message': 'internal_server_error',
                     'exception': str(e),
                     'traceback': traceback.format_exc(),
@@ -248,8 +274,7 @@ def create_app() -> Flask:
 
         for _ in range(0, int(count)):
             db.session.add(create_card(usr, boardlist))
-            # Needs commiting every iteration because of position handling!
-            db.session.commit()
+        db.session.commit()
 
     @factory_cli.command("comment")
     @click.argument("userid")
@@ -271,9 +296,56 @@ def create_app() -> Flask:
         db.session.commit()
 
     @app.cli.command("check_permissions")
-    def check_permissions():
+    @click.option("--force", is_flag=True,
+                  help="Check even if permissions not changed.")
+    def check_permissions(force: bool):
         from api.model.board import check_permission_integrity
-        check_permission_integrity()
+        if check_permission_integrity(force):
+            click.echo("Board role permissions updated.")
+        else:
+            click.echo("Board role permissions up to date.")
+
+    @app.cli.command("sync_revoked_tokens")
+    def sync_revoked_tokens():
+        from api.model.user import Token
+        jtis = Token.revoked_jtis()
+        revocation_store.sync(jtis)
+        click.echo(f"Synced {len(jtis)} revoked tokens.")
+
+    @app.cli.command("prune_tokens")
+    @click.option("--batch-size", type=int, default=None,
+                  help="Rows per batch, defaults to TOKEN_PRUNE_BATCH_SIZE.")
+    def prune_tokens(batch_size: int):
+        from api.model.user import Token
+        deleted = Token.prune_expired(
+            batch_size or app.config["TOKEN_PRUNE_BATCH_SIZE"])
+        click.echo(f"Deleted {deleted} expired tokens.")
+
+    @app.cli.command("recount_cards")
+    @click.option("--board-id", type=int, default=None)
+    def recount_cards(board_id: int):
+        from api.service.card import card_service
+        updated = card_service.recount_counters(board_id)
+        click.echo(f"Recounted {updated} cards.")
+
+    @app.cli.command("recount_lists")
+    @click.option("--board-id", type=int, default=None)
+    def recount_lists(board_id: int):
+        from api.service.list import list_service
+        updated = list_service.recount_cards(board_id)
+        click.echo(f"Recounted {updated} lists.")
+
+    @app.cli.command("prune_board_changes")
+    @click.option("--days", type=int, default=None,
+                  help="Days to keep, defaults to BOARD_CHANGES_RETENTION_DAYS.")
+    def prune_board_changes(days: int):
+        from api.model.board import BoardChange
+        days = days if days is not None else app.config["BOARD_CHANGES_RETENTION_DAYS"]
+        deleted = BoardChange.query.filter(
+            BoardChange.created_on < datetime.utcnow() - timedelta(days=days)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        click.echo(f"Deleted {deleted} board changes.")
 
     app.cli.add_command(factory_cli)
 
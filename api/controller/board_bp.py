@@ -8,6 +8,8 @@ from webargs.flaskparser import use_args
 
 from api.service.board import board_service, member_man_service
 from api.util.dto import BoardDTO, CardDTO
+from api.util.etag import board_revision_etag
+from api.util.json_provider import stream_json_array
 
 board_bp = Blueprint("board_bp", __name__)
 
@@ -17,10 +19,10 @@ class BoardsAPI(MethodView):
 
     @use_args(BoardDTO.board_query_schema, location="query")
     def get(self, args: dict):
-        return jsonify(BoardDTO.boards_schema.dump(
+        return stream_json_array(
             board_service.get_user_boards(current_user, args),
-            many=True
-        ))
+            BoardDTO.boards_schema.dump
+        )
 
     def post(self):
         return BoardDTO.board_schema.dump(
@@ -34,10 +36,11 @@ class BoardsAPI(MethodView):
 class BoardAPI(MethodView):
     decorators = [jwt_required()]
 
-    def get(self, board_id: int):
-        return BoardDTO.board_schema.dump(
-            board_service.get(current_user, board_id)
-        )
+    @board_revision_etag
+    @use_args(BoardDTO.fieldset_query_schema, location="query")
+    def get(self, args: dict, board_id: int):
+        return board_service.get_snapshot(
+            current_user, board_id, args["fieldset"]).to_response()
 
     def patch(self, board_id: int):
         return BoardDTO.board_schema.dump(
@@ -53,6 +56,30 @@ class BoardAPI(MethodView):
         return {"message": "Board deleted"}
 
 
+class BoardChangesAPI(MethodView):
+    decorators = [jwt_required()]
+
+    @use_args(BoardDTO.change_query_schema, location="query")
+    def get(self, args: dict, board_id: int):
+        """
+        Gets board changes since a revision, or full board
+        if the changes can't be served.
+        """
+        board, changes = board_service.get_changes(
+            current_user, board_id, args["since"])
+        if changes is None:
+            return {
+                "revision": board.revision,
+                "changes": None,
+                "snapshot": BoardDTO.board_schema.dump(board),
+            }
+        return {
+            "revision": board.revision,
+            "changes": BoardDTO.change_schema.dump(changes, many=True),
+            "snapshot": None,
+        }
+
+
 class RevertBoardAPI(MethodView):
     decorators = [jwt_required()]
 
@@ -168,7 +195,9 @@ class BoardActvityAPI(MethodView):
         """
         Gets BoardActvity.
         """
-        return CardDTO.activity_paginated_schema.dump(
+        return CardDTO.activity_paginated_schema.variant(
+            args["fieldset"], prefix="data"
+        ).dump(
             board_service.get_board_activities(current_user, board_id, args)
         )
 
@@ -176,6 +205,7 @@ class BoardActvityAPI(MethodView):
 class ArchivedListsAPI(MethodView):
     decorators = [jwt_required()]
 
+    @board_revision_etag
     def get(self, board_id: int):
         """
         Gets ArchivedEntities.
@@ -189,14 +219,15 @@ class ArchivedListsAPI(MethodView):
 class ArchivedCardsAPI(MethodView):
     decorators = [jwt_required()]
 
+    @board_revision_etag
     def get(self, board_id: int):
         """
         Gets ArchivedCards.
         """
-        return jsonify(BoardDTO.archived_cards_schema.dump(
-            board_service.get_archived_cards(
-                current_user, board_id,
-            ), many=True))
+        return stream_json_array(
+            board_service.get_archived_cards(current_user, board_id),
+            BoardDTO.archived_cards_schema.dump
+        )
 
 
 boards_view = BoardsAPI.as_view("boards-view")
@@ -211,6 +242,7 @@ board_member_activate_view = BoardMemberActivateAPI.as_view(
     "board-member-activate-view")
 board_actvitiy_view = BoardActvityAPI.as_view("boardactvity-view")
 
+board_changes_view = BoardChangesAPI.as_view("board-changes-view")
 archivedlists_view = ArchivedListsAPI.as_view("archivedlists-view")
 archivedcards_view = ArchivedCardsAPI.as_view("archivedcards-view")
 
@@ -243,6 +275,8 @@ board_bp.add_url_rule("/board/member/<member_id>/activate",
                       methods=["POST"], view_func=board_member_activate_view)
 board_bp.add_url_rule("/board/<board_id>/activities",
                       methods=["GET"], view_func=board_actvitiy_view)
+board_bp.add_url_rule("/board/<board_id>/changes",
+                      view_func=board_changes_view, methods=["GET"])
 board_bp.add_url_rule("/board/<board_id>/archived-lists",
                       view_func=archivedlists_view, methods=["GET"])
 board_bp.add_url_rule("/board/<board_id>/archived-cards",
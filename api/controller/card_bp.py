@@ -18,7 +18,7 @@ class CardAPI(MethodView):
 
     @use_args(CardDTO.query_schema, location="query")
     def get(self, args, card_id: int):
-        return CardDTO.card_schema.dump(
+        return CardDTO.card_schema.variant(args["fieldset"]).dump(
             card_service.get(current_user, card_id, args)
         )
 
@@ -41,12 +41,25 @@ class CardAPI(MethodView):
         return {"message": "Card deleted."}
 
 
+class CardMoveAPI(MethodView):
+    decorators = [jwt_required()]
+
+    def post(self, card_id: int):
+        return CardDTO.update_card_schema.dump(card_service.move(
+            current_user,
+            card_id,
+            CardDTO.move_schema.load(request.json)
+        ))
+
+
 class CardActivityAPI(MethodView):
     decorators = [jwt_required(), use_args(
         CardDTO.activity_schema_query, location="query")]
 
     def get(self, args, card_id: int):
-        return CardDTO.activity_paginated_schema.dump(
+        return CardDTO.activity_paginated_schema.variant(
+            args["fieldset"], prefix="data"
+        ).dump(
             card_service.get_activities(
                 current_user,
                 card_id,
@@ -159,6 +172,7 @@ class CardFileUploadAPI(MethodView):
 
 
 card_view = CardAPI.as_view("card-view")
+card_move_view = CardMoveAPI.as_view("card-move-view")
 card_activity_view = CardActivityAPI.as_view("card-activity-view")
 card_comment_view = CardCommentAPI.as_view("card-comment-view")
 card_assign_member_view = CardAssignMemberAPI.as_view(
@@ -173,6 +187,9 @@ card_bp.add_url_rule("/card/<card_id>", view_func=card_view,
 card_bp.add_url_rule("/list/<list_id>/card",
                      view_func=card_view, methods=["POST"])
 
+card_bp.add_url_rule("/card/<card_id>/move",
+                     view_func=card_move_view, methods=["POST"])
+
 card_bp.add_url_rule("/card/<card_id>/activities",
                      view_func=card_activity_view, methods=["GET"])
 
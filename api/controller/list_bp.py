@@ -1,9 +1,11 @@
 from flask import request, Blueprint
 from flask.views import MethodView
 from flask_jwt_extended import current_user, jwt_required
+from webargs.flaskparser import use_args
 
 from api.service.list import list_service
 from api.util.dto import ListDTO
+from api.util.etag import board_revision_etag
 
 list_bp = Blueprint("list_bp", __name__)
 
@@ -11,9 +13,12 @@ list_bp = Blueprint("list_bp", __name__)
 class ListAPI(MethodView):
     decorators = [jwt_required()]
 
-    def get(self, board_id: int):
-        return ListDTO.lists_schema.dump(
-            list_service.get(current_user, board_id), many=True
+    @board_revision_etag
+    @use_args(ListDTO.fieldset_query_schema, location="query")
+    def get(self, args: dict, board_id: int):
+        return ListDTO.lists_schema.variant(args["fieldset"]).dump(
+            list_service.get(current_user, board_id, args["fieldset"]),
+            many=True
         )
 
     def post(self, board_id: int):
@@ -33,6 +38,16 @@ class ListAPI(MethodView):
         return {"message": "List deleted."}
 
 
+class ListCardsAPI(MethodView):
+    decorators = [jwt_required()]
+
+    @use_args(ListDTO.cards_query_schema, location="query")
+    def get(self, args: dict, list_id: int):
+        return ListDTO.cards_page_schema.variant(
+            args["fieldset"], prefix="data"
+        ).dump(list_service.get_cards(current_user, list_id, args))
+
+
 class ListCardOrderAPI(MethodView):
     decorators = [jwt_required()]
 
@@ -42,11 +57,14 @@ class ListCardOrderAPI(MethodView):
 
 
 list_view = ListAPI.as_view("list-view")
+list_cards_view = ListCardsAPI.as_view("list-cards-view")
 list_card_order_view = ListCardOrderAPI.as_view("list-card-order-view")
 
 list_bp.add_url_rule("/board/<board_id>/list",
                      methods=["GET", "POST"], view_func=list_view)
 list_bp.add_url_rule("/list/<list_id>",
                      methods=["PATCH", "DELETE"], view_func=list_view)
+list_bp.add_url_rule("/list/<list_id>/cards",
+                     methods=["GET"], view_func=list_cards_view)
 list_bp.add_url_rule("/list/<list_id>/cards-order",
                      methods=["PATCH"], view_func=list_card_order_view)
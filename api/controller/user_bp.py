@@ -1,5 +1,4 @@
-from datetime import datetime
-from flask import Blueprint, request, current_app, make_response, jsonify, abort, render_template
+from flask import Blueprint, request, current_app, make_response, jsonify, abort, render_template, g
 from flask.views import MethodView
 from flask_jwt_extended import (
     create_access_token, jwt_required,
@@ -12,6 +11,8 @@ from datetime import timedelta
 import sqlalchemy as sqla
 from api.app import db
 from api.util.dto import UserDTO
+from api.util.json_provider import stream_json_array
+from api.util.login_history import login_history
 from api.model.user import User, Token
 from api.task_queue.sendmail import send_mail
 
@@ -62,21 +63,12 @@ class LoginAPI(MethodView):
         # Add tokens to db
         db.session.add_all(
             [
-                Token(
-                    user_id=usr.id,
-                    jti=access_token_decoded["jti"],
-                    type=access_token_decoded["type"],
-                    created_at=datetime.now()
-                ),
-                Token(
-                    user_id=usr.id,
-                    jti=refresh_token_decoded["jti"],
-                    type=refresh_token_decoded["type"],
-                    created_at=datetime.now()
-                ),
+                Token.from_decoded(usr.id, access_token_decoded),
+                Token.from_decoded(usr.id, refresh_token_decoded),
             ]
         )
-        usr.update_login_history(request.remote_addr)
+        login_history.record(usr, request.remote_addr)
+        db.session.commit()
 
         # Create response and set cookies
         resp = make_response(
@@ -132,14 +124,7 @@ class ForgotPasswordAPI(MethodView):
             expires_delta=current_app.config["RESET_PASSWORD_TOKEN_EXPIRES"]
         )
         reset_token_decoded = decode_token(reset_token)
-        db.session.add(
-            Token(
-                user_id=usr.id,
-                jti=reset_token_decoded["jti"],
-                type=reset_token_decoded["type"],
-                created_at=datetime.now()
-            )
-        )
+        db.session.add(Token.from_decoded(usr.id, reset_token_decoded))
         db.session.commit()
         send_mail.delay(
             current_app.config["MAIL_DEFAULT_SENDER"],
@@ -190,9 +175,7 @@ class ResetPasswordAPI(MethodView):
         usr = User.query.get(decoded_token["sub"])
         usr.update(password=request.form["newPassword"])
 
-        Token.query.filter(
-            Token.jti == decoded_token["jti"]
-        ).update({"revoked": True})
+        Token.revoke_token(decoded_token)
         # db.session.add(
         #     Token(
         #         jti=decoded_token["jti"],
@@ -231,7 +214,10 @@ class UserAPI(MethodView):
             elif current_user.has_role("admin"):
                 return UserDTO.user_schema.dump(User.get_or_404(id))
         else:
-            return UserDTO.guest_user_schema.dump(User.query.all(), many=True)
+            return stream_json_array(
+                User.query.order_by(User.id).yield_per(100),
+                UserDTO.guest_user_schema.dump
+            )
 
     def patch(self, id: int):
         """
@@ -263,6 +249,7 @@ class UserAPI(MethodView):
         if current_user.id == int(id):
             current_user.archived = True
             Token.revoke_all_tokens_for_user(current_user.id)
+            g.skip_jwt_refresh = True
             db.session.commit()
             return {}
         elif not current_user.has_role("admin"):
@@ -288,6 +275,8 @@ class LogoutAPI(MethodView):
         """
         # Can apply to Access token and refresh token too!
         Token.revoke_token(get_jwt())
+        # Don't hand out a refreshed token with the logout response.
+        g.skip_jwt_refresh = True
 
         response = jsonify({"message": "Token revoked"})
         unset_jwt_cookies(response)
@@ -334,6 +323,8 @@ user_bp.add_url_rule("/login", view_func=login_view, methods=["POST"])
 user_bp.add_url_rule("/register", view_func=register_view, methods=["POST"])
 user_bp.add_url_rule("/forgot-password",
                      view_func=forgotpassword_view, methods=["POST"])
+user_bp.add_url_rule("/users", view_func=user_view,
+                     defaults={"id": None}, methods=["GET"])
 user_bp.add_url_rule("/users/<id>", view_func=user_view,
                      methods=["GET", "PATCH", "DELETE"])
 user_bp.add_url_rule("/logout", view_func=logout_view, methods=["POST"])
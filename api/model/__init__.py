@@ -1,7 +1,14 @@
 import enum
+import hashlib
 
+import sqlalchemy as sqla
 from werkzeug.exceptions import NotFound
 
+# Type of rank columns (api.util.rank), compared bytewise on PostgreSQL
+# whatever the database locale is.
+RankType = sqla.String(64).with_variant(
+    sqla.String(64, collation="C"), "postgresql")
+
 
 class BaseMixin(object):
 
@@ -41,6 +48,44 @@ class BoardPermission(enum.Enum):
     FILE_UPLOAD = "file.upload"
     FILE_DELETE = "file.delete"
 
+    @property
+    def mask(self) -> int:
+        """Bit of the permission in BoardRole.permission_mask"""
+        return 1 << PERMISSION_BITS[self]
+
+
+# Bit positions of permissions in BoardRole.permission_mask. Stored in the
+# database, never reuse or change a bit, only append new ones.
+PERMISSION_BITS = {
+    BoardPermission.CARD_EDIT: 0,
+    BoardPermission.CARD_COMMENT: 1,
+    BoardPermission.CARD_DELETE: 2,
+    BoardPermission.CARD_ASSIGN_MEMBER: 3,
+    BoardPermission.CARD_DEASSIGN_MEMBER: 4,
+    BoardPermission.CARD_ADD_DATE: 5,
+    BoardPermission.CARD_EDIT_DATE: 6,
+    BoardPermission.LIST_CREATE: 7,
+    BoardPermission.LIST_EDIT: 8,
+    BoardPermission.LIST_DELETE: 9,
+    BoardPermission.BOARD_UPDATE: 10,
+    BoardPermission.CHECKLIST_CREATE: 11,
+    BoardPermission.CHECKLIST_EDIT: 12,
+    BoardPermission.CHECKLIST_ITEM_MARK: 13,
+    BoardPermission.FILE_DOWNLOAD: 14,
+    BoardPermission.FILE_UPLOAD: 15,
+    BoardPermission.FILE_DELETE: 16,
+}
+# Mask with every permission allowed.
+ALL_PERMISSIONS_MASK = sum(permission.mask for permission in BoardPermission)
+
+
+def permission_fingerprint() -> str:
+    """Fingerprint of permission names and bits, changes when
+    a permission is added, removed or renamed."""
+    return hashlib.sha1(",".join(sorted(
+        f"{permission.value}:{bit}" for permission, bit in PERMISSION_BITS.items()
+    )).encode()).hexdigest()
+
 
 class BoardActivityEvent(enum.Enum):
     BOARD_CREATE = "board.create"
@@ -62,6 +107,14 @@ class BoardActivityEvent(enum.Enum):
     LIST_DELETE = "list.delete"
 
 
+class BoardChangeOperation(enum.Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+    # Change can't be described per entity, client has to reload the board.
+    RESET = "reset"
+
+
 class CardActivityEvent(enum.Enum):
     CARD_ASSIGN_TO_LIST = "card.create"
     CARD_MOVE_TO_LIST = "card.move"
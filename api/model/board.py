@@ -1,22 +1,15 @@
 import typing
+from datetime import datetime
+
 import sqlalchemy as sqla
 import sqlalchemy.orm as sqla_orm
 
-from api.app import db
-from . import BaseMixin, BoardPermission
+from api.app import db, permission_cache
+from . import (ALL_PERMISSIONS_MASK, BaseMixin, BoardPermission,
+               permission_fingerprint)
 from werkzeug.exceptions import NotFound, Forbidden
 
 
-class BoardRolePermission(db.Model, BaseMixin):
-    __tablename__ = "board_role_permission"
-
-    id = sqla.Column(sqla.Integer, primary_key=True)
-    board_role_id = sqla.Column(sqla.Integer, sqla.ForeignKey("board_role.id"))
-
-    name = sqla.Column(sqla.String, nullable=False)
-    allow = sqla.Column(sqla.Boolean, nullable=False, default=True)
-
-
 class BoardRole(db.Model, BaseMixin):
     __tablename__ = "board_role"
     id = sqla.Column(sqla.Integer, primary_key=True)
@@ -25,9 +18,12 @@ class BoardRole(db.Model, BaseMixin):
 
     name = sqla.Column(sqla.String, nullable=False)
     is_admin = sqla.Column(sqla.Boolean, default=False, nullable=False)
+    # Allowed permissions, bits of BoardPermission.mask
+    permission_mask = sqla.Column(
+        sqla.BigInteger, server_default="0", default=0, nullable=False)
 
-    permissions = sqla_orm.relationship(
-        "BoardRolePermission", cascade="all, delete-orphan")
+    def has_permission(self, permission: BoardPermission) -> bool:
+        return bool(self.permission_mask & permission.mask)
 
     @classmethod
     def get_board_role_or_404(cls, board_id: int, role_id: int):
@@ -88,13 +84,7 @@ class BoardAllowedUser(db.Model, BaseMixin):
     def has_permission(self, permission: BoardPermission):
         if self.is_deleted:
             return False
-        m = BoardRolePermission.query.filter(
-            sqla.and_(
-                BoardRolePermission.board_role_id == self.board_role_id,
-                BoardRolePermission.name == permission.value
-            )
-        ).first()
-        return m.allow if m else False
+        return self.role.has_permission(permission)
 
     assigned_cards = sqla_orm.relationship(
         "CardMember", back_populates="board_user",
@@ -121,6 +111,12 @@ class Board(db.Model, BaseMixin):
     archived = sqla.Column(sqla.Boolean, server_default="0",
                            default=False, nullable=False)
     archived_on = sqla.Column(sqla.DateTime)
+    # Incremented by every transaction which changes board content.
+    revision = sqla.Column(sqla.Integer, server_default="0",
+                           default=0, nullable=False)
+    # Positions allocated to lists, see api.util.rank.allocate_positions
+    list_seq = sqla.Column(sqla.Integer, server_default="0",
+                           default=0, nullable=False)
 
     board_users = sqla_orm.relationship(
         "BoardAllowedUser",
@@ -164,6 +160,22 @@ class Board(db.Model, BaseMixin):
             )
         )
 
+    @classmethod
+    def get_revision_or_404(cls, board_id: int) -> int:
+        """Gets revision of board without loading the board.
+
+        Args:
+            board_id (int): Board id
+
+        Returns:
+            int: Current board revision
+        """
+        revision = db.session.query(cls.revision).filter(
+            cls.id == board_id).scalar()
+        if revision is None:
+            raise NotFound(f"{cls.__tablename__} not exists")
+        return revision
+
     def get_board_user(self, user_id: int) -> BoardAllowedUser:
         """Gets board user.
         Board user only exists when the user at least can observe the board
@@ -182,62 +194,101 @@ class Board(db.Model, BaseMixin):
         ).first()
 
 
-def create_default_roles(board: Board) -> typing.List[BoardRole]:
-    admin_role = BoardRole(name="Admin", board_id=board.id, is_admin=True)
-    member_role = BoardRole(name="Member", board_id=board.id)
-    observer_role = BoardRole(name="Observer", board_id=board.id)
+class BoardChange(db.Model, BaseMixin):
+    """Journal of board content changes, one row per changed entity
+    and board revision. Used by clients to catch up since a revision."""
+    __tablename__ = "board_change"
+    __table_args__ = (
+        sqla.Index("ix_board_change_board_revision", "board_id", "revision"),
+    )
 
+    id = sqla.Column(sqla.Integer, primary_key=True)
+    board_id = sqla.Column(
+        sqla.Integer, sqla.ForeignKey("board.id", ondelete="CASCADE"), nullable=False
+    )
+    revision = sqla.Column(sqla.Integer, nullable=False)
+
+    entity_type = sqla.Column(sqla.String(32), nullable=False)
+    entity_id = sqla.Column(sqla.Integer, nullable=False)
+    operation = sqla.Column(sqla.String(16), nullable=False)  # BoardChangeOperation
+    payload = sqla.Column(sqla.Text, default="{}")
+    created_on = sqla.Column(sqla.DateTime, default=datetime.utcnow)
+
+
+class PermissionState(db.Model):
+    """Permission set the board role masks were last checked against,
+    single row. See check_permission_integrity."""
+    __tablename__ = "permission_state"
+
+    id = sqla.Column(sqla.Integer, primary_key=True)
+    fingerprint = sqla.Column(sqla.String(40), nullable=False)
+    # Bits of the permissions which existed at the last check.
+    known_mask = sqla.Column(sqla.BigInteger, nullable=False)
+    checked_on = sqla.Column(sqla.DateTime, default=datetime.utcnow,
+                             onupdate=datetime.utcnow)
+
+
+def create_default_roles(board: Board) -> typing.List[BoardRole]:
     # Add all permission for admin role
-    for permission in BoardPermission:
-        admin_role.permissions.append(
-            BoardRolePermission(
-                name=permission.value,
-                allow=True
-            )
-        )
-        # Allow everything for members expect deleting board
-        member_role.permissions.append(
-            BoardRolePermission(
-                name=permission.value,
-                allow=True
-            )
-        )
-        # Disable everything for observer role, it has only view access
-        observer_role.permissions.append(
-            BoardRolePermission(
-                name=permission.value,
-                allow=False
-            )
-        )
+    admin_role = BoardRole(name="Admin", board_id=board.id, is_admin=True,
+                           permission_mask=ALL_PERMISSIONS_MASK)
+    # Allow everything for members expect deleting board
+    member_role = BoardRole(name="Member", board_id=board.id,
+                            permission_mask=ALL_PERMISSIONS_MASK)
+    # Disable everything for observer role, it has only view access
+    observer_role = BoardRole(name="Observer", board_id=board.id,
+                              permission_mask=0)
     board.board_roles.append(admin_role)
     board.board_roles.append(member_role)
     board.board_roles.append(observer_role)
     return [admin_role, member_role, observer_role]
 
 
-def check_permission_integrity():
-    """Checks if all permission object exists for board roles
+def check_permission_integrity(force: bool = False) -> bool:
+    """Brings board role masks up to date with BoardPermission, skipped
+    if the permission set not changed since the last check.
+
+    New permissions are allowed for every role except Observer, bits of
+    removed permissions are cleared. Both are single UPDATE statements.
 
     Args:
-        board (Board): _description_
+        force (bool, optional): Check even if permissions not changed.
+            Defaults to False.
+
+    Returns:
+        bool: True if the role masks were checked.
     """
-    permission_names = [val.value for val in BoardPermission]
-    for role in BoardRole.query.all():
-        current_permissions = [val.name for val in role.permissions]
-        # Delete permission not exists anymore.
-        for permission in current_permissions:
-            if permission not in permission_names:
-                # We can remove permission for all roles.
-                db.session.query(BoardRolePermission).filter(
-                    BoardRolePermission.name == permission
-                ).delete()
-        # Add non-existing permissions
-        for permission in permission_names:
-            if permission not in current_permissions:
-                role.permissions.append(
-                    BoardRolePermission(
-                        name=permission,
-                        allow=True if role.name != "Observer" else False
-                    )
-                )
+    fingerprint = permission_fingerprint()
+    state: PermissionState = PermissionState.query.first()
+    if state and state.fingerprint == fingerprint and not force:
+        return False
+
+    # Roles created before the first check have every known permission.
+    known_mask = state.known_mask if state else ALL_PERMISSIONS_MASK
+    new_mask = ALL_PERMISSIONS_MASK & ~known_mask
+    changed = 0
+    if new_mask:
+        changed += db.session.query(BoardRole).filter(
+            BoardRole.name != "Observer"
+        ).update(
+            {BoardRole.permission_mask: BoardRole.permission_mask.op("|")(new_mask)},
+            synchronize_session=False
+        )
+    changed += db.session.query(BoardRole).filter(
+        BoardRole.permission_mask.op("&")(~ALL_PERMISSIONS_MASK) != 0
+    ).update(
+        {BoardRole.permission_mask: BoardRole.permission_mask.op("&")(
+            ALL_PERMISSIONS_MASK)},
+        synchronize_session=False
+    )
+
+    if state is None:
+        state = PermissionState()
+        db.session.add(state)
+    state.fingerprint = fingerprint
+    state.known_mask = ALL_PERMISSIONS_MASK
     db.session.commit()
+    if changed:
+        # Cached members hold the old masks.
+        permission_cache.clear()
+    return True
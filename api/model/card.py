@@ -3,7 +3,7 @@ import sqlalchemy as sqla
 import sqlalchemy.orm as sqla_orm
 
 from api.app import db
-from . import BaseMixin
+from . import BaseMixin, RankType
 
 
 class BoardActivity(db.Model, BaseMixin):
@@ -120,6 +120,10 @@ class CardFileUpload(db.Model, BaseMixin):
 class Card(db.Model, BaseMixin):
 
     __tablename__ = "card"
+    __table_args__ = (
+        # Per-list windows and list card pages are ordered by rank.
+        sqla.Index("ix_card_list_rank", "list_id", "rank", "id"),
+    )
 
     id = sqla.Column(sqla.Integer, primary_key=True)
     list_id = sqla.Column(
@@ -130,7 +134,9 @@ class Card(db.Model, BaseMixin):
 
     title = sqla.Column(sqla.Text, nullable=False)
     description = sqla.Column(sqla.Text)
-    position = sqla.Column(sqla.SmallInteger, default=0)
+    position = sqla.Column(sqla.Integer, default=0)
+    # Ordering key in the list, see api.util.rank
+    rank = sqla.Column(RankType, nullable=False)
 
     archived = sqla.Column(sqla.Boolean, server_default="0", default=False)
     archived_by_list = sqla.Column(
@@ -139,6 +145,18 @@ class Card(db.Model, BaseMixin):
     created_on = sqla.Column(
         sqla.DateTime, nullable=False, default=datetime.utcnow, server_default="NOW()")
 
+    # Counters for card badges, changed with Card.change_counters.
+    comment_count = sqla.Column(
+        sqla.Integer, server_default="0", default=0, nullable=False)
+    file_upload_count = sqla.Column(
+        sqla.Integer, server_default="0", default=0, nullable=False)
+    member_count = sqla.Column(
+        sqla.Integer, server_default="0", default=0, nullable=False)
+    checklist_total = sqla.Column(
+        sqla.Integer, server_default="0", default=0, nullable=False)
+    checklist_completed = sqla.Column(
+        sqla.Integer, server_default="0", default=0, nullable=False)
+
     board_list = sqla_orm.relationship(
         "BoardList", back_populates="cards"
     )
@@ -168,3 +186,21 @@ class Card(db.Model, BaseMixin):
     file_uploads = sqla_orm.relationship(
         "CardFileUpload", back_populates="card"
     )
+
+    def change_counters(self, **deltas: int):
+        """Changes counters with SQL expressions (counter = counter + delta),
+        so concurrent writers don't overwrite each others changes.
+        The new values are loaded on next access after flush.
+
+        Args:
+            **deltas (int): Counter name and value to add
+        """
+        for key, delta in deltas.items():
+            if not delta:
+                continue
+            pending = self.__dict__.get(key)
+            if isinstance(pending, sqla.sql.ClauseElement):
+                # Already changed in this flush
+                setattr(self, key, pending + delta)
+            else:
+                setattr(self, key, getattr(Card, key) + delta)
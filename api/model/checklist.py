@@ -1,13 +1,17 @@
 import sqlalchemy as sqla
 import sqlalchemy.orm as sqla_orm
 
-from . import BaseMixin
+from . import BaseMixin, RankType
 from api.app import db
 
 
 class ChecklistItem(db.Model, BaseMixin):
     """Card checklist item"""
     __tablename__ = "card_checklist_item"
+    __table_args__ = (
+        sqla.Index("ix_card_checklist_item_checklist_rank",
+                   "checklist_id", "rank"),
+    )
     id = sqla.Column(sqla.Integer, primary_key=True)
     checklist_id = sqla.Column(
         sqla.Integer, sqla.ForeignKey("card_checklist.id", ondelete="CASCADE"))
@@ -20,7 +24,9 @@ class ChecklistItem(db.Model, BaseMixin):
     title = sqla.Column(sqla.Text)
     completed = sqla.Column(sqla.Boolean, default=False, nullable=False)
     marked_complete_on = sqla.Column(sqla.DateTime)
-    position = sqla.Column(sqla.SmallInteger, default=0)
+    position = sqla.Column(sqla.Integer, default=0)
+    # Ordering key in the checklist, see api.util.rank
+    rank = sqla.Column(RankType, nullable=False)
     board = sqla_orm.relationship("Board")
 
     checklist = sqla_orm.relationship("CardChecklist", back_populates="items")
@@ -39,11 +45,14 @@ class CardChecklist(db.Model, BaseMixin):
         sqla.Integer, sqla.ForeignKey("board.id", ondelete="CASCADE"), nullable=False
     )
     title = sqla.Column(sqla.Text)
+    # Positions allocated to items, see api.util.rank.allocate_positions
+    item_seq = sqla.Column(sqla.Integer, server_default="0",
+                           default=0, nullable=False)
 
     items = sqla_orm.relationship(
         "ChecklistItem",
         cascade="all, delete-orphan",
-        order_by="asc(ChecklistItem.position)"
+        order_by="[ChecklistItem.rank, ChecklistItem.id]"
     )
     card = sqla_orm.relationship(
         "Card", back_populates="checklists"
@@ -2,18 +2,26 @@ import sqlalchemy as sqla
 import sqlalchemy.orm as sqla_orm
 
 from api.app import db
-from . import BaseMixin
+from . import BaseMixin, RankType
 from api.model.card import Card
 
 
 class BoardList(db.Model, BaseMixin):
     __tablename__ = "list"
+    __table_args__ = (
+        sqla.Index("ix_list_board_rank", "board_id", "rank"),
+    )
 
     id = sqla.Column(sqla.Integer, primary_key=True)
     board_id = sqla.Column(
         sqla.Integer, sqla.ForeignKey("board.id", ondelete="CASCADE"), nullable=False)
     title = sqla.Column(sqla.Text, nullable=False)
-    position = sqla.Column(sqla.SmallInteger, default=0)
+    position = sqla.Column(sqla.Integer, default=0)
+    # Ordering key on the board, see api.util.rank
+    rank = sqla.Column(RankType, nullable=False)
+    # Positions allocated to cards, see api.util.rank.allocate_positions
+    card_seq = sqla.Column(sqla.Integer, server_default="0",
+                           default=0, nullable=False)
 
     archived = sqla.Column(sqla.Boolean, server_default="0", default=False)
     archived_on = sqla.Column(sqla.DateTime)
@@ -32,6 +40,10 @@ class BoardList(db.Model, BaseMixin):
         lazy="noload"
     )
 
+    # Count of non-archived cards, maintained on flush by count_list_cards.
+    card_count = sqla.Column(sqla.Integer, server_default="0",
+                             default=0, nullable=False)
+
     def populate_listcards(self, archived: bool = False):
         """Loads cards of the list.
 
@@ -43,4 +55,61 @@ class BoardList(db.Model, BaseMixin):
                 Card.list_id == self.id,
                 Card.archived == archived
             )
-        ).order_by(Card.position.asc()).all()
+        ).order_by(Card.rank.asc(), Card.id.asc()).all()
+
+    def wip_limit_reached(self) -> bool:
+        """Checks if the list can't take more cards. Limits of 0 and -1
+        are unlimited."""
+        return self.wip_limit > 0 and self.card_count >= self.wip_limit
+
+    def change_card_count(self, delta: int):
+        """Changes card_count with an SQL expression
+        (card_count = card_count + delta), see Card.change_counters.
+        """
+        if not delta:
+            return
+        pending = self.__dict__.get("card_count")
+        if isinstance(pending, sqla.sql.ClauseElement):
+            self.card_count = pending + delta
+        else:
+            self.card_count = BoardList.card_count + delta
+
+
+def _committed_value(obj: db.Model, key: str):
+    history = sqla.inspect(obj).attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, key)
+
+
+@sqla.event.listens_for(db.session, "before_flush")
+def count_list_cards(session: sqla_orm.Session, flush_context, instances):
+    """Keeps BoardList.card_count in step with created, moved, archived,
+    reverted and deleted cards in the same transaction.
+    """
+    deltas = {}
+
+    def add(list_id: int, delta: int):
+        if list_id is not None:
+            deltas[list_id] = deltas.get(list_id, 0) + delta
+
+    for obj in session.new:
+        if isinstance(obj, Card) and not obj.archived:
+            add(obj.list_id, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Card) and not _committed_value(obj, "archived"):
+            add(_committed_value(obj, "list_id"), -1)
+    for obj in session.dirty:
+        if not isinstance(obj, Card):
+            continue
+        old = (_committed_value(obj, "list_id"),
+               not _committed_value(obj, "archived"))
+        new = (obj.list_id, not obj.archived)
+        if old != new:
+            add(old[0], -1 if old[1] else 0)
+            add(new[0], 1 if new[1] else 0)
+
+    for list_id, delta in deltas.items():
+        board_list = session.get(BoardList, list_id)
+        if board_list:
+            board_list.change_card_count(delta)
@@ -1,15 +1,15 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Union
 
 import sqlalchemy as sqla
 import sqlalchemy.orm as sqla_orm
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from flask import current_app
 
 from . import BaseMixin
 
-from api.app import db
+from api.app import db, password_hasher, revocation_store
+from api.socket import reset_token_sessions, reset_user_sessions
 
 
 class Token(db.Model):
@@ -18,13 +18,77 @@ class Token(db.Model):
     id = sqla.Column(sqla.Integer, primary_key=True)
     user_id = sqla.Column(sqla.Integer, sqla.ForeignKey("user.id"))
 
-    jti = sqla.Column(sqla.String(36), nullable=False, index=True)
+    jti = sqla.Column(sqla.String(36), nullable=False)
     created_at = sqla.Column(sqla.DateTime, nullable=False)
+    # Expiry of the JWT, NULL for tokens stored before it was recorded.
+    expires_at = sqla.Column(sqla.DateTime, index=True)
     type = sqla.Column(db.String(16), nullable=False,
                        server_default="access_token")
     revoked = sqla.Column(sqla.Boolean, nullable=False,
                           server_default="0", default=False)
 
+    __table_args__ = (
+        # Covers revocation checks, jti lookups use its prefix.
+        sqla.Index("ix_token_jti_revoked", "jti", "revoked"),
+    )
+
+    @classmethod
+    def from_decoded(cls, user_id: int, decoded_token: dict):
+        """Creates a Token row for a decoded JWT
+
+        Args:
+            user_id (int): Owner user id
+            decoded_token (dict): Decoded JWT
+
+        Returns:
+            Token: Token object
+        """
+        return cls(
+            user_id=user_id,
+            jti=decoded_token["jti"],
+            type=decoded_token["type"],
+            created_at=datetime.now(),
+            expires_at=datetime.fromtimestamp(decoded_token["exp"])
+            if "exp" in decoded_token else None
+        )
+
+    @classmethod
+    def prune_expired(cls, batch_size: int = 1000, max_batches: int = None) -> int:
+        """Deletes expired tokens in batches, each batch in its own
+        transaction so locks are held shortly. Tokens stored without
+        expiry are deleted after REVOCATION_TTL (the longest lifetime).
+
+        Args:
+            batch_size (int, optional): Rows deleted per batch. Defaults to 1000.
+            max_batches (int, optional): Stops after this many batches.
+                Defaults to None (until no expired token left).
+
+        Returns:
+            int: Count of deleted tokens
+        """
+        now = datetime.now()
+        expired = sqla.or_(
+            cls.expires_at < now,
+            sqla.and_(
+                cls.expires_at == None,
+                cls.created_at < now - timedelta(
+                    seconds=current_app.config["REVOCATION_TTL"])
+            )
+        )
+        deleted = batches = 0
+        while max_batches is None or batches < max_batches:
+            ids = [id for id, in db.session.query(cls.id).filter(
+                expired).order_by(cls.id).limit(batch_size)]
+            if not ids:
+                break
+            deleted += db.session.query(cls).filter(
+                cls.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            batches += 1
+            if len(ids) < batch_size:
+                break
+        return deleted
+
     @classmethod
     def revoke_token(cls, token):
         db.session.query(cls).filter(
@@ -34,12 +98,38 @@ class Token(db.Model):
             )
         ).update({"revoked": True})
         db.session.commit()
+        revocation_store.revoke([token["jti"]])
+        reset_token_sessions(token["jti"], "revoked")
 
     @classmethod
     def revoke_all_tokens_for_user(cls, user_id: int):
+        jtis = [jti for jti, in db.session.query(cls.jti).filter(
+            sqla.and_(
+                cls.user_id == user_id,
+                cls.revoked == False
+            )
+        )]
         db.session.query(cls).filter(
             cls.user_id == user_id).update({"revoked": True})
         db.session.commit()
+        revocation_store.revoke(jtis)
+        reset_user_sessions(user_id, "revoked")
+
+    @classmethod
+    def is_revoked(cls, jti: str) -> bool:
+        return db.session.query(cls.id).filter(
+            sqla.and_(
+                cls.jti == jti,
+                cls.revoked == True
+            )
+        ).first() is not None
+
+    @classmethod
+    def revoked_jtis(cls) -> List[str]:
+        """Gets ids of revoked tokens for filling the revocation store."""
+        return [jti for jti, in db.session.query(cls.jti).filter(
+            cls.revoked == True
+        )]
 
 
 class Role(db.Model):
@@ -115,18 +205,48 @@ class User(db.Model, BaseMixin):
     )
 
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        return password_hasher.check(self.password, password)
+
+    @classmethod
+    def login_history_update(cls) -> sqla.sql.Update:
+        """UPDATE statement recording logins without reading the user row.
+        The previous login is moved from the current_login_* columns, or
+        taken from the prev_at/prev_ip parameters when several logins of
+        the user are written at once.
+
+        Parameters: user_id, login_at, login_ip, prev_at, prev_ip
+        """
+        table = cls.__table__
+        has_prev = sqla.bindparam("prev_at", type_=sqla.DateTime) != None
+        return table.update().where(
+            table.c.id == sqla.bindparam("user_id")
+        ).values(
+            last_login_at=sqla.case(
+                (has_prev, sqla.bindparam("prev_at", type_=sqla.DateTime)),
+                else_=sqla.func.coalesce(
+                    table.c.current_login_at, table.c.last_login_at)
+            ),
+            last_login_ip=sqla.case(
+                (has_prev, sqla.bindparam("prev_ip", type_=sqla.String)),
+                else_=sqla.func.coalesce(
+                    table.c.current_login_ip, table.c.last_login_ip)
+            ),
+            current_login_at=sqla.bindparam("login_at", type_=sqla.DateTime),
+            current_login_ip=sqla.bindparam("login_ip", type_=sqla.String),
+        )
 
     def update_login_history(self, remote_addr: str):
-        """Updates data after successfull login like login_date and login_ip"""
-        if self.current_login_at:
-            self.last_login_at = self.current_login_at
-        self.current_login_at = datetime.now()
-
-        if self.current_login_ip:
-            self.last_login_ip = self.current_login_ip
-        self.current_login_ip = remote_addr
-        db.session.commit()
+        """Updates data after successfull login like login_date and login_ip
+        in the current transaction, committed by the caller."""
+        db.session.execute(self.login_history_update(), [{
+            "user_id": self.id,
+            "login_at": datetime.now(),
+            "login_ip": remote_addr,
+            "prev_at": None,
+            "prev_ip": None,
+        }])
+        # Not a flush of the user, mark it changed for the identity cache.
+        db.session.info.setdefault("changed_users", set()).add(self.id)
 
     @classmethod
     def find_user(cls, user_or_mail: str):
@@ -159,7 +279,7 @@ class User(db.Model, BaseMixin):
         if "timezone" not in kwargs.keys():
             user.timezone = current_app.config["DEFAULT_TIMEZONE"]
 
-        user.password = generate_password_hash(user.password)
+        user.password = password_hasher.hash(user.password)
         return user
 
     def update_roles(self, roles: List[Union[Role, str]]):
@@ -183,7 +303,7 @@ class User(db.Model, BaseMixin):
         """Updates an User object"""
         for key, value in kwargs.items():
             if key == "password":
-                self.password = generate_password_hash(kwargs["password"])
+                self.password = password_hasher.hash(kwargs["password"])
             elif key == "roles":
                 self.update_roles(value)
             else:
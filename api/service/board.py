@@ -14,15 +14,21 @@ import sqlalchemy.orm as sqla_orm
 from werkzeug.exceptions import Forbidden, NotFound
 from marshmallow.exceptions import ValidationError
 
-from api.model.board import Board, BoardAllowedUser, BoardRole
+from api.model.board import Board, BoardAllowedUser, BoardChange, BoardRole
 from api.model.card import Card, BoardActivity
 from api.model.list import BoardList
 
-from api.model import BoardPermission, BoardActivityEvent
-from api.app import db, socketio
-from api.socket import SIOEvent
+from api.model import BoardPermission, BoardActivityEvent, BoardChangeOperation
+from api.app import db, socketio, board_cache
+from api.socket import SIOEvent, reset_user_sessions
 from api.model.user import User
+from api.util.cache import CachedSnapshot
 from api.util.dto import BoardDTO
+from api.util import rank
+from api.util.permission import permission_resolver
+from api.util.revision import record_board_change
+from api.util.serializer import fieldset_key
+from api.service.snapshot import snapshot_loader
 
 
 class BoardService:
@@ -58,25 +64,92 @@ class BoardService:
             Board: Board populated with non-archived lists, cards
         """
         board = Board.get_or_404(board_id)
-        BoardAllowedUser.get_by_usr_or_403(board_id, current_user.id)
+        permission_resolver.get_member_or_403(board_id, current_user.id)
 
-        # Get non archived lists first
-        board.lists = BoardList.query.filter(
-            sqla.and_(
-                BoardList.board_id == board.id,
-                BoardList.archived == False
+        # Lists, cards and card relations loaded with fixed query count.
+        return snapshot_loader.load(board)
+
+    def get_snapshot(
+        self, current_user: User, board_id: int,
+        fieldset: typing.Optional[typing.List[str]] = None
+    ) -> CachedSnapshot:
+        """Gets serialized board, served from cache when the board
+        not changed since the last serialization.
+
+        Args:
+            current_user (User): Current logged in user
+            board_id (int): Board to get.
+            fieldset (typing.Optional[typing.List[str]], optional): Sparse
+                fieldset. Defaults to None (all fields).
+
+        Returns:
+            CachedSnapshot: Serialized board with non-archived lists, cards
+        """
+        board = Board.get_or_404(board_id)
+        permission_resolver.get_member_or_403(board_id, current_user.id)
+
+        schema = BoardDTO.board_schema.variant(fieldset)
+        variant = fieldset_key(fieldset)
+        # Revision read before loading, so a concurrent write can't be
+        # cached with the new revision.
+        snapshot = board_cache.get(board.id, board.revision, variant)
+        if snapshot is None:
+            snapshot = board_cache.set(
+                board.id, board.revision,
+                schema.dump(snapshot_loader.load(
+                    board, set(fieldset) if fieldset else None)),
+                variant
             )
-        ).order_by(BoardList.position.asc()).all()
+        return snapshot
+
+    def get_changes(
+        self, current_user: User, board_id: int, since: int
+    ) -> typing.Tuple[Board, typing.Optional[typing.List[BoardChange]]]:
+        """Gets board changes made after a revision.
+        Changes are not returned if the journal can't bring the client
+        from the revision to the current one, the board is loaded instead.
 
-        # Get not archived list card
-        for li in board.lists:
-            li.cards = Card.query.filter(
+        Args:
+            current_user (User): Current logged in user
+            board_id (int): Board id
+            since (int): Last revision known by the client
+
+        Returns:
+            typing.Tuple[Board, typing.Optional[typing.List[BoardChange]]]:
+                Board and changes ordered by revision, or board populated
+                with lists and cards and None if a full snapshot is required.
+        """
+        board = Board.get_or_404(board_id)
+        permission_resolver.get_member_or_403(board_id, current_user.id)
+
+        if since == board.revision:
+            return board, []
+
+        changes = []
+        if since < board.revision:
+            max_changes = current_app.config["BOARD_CHANGES_MAX"]
+            changes = BoardChange.query.filter(
                 sqla.and_(
-                    Card.list_id == li.id,
-                    Card.archived == False
+                    BoardChange.board_id == board.id,
+                    BoardChange.revision > since,
+                    BoardChange.revision <= board.revision
                 )
-            ).order_by(Card.position.asc()).all()
-        return board
+            ).order_by(
+                BoardChange.revision.asc(), BoardChange.id.asc()
+            ).limit(max_changes + 1).all()
+
+            # Every revision has to be journaled, revisions only marked
+            # changed (bulk updates) leave gaps.
+            if len(changes) <= max_changes and \
+                    {change.revision for change in changes} == \
+                    set(range(since + 1, board.revision + 1)) and \
+                    all(change.operation != BoardChangeOperation.RESET.value
+                        for change in changes):
+                return board, changes
+
+        # Too many changes, journal pruned, gap in the journal
+        # or unknown revision.
+        return snapshot_loader.load(board), None
 
     def get_board_activities(self, current_user: User, board_id: int, args: dict) -> Pagination:
         """Get activities for board.
@@ -91,7 +164,7 @@ class BoardService:
         """
         # TODO: This is almost full duplicate of Card service->get_activities method. Need refactor here!
         Board.get_or_404(board_id)
-        BoardAllowedUser.get_by_usr_or_403(board_id, current_user.id)
+        permission_resolver.get_member_or_403(board_id, current_user.id)
 
         query = BoardActivity.query.filter(BoardActivity.board_id == board_id)
 
@@ -143,7 +216,7 @@ class BoardService:
             List[Card]: Archived cards for board.
         """
         Board.get_or_404(board_id)
-        BoardAllowedUser.get_by_usr_or_403(board_id, current_user.id)
+        permission_resolver.get_member_or_403(board_id, current_user.id)
 
         return Card.query.filter(
             sqla.and_(
@@ -166,7 +239,7 @@ class BoardService:
             List[BoardList]: Archived lists for board.
         """
         Board.get_or_404(board_id)
-        BoardAllowedUser.get_by_usr_or_403(board_id, current_user.id)
+        permission_resolver.get_member_or_403(board_id, current_user.id)
 
         return BoardList.query.filter(
             sqla.and_(
@@ -191,7 +264,7 @@ class BoardService:
         db.session.add(board)
         db.session.commit()
         # Create Board activity
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             board.id, current_user.id)
         board.activities.append(
             BoardActivity(
@@ -217,9 +290,9 @@ class BoardService:
             Board: Updated board.
         """
         board = Board.get_or_404(board_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             board.id, current_user.id)
-        if board.owner_id == current_user.id or current_member.has_permission(BoardPermission.BOARD_EDIT):
+        if board.owner_id == current_user.id or permission_resolver.has_permission(current_member, BoardPermission.BOARD_EDIT):
             board.update(**data)
             db.session.commit()
             socketio.emit(
@@ -254,7 +327,7 @@ class BoardService:
         """
         # Only allow deletion for owner
         board: Board = Board.get_or_404(board_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             board_id, current_user.id)
 
         # Board owner id is User.id not BoardAllowedUser.id!
@@ -283,6 +356,7 @@ class BoardService:
 
                 db.session.delete(board)
                 db.session.commit()
+                permission_resolver.invalidate(board_id)
                 socketio.emit(
                     SIOEvent.BOARD_DELETE.value,
                     board_id,
@@ -306,7 +380,7 @@ class BoardService:
             Board: Reverted board.
         """
         board: Board = Board.get_or_404(board_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             board_id, current_user.id)
         if board.owner_id == current_user.id:
             if board.archived:
@@ -342,16 +416,12 @@ class BoardService:
             data (typing.List[int]): List of BoardList ID on the required order.
         """
         board = Board.get_or_404(board_id)
-        BoardAllowedUser.get_by_usr_or_403(board_id, current_user.id)
+        permission_resolver.get_member_or_403(board_id, current_user.id)
 
-        for index, item in enumerate(data):
-            db.session.query(BoardList).filter(
-                sqla.and_(
-                    BoardList.id == item,
-                    BoardList.board_id == board.id
-                )
-            ).update({"position": index})
+        changes = rank.reorder(BoardList, board.id, data)
         db.session.commit()
+        if rank.needs_rebalance(changes.values()):
+            rank.schedule_rebalance(BoardList, board.id)
 
         socketio.emit(
             SIOEvent.LIST_UPDATE_ORDER.value,
@@ -373,7 +443,7 @@ class BoardMemberManagementService:
         Returns:
             BoardAllowedUser: Board allowed user object contains role/permission.
         """
-        BoardAllowedUser.get_by_usr_or_403(board_id, current_user.id)
+        permission_resolver.get_member_or_403(board_id, current_user.id)
         return BoardAllowedUser.query.filter(
             sqla.and_(
                 BoardAllowedUser.board_id == board_id,
@@ -397,7 +467,7 @@ class BoardMemberManagementService:
             typing.List[BoardRole]: List of board roles
         """
         board = Board.get_or_404(board_id)
-        BoardAllowedUser.get_by_usr_or_403(
+        permission_resolver.get_member_or_403(
             board_id, current_user.id)
         return board.board_roles
 
@@ -415,7 +485,7 @@ class BoardMemberManagementService:
             typing.Union[BoardAllowedUser, None]: Member if User already member of board else None
         """
         board = Board.get_or_404(board_id)
-        BoardAllowedUser.get_by_usr_or_403(board_id, current_user.id)
+        permission_resolver.get_member_or_403(board_id, current_user.id)
         return board.get_board_user(user_id)
 
     def get_members(
@@ -431,7 +501,7 @@ class BoardMemberManagementService:
             typing.List[BoardAllowedUser]: List of members
         """
         board = Board.get_or_404(board_id)
-        BoardAllowedUser.get_by_usr_or_403(board.id, current_user.id)
+        permission_resolver.get_member_or_403(board.id, current_user.id)
         return board.board_users
 
     def add_member(
@@ -453,7 +523,7 @@ class BoardMemberManagementService:
             BoardAllowedUser: Created member
         """
         board: Board = Board.get_or_404(board_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             board_id, current_user.id)
 
         if not current_member.role.is_admin:
@@ -476,6 +546,8 @@ class BoardMemberManagementService:
         )
         board.board_users.append(member)
         db.session.commit()
+        permission_resolver.invalidate(board.id, member.user_id)
+        reset_user_sessions(member.user_id, "membership")
 
         board.activities.append(
             BoardActivity(
@@ -515,7 +587,7 @@ class BoardMemberManagementService:
             BoardAllowedUser: Updated member
         """
         board = Board.get_or_404(board_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             board_id, current_user.id)
         user = User.get_or_404(user_id)
         role = BoardRole.get_board_role_or_404(board_id, role_id)
@@ -533,6 +605,7 @@ class BoardMemberManagementService:
         member.role = role
 
         db.session.commit()
+        permission_resolver.invalidate(board.id, user.id)
 
         board.activities.append(
             BoardActivity(
@@ -566,7 +639,7 @@ class BoardMemberManagementService:
             user_id (int): User id
         """
         board = Board.get_or_404(board_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             board.id, current_user.id)
 
         if not current_member.role.is_admin:
@@ -597,6 +670,17 @@ class BoardMemberManagementService:
             db.session.commit()
         else:
             member_user_name = member.user.name
+            # Card assignments of member deleted by cascade.
+            card_ids = [
+                assignment.card_id for assignment in member.assigned_cards
+            ]
+            if card_ids:
+                db.session.query(Card).filter(Card.id.in_(card_ids)).update(
+                    {"member_count": Card.member_count - 1},
+                    synchronize_session=False
+                )
+                record_board_change(board.id, "board", board.id,
+                                    BoardChangeOperation.RESET)
             db.session.delete(member)
             board.activities.append(
                 BoardActivity(
@@ -612,6 +696,8 @@ class BoardMemberManagementService:
                 )
             )
             db.session.commit()
+        permission_resolver.invalidate(board.id, user_id)
+        reset_user_sessions(user_id, "membership")
 
     def activate_member(
         self, current_user: User, member_id: int
@@ -623,7 +709,7 @@ class BoardMemberManagementService:
             member_id (int): Member id to activate
         """
         member = BoardAllowedUser.get_or_404(member_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             member.board_id, current_user.id)
         if not current_member.role.is_admin:
             raise Forbidden()
@@ -643,6 +729,8 @@ class BoardMemberManagementService:
             )
         )
         db.session.commit()
+        permission_resolver.invalidate(member.board_id, member.user_id)
+        reset_user_sessions(member.user_id, "membership")
 
 
 board_service = BoardService()
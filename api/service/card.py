@@ -15,11 +15,15 @@ from api.app import db, socketio
 
 from api.model.user import User
 from api.model.card import Card, BoardActivity, CardComment, CardMember, CardDate, CardFileUpload
-from api.model import BoardPermission, CardActivityEvent
+from api.model import BoardChangeOperation, BoardPermission, CardActivityEvent
 from api.model.board import BoardAllowedUser
 from api.model.list import BoardList
+from api.model.checklist import CardChecklist, ChecklistItem
 
 from api.util.dto import SIODTO, CardDTO, BoardDTO
+from api.util import rank
+from api.util.permission import permission_resolver
+from api.util.revision import record_board_change
 from api.socket import SIOEvent
 
 
@@ -46,7 +50,7 @@ class CardService:
         card: Card = Card.get_or_404(id)
 
         # Only membership required for getting card info.
-        BoardAllowedUser.get_by_usr_or_403(card.board_id, current_user.id)
+        permission_resolver.get_member_or_403(card.board_id, current_user.id)
 
         # Load card activities
         # card.activities = BoardActivity.query.filter(
@@ -70,7 +74,7 @@ class CardService:
         """
         card: Card = Card.get_or_404(card_id)
         # Only membership required for getting card activities.
-        BoardAllowedUser.get_by_usr_or_403(card.board_id, current_user.id)
+        permission_resolver.get_member_or_403(card.board_id, current_user.id)
 
         # Query and paginate
         query = BoardActivity.query.filter(BoardActivity.card_id == card_id)
@@ -132,10 +136,10 @@ class CardService:
             Card: Card ORM object.
         """
         board_list: BoardList = BoardList.get_or_404(list_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             board_list.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CARD_EDIT):
+        if permission_resolver.has_permission(current_member, BoardPermission.CARD_EDIT):
             data.pop("list_id", None)
             data.pop("board_id", None)
 
@@ -144,12 +148,6 @@ class CardService:
                 board_id=board_list.board_id,
                 list_id=board_list.id
             )
-            position_max = db.engine.execute(
-                f"SELECT MAX(position) FROM card WHERE list_id={board_list.id}"
-            ).fetchone()
-
-            if position_max[0] is not None:
-                card.position = position_max[0] + 1
             db.session.add(card)
             db.session.commit()
 
@@ -200,11 +198,11 @@ class CardService:
         card: Card = Card.get_or_404(card_id)
         old_list_id = card.list_id
 
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             card.board_id, current_user.id
         )
 
-        if (current_member.has_permission(BoardPermission.CARD_EDIT)):
+        if (permission_resolver.has_permission(current_member, BoardPermission.CARD_EDIT)):
             for key, value in data.items():
                 if key == "list_id" and card.list_id != value:
                     # Get target list id
@@ -215,8 +213,7 @@ class CardService:
                             {"list_id": ["Cannot move card to other board!"]})
 
                     # Check target list WIP limit
-                    target_list.populate_listcards()
-                    if len(target_list.cards) == target_list.wip_limit:
+                    if not card.archived and target_list.wip_limit_reached():
                         raise ValidationError(
                             {"list_id": ["Target list WIP limit reached!"]}
                         )
@@ -242,14 +239,14 @@ class CardService:
                     )
                     card.activities.append(activity)
                     card.list_id = value
+                    # Appended to the target list
+                    card.rank = rank.rank_after(rank.last_rank(Card, value))
                     activities.append(activity)
                 elif key == "archived" and card.archived != value:
                     if value is False:
 
                         # Check target list WIP limit.
-                        card.board_list.populate_listcards()
-
-                        if len(card.board_list.cards) == card.board_list.wip_limit:
+                        if card.board_list.wip_limit_reached():
                             raise ValidationError(
                                 {"archived": "You can't restore card because on the target list the WIP limit reached!"})
 
@@ -275,15 +272,14 @@ class CardService:
                         card.archived = True
                         card.archived_on = datetime.utcnow()
 
-                        card.activities.append(
-                            BoardActivity(
-                                card_id=card.id,
-                                board_id=card.board_id,
-                                board_user_id=current_member.id,
-                                event=CardActivityEvent.CARD_ARCHIVE.value,
-                                entity_id=card.id,
-                            )
+                        activity = BoardActivity(
+                            card_id=card.id,
+                            board_id=card.board_id,
+                            board_user_id=current_member.id,
+                            event=CardActivityEvent.CARD_ARCHIVE.value,
+                            entity_id=card.id,
                         )
+                        card.activities.append(activity)
                         activities.append(activity)
                         socketio.emit(
                             SIOEvent.CARD_ARCHIVE.value,
@@ -327,6 +323,106 @@ class CardService:
             return card
         raise Forbidden()
 
+    def move(self, current_user: User, card_id: int, data: dict) -> Card:
+        """Moves card to a list, before or after a card of it, in one
+        transaction. The target list row is locked while the WIP limit is
+        checked and the card is ranked, so concurrent moves and creates
+        can't exceed the limit or take the same rank.
+
+        Args:
+            current_user (User): Current logged in user
+            card_id (int): Card ID to move
+            data (dict): Move data: list_id and optionally before_id or after_id
+
+        Raises:
+            ValidationError: Invalid target list, card or WIP limit reached
+            Forbidden: Don't have permission to edit card
+
+        Returns:
+            Card: Moved card
+        """
+        card: Card = Card.get_or_404(card_id)
+        old_list_id = card.list_id
+
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
+            card.board_id, current_user.id
+        )
+        if not permission_resolver.has_permission(current_member, BoardPermission.CARD_EDIT):
+            raise Forbidden()
+
+        target_list: BoardList = BoardList.query.filter(
+            BoardList.id == data["list_id"]
+        ).with_for_update().first()
+        if not target_list or target_list.board_id != card.board_id:
+            raise ValidationError(
+                {"list_id": ["Cannot move card to other board!"]})
+
+        activity = None
+        if target_list.id != old_list_id:
+            # Check target list WIP limit
+            if not card.archived and target_list.wip_limit_reached():
+                raise ValidationError(
+                    {"list_id": ["Target list WIP limit reached!"]}
+                )
+
+            activity = BoardActivity(
+                card_id=card.id,
+                board_id=card.board_id,
+                board_user_id=current_member.id,
+                event=CardActivityEvent.CARD_MOVE_TO_LIST.value,
+                entity_id=card.id,
+                changes=json.dumps(
+                    {
+                        "from": {
+                            "id": old_list_id,
+                            "title": card.board_list.title
+                        },
+                        "to": {
+                            "id": target_list.id,
+                            "title": target_list.title
+                        }
+                    }
+                )
+            )
+            card.activities.append(activity)
+
+        new_rank = rank.rank_for_placement(
+            Card, target_list.id,
+            before_id=data.get("before_id"),
+            after_id=data.get("after_id"),
+            exclude_id=card.id
+        )
+        if new_rank is None:
+            key = "before_id" if "before_id" in data else "after_id"
+            raise ValidationError(
+                {key: ["Card not exists on the target list!"]})
+
+        card.list_id = target_list.id
+        card.rank = new_rank
+        db.session.commit()
+        if rank.needs_rebalance([new_rank]):
+            rank.schedule_rebalance(Card, target_list.id)
+
+        if activity:
+            socketio.emit(
+                SIOEvent.CARD_ACTIVITY.value,
+                CardDTO.activity_schema.dump(activity),
+                namespace="/board",
+                to=f"card-{card.id}"
+            )
+        socketio.emit(
+            SIOEvent.CARD_MOVE.value,
+            SIODTO.card_move_event_schema.dump({
+                "card_id": card.id,
+                "from_list_id": old_list_id,
+                "list_id": card.list_id,
+                "rank": card.rank
+            }),
+            namespace="/board",
+            to=f"board-{card.board_id}"
+        )
+        return card
+
     def delete(self, current_user: User, card_id: int):
         """Deletes a card
 
@@ -338,10 +434,10 @@ class CardService:
             Forbidden: Don't have permission to delete cards
         """
         card: Card = Card.get_or_404(card_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             card.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CARD_DELETE):
+        if permission_resolver.has_permission(current_member, BoardPermission.CARD_DELETE):
             list_id = card.list_id
 
             if not card.archived:
@@ -392,6 +488,54 @@ class CardService:
         else:
             raise Forbidden()
 
+    def recount_counters(self, board_id: int = None) -> int:
+        """Recomputes card counters from child tables with one
+        set-based update. Used to repair counters.
+
+        Args:
+            board_id (int, optional): Only recount cards of board.
+                Defaults to None (all cards).
+
+        Returns:
+            int: Count of repaired cards
+        """
+        def count(column, *criteria):
+            return sqla.select(sqla.func.count(column)).where(
+                *criteria).scalar_subquery()
+
+        comment_count = sqla.select(sqla.func.count(CardComment.id)).join(
+            BoardActivity, BoardActivity.id == CardComment.activity_id
+        ).where(BoardActivity.card_id == Card.id).scalar_subquery()
+        checklist_items = sqla.select(sqla.func.count(ChecklistItem.id)).join(
+            CardChecklist, CardChecklist.id == ChecklistItem.checklist_id
+        ).where(CardChecklist.card_id == Card.id)
+
+        counters = {
+            "comment_count": comment_count,
+            "file_upload_count": count(
+                CardFileUpload.id, CardFileUpload.card_id == Card.id),
+            "member_count": count(
+                CardMember.id, CardMember.card_id == Card.id),
+            "checklist_total": checklist_items.scalar_subquery(),
+            "checklist_completed": checklist_items.where(
+                ChecklistItem.completed == True).scalar_subquery(),
+        }
+        # Only cards with a wrong counter
+        query = db.session.query(Card).filter(sqla.or_(*(
+            getattr(Card, key) != value for key, value in counters.items()
+        )))
+        if board_id is not None:
+            query = query.filter(Card.board_id == board_id)
+        board_ids = [row[0] for row in query.with_entities(Card.board_id).distinct()]
+
+        updated = query.update(counters, synchronize_session=False)
+        # Bulk update isn't journaled, clients of the boards reload.
+        for changed_board_id in board_ids:
+            record_board_change(changed_board_id, "board", changed_board_id,
+                                BoardChangeOperation.RESET)
+        db.session.commit()
+        return updated
+
 
 class CommentService:
     """
@@ -413,10 +557,10 @@ class CommentService:
             CardActivity: Card activity of comment
         """
         card: Card = Card.get_or_404(card_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             card.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CARD_COMMENT):
+        if permission_resolver.has_permission(current_member, BoardPermission.CARD_COMMENT):
             comment = CardComment(
                 board_user_id=current_member.id,
                 board_id=card.board_id,
@@ -431,6 +575,7 @@ class CommentService:
                 comment=comment
             )
             card.activities.append(activity)
+            card.change_counters(comment_count=1)
             db.session.commit()
 
             socketio.emit(
@@ -445,7 +590,7 @@ class CommentService:
 
     def patch(self, current_user: User, comment_id: int, data: dict) -> CardComment:
         comment: CardComment = CardComment.get_or_404(comment_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             comment.board_id, current_user.id
         )
 
@@ -464,12 +609,13 @@ class CommentService:
 
     def delete(self, current_user: User, comment_id: int):
         comment: CardComment = CardComment.get_or_404(comment_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             comment.board_id, current_user.id
         )
 
         if comment.board_user_id == current_member.id or current_member.role.is_admin:
             activity_id, card_id = comment.activity_id, comment.activity.card_id
+            comment.activity.card.change_counters(comment_count=-1)
             db.session.delete(comment.activity)
             db.session.commit()
 
@@ -504,9 +650,9 @@ class MemberService:
             typing.Tuple[CardMember, CardActivity]: _description_
         """
         card: Card = Card.get_or_404(card_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             card.board_id, current_user.id)
-        if current_member.has_permission(BoardPermission.CARD_ASSIGN_MEMBER):
+        if permission_resolver.has_permission(current_member, BoardPermission.CARD_ASSIGN_MEMBER):
             member = BoardAllowedUser.query.filter(
                 sqla.and_(
                     BoardAllowedUser.board_id == card.board_id,
@@ -530,6 +676,7 @@ class MemberService:
 
             member_assignment = CardMember(board_user_id=member.id)
             card.assigned_members.append(member_assignment)
+            card.change_counters(member_count=1)
 
             # Add card activity
             activity = BoardActivity(
@@ -583,10 +730,10 @@ class MemberService:
             CardActivity: Card activity of deassignment.
         """
         card: Card = Card.get_or_404(card_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             card.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CARD_DEASSIGN_MEMBER):
+        if permission_resolver.has_permission(current_member, BoardPermission.CARD_DEASSIGN_MEMBER):
             # Get member
             card_member = CardMember.query.filter(
                 sqla.and_(
@@ -610,6 +757,7 @@ class MemberService:
                 )
             )
             card.activities.append(activity)
+            card.change_counters(member_count=-1)
             db.session.delete(card_member)
             db.session.commit()
 
@@ -642,10 +790,10 @@ class DateService:
     def post(self, current_user: User, card_id: int, data: dict) -> CardDate:
         """Creates Date."""
         card: Card = Card.get_or_404(card_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             card.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CARD_ADD_DATE):
+        if permission_resolver.has_permission(current_member, BoardPermission.CARD_ADD_DATE):
             card_date = CardDate(board_id=card.board_id, **data)
             card.dates.append(card_date)
             activity = BoardActivity(
@@ -700,10 +848,10 @@ class DateService:
             typing.Tuple[CardDate, CardActivity]: _description_
         """
         card_date = CardDate.get_or_404(date_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             card_date.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CARD_EDIT_DATE):
+        if permission_resolver.has_permission(current_member, BoardPermission.CARD_EDIT_DATE):
             card_date.update(**data)
             activity = BoardActivity(
                 card_id=card_date.card_id,
@@ -752,10 +900,10 @@ class DateService:
             CardActivity: _description_
         """
         card_date = CardDate.get_or_404(date_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             card_date.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CARD_EDIT_DATE):
+        if permission_resolver.has_permission(current_member, BoardPermission.CARD_EDIT_DATE):
             activity = BoardActivity(
                 card_id=card_date.id,
                 board_id=card_date.board_id,
@@ -825,9 +973,9 @@ class CardFileUploadService:
             str: File path to send to frontend
         """
         upload: CardFileUpload = CardFileUpload.get_or_404(file_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             upload.board_id, current_user.id)
-        if current_member.has_permission(BoardPermission.FILE_DOWNLOAD):
+        if permission_resolver.has_permission(current_member, BoardPermission.FILE_DOWNLOAD):
             fpath = os.path.join(
                 current_app.config["USER_UPLOAD_DIR"],
                 str(upload.board_id),
@@ -841,10 +989,10 @@ class CardFileUploadService:
 
     def post(self, current_user: User, card_id: int, file: FileStorage) -> CardFileUpload:
         card: Card = Card.get_or_404(card_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             card.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.FILE_UPLOAD):
+        if permission_resolver.has_permission(current_member, BoardPermission.FILE_UPLOAD):
             # Upload file
             upload_path = os.path.join(
                 current_app.config["USER_UPLOAD_DIR"],
@@ -869,6 +1017,7 @@ class CardFileUploadService:
                 changes=json.dumps({"to": {"file_name": upload.file_name}})
             )
             card.activities.append(activity)
+            card.change_counters(file_upload_count=1)
             db.session.commit()
 
             # Send SIO events
@@ -894,10 +1043,10 @@ class CardFileUploadService:
 
     def delete(self, current_user: User, file_id: int):
         upload: CardFileUpload = CardFileUpload.get_or_404(file_id)
-        current_member: BoardAllowedUser = BoardAllowedUser.get_by_usr_or_403(
+        current_member: BoardAllowedUser = permission_resolver.get_member_or_403(
             upload.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.FILE_DELETE):
+        if permission_resolver.has_permission(current_member, BoardPermission.FILE_DELETE):
             sio_event = {
                 "card_id": upload.card_id,
                 "list_id": upload.card.list_id,
@@ -932,6 +1081,7 @@ class CardFileUploadService:
             )
 
             upload.card.activities.append(activity)
+            upload.card.change_counters(file_upload_count=-1)
             db.session.delete(upload)
             db.session.commit()
 
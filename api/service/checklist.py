@@ -3,7 +3,6 @@ import typing
 import json
 
 from werkzeug.exceptions import Forbidden
-import sqlalchemy as sqla
 from marshmallow.exceptions import ValidationError
 
 from api.app import db, socketio
@@ -14,6 +13,8 @@ from api.model.board import BoardAllowedUser
 from api.model.card import BoardActivity, Card
 from api.model.checklist import CardChecklist, ChecklistItem
 from api.util.dto import ChecklistDTO, SIODTO, CardDTO
+from api.util import rank
+from api.util.permission import permission_resolver
 from api.socket import SIOEvent
 
 
@@ -25,10 +26,10 @@ class ChecklistService:
     def post(self, current_user: User, card_id: int, data: dict) -> CardChecklist:
         """Creates Checklist."""
         card: Card = Card.get_or_404(card_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             card.board_id, current_user.id)
 
-        if (current_member.has_permission(BoardPermission.CHECKLIST_CREATE)):
+        if (permission_resolver.has_permission(current_member, BoardPermission.CHECKLIST_CREATE)):
             # Create checklist
             checklist = CardChecklist(
                 card_id=card.id,
@@ -77,10 +78,10 @@ class ChecklistService:
     def patch(self, current_user: User, checklist_id: int, data: dict) -> CardChecklist:
         """Updates Checklist."""
         checklist: CardChecklist = CardChecklist.get_or_404(checklist_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             checklist.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CHECKLIST_EDIT):
+        if permission_resolver.has_permission(current_member, BoardPermission.CHECKLIST_EDIT):
             checklist.update(**data)
             db.session.commit()
 
@@ -101,16 +102,21 @@ class ChecklistService:
     def delete(self, current_user: User, checklist_id: int):
         """Deletes Checklist"""
         checklist: CardChecklist = CardChecklist.get_or_404(checklist_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             checklist.board_id, current_user.id)
 
-        if (current_member.has_permission(BoardPermission.CHECKLIST_EDIT)):
+        if (permission_resolver.has_permission(current_member, BoardPermission.CHECKLIST_EDIT)):
             sio_event = SIODTO.delete_event_scehma.dump({
                 "card_id": checklist.card_id,
                 "list_id": checklist.card.list_id,
                 "entity_id": checklist.id
             })
             title = checklist.title
+            checklist.card.change_counters(
+                checklist_total=-len(checklist.items),
+                checklist_completed=-len(
+                    [item for item in checklist.items if item.completed])
+            )
             db.session.delete(checklist)
 
             activity = BoardActivity(
@@ -153,10 +159,10 @@ class ChecklistItemService:
     def post(self, current_user: User, checklist_id: int, data: dict) -> ChecklistItem:
         """Creates ChecklistItem."""
         checklist: CardChecklist = CardChecklist.get_or_404(checklist_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             checklist.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CHECKLIST_EDIT):
+        if permission_resolver.has_permission(current_member, BoardPermission.CHECKLIST_EDIT):
             errors = {}
 
             # Validate some SQL sutff if required.
@@ -173,14 +179,11 @@ class ChecklistItemService:
                 **data
             )
 
-            # Calculate position
-            position_max = db.engine.execute(
-                f"SELECT MAX(position) FROM card_checklist_item WHERE checklist_id={checklist.id}"
-            ).fetchone()
-            if position_max[0] is not None:
-                item.position = position_max[0] + 1
-
             checklist.items.append(item)
+            checklist.card.change_counters(
+                checklist_total=1,
+                checklist_completed=1 if item.completed else 0
+            )
             # TODO: Create activity objects.
             db.session.commit()
 
@@ -231,6 +234,8 @@ class ChecklistItemService:
                 )
             )
             item.checklist.card.activities.append(activity)
+            item.checklist.card.change_counters(
+                checklist_completed=1 if data["completed"] else -1)
             activities.append(activity)
             # Update details
             if data["completed"]:
@@ -244,10 +249,10 @@ class ChecklistItemService:
     def patch(self, current_user: User, item_id: int, data: dict) -> ChecklistItem:
         """Updates ChecklistItem."""
         item: ChecklistItem = ChecklistItem.get_or_404(item_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             item.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CHECKLIST_EDIT):
+        if permission_resolver.has_permission(current_member, BoardPermission.CHECKLIST_EDIT):
             # User can update everything
 
             # SQL validation
@@ -281,7 +286,7 @@ class ChecklistItemService:
                 )
 
             return item
-        elif current_member.has_permission(BoardPermission.CHECKLIST_ITEM_MARK):
+        elif permission_resolver.has_permission(current_member, BoardPermission.CHECKLIST_ITEM_MARK):
             # Only allow marking for member
             activities = self.checklist_item_process_changes(
                 current_member, item, data)
@@ -312,16 +317,20 @@ class ChecklistItemService:
     def delete(self, current_user: User, item_id: int):
         """Deletes ChecklistItem"""
         item: ChecklistItem = ChecklistItem.get_or_404(item_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             item.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CHECKLIST_EDIT):
+        if permission_resolver.has_permission(current_member, BoardPermission.CHECKLIST_EDIT):
             sio_event = SIODTO.delete_checklist_event_schema.dump({
                 "checklist_id": item.checklist_id,
                 "list_id": item.checklist.card.list_id,
                 "card_id": item.checklist.card_id,
                 "entity_id": item.id
             })
+            item.checklist.card.change_counters(
+                checklist_total=-1,
+                checklist_completed=-1 if item.completed else 0
+            )
             db.session.delete(item)
             db.session.commit()
 
@@ -341,18 +350,14 @@ class ChecklistItemService:
         data: typing.List[int]
     ):
         checklist: CardChecklist = CardChecklist.get_or_404(checklist_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             checklist.board_id, current_user.id)
 
-        if current_member.has_permission(BoardPermission.CHECKLIST_EDIT):
-            for index, item in enumerate(data):
-                db.session.query(ChecklistItem).filter(
-                    sqla.and_(
-                        ChecklistItem.id == item,
-                        ChecklistItem.checklist_id == checklist.id
-                    )
-                ).update({"position": index})
-                db.session.commit()
+        if permission_resolver.has_permission(current_member, BoardPermission.CHECKLIST_EDIT):
+            changes = rank.reorder(ChecklistItem, checklist.id, data)
+            db.session.commit()
+            if rank.needs_rebalance(changes.values()):
+                rank.schedule_rebalance(ChecklistItem, checklist.id)
 
             socketio.emit(
                 SIOEvent.CHECKLIST_ITEM_UPDATE_ORDER.value,
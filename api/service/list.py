@@ -6,7 +6,7 @@ from werkzeug.exceptions import Forbidden
 from marshmallow.exceptions import ValidationError
 
 from api.app import db, socketio
-from api.model import BoardPermission, BoardActivityEvent
+from api.model import BoardPermission, BoardActivityEvent, BoardChangeOperation
 from api.model.user import User
 from api.model.board import BoardAllowedUser, Board
 from api.model.list import BoardList
@@ -14,35 +14,78 @@ from api.model.card import Card, BoardActivity
 from api.socket import SIOEvent
 
 from api.util.dto import ListDTO, BoardDTO
+from api.service.snapshot import snapshot_loader
+from api.util import rank
+from api.util.permission import permission_resolver
+from api.util.revision import mark_board_changed, record_board_change
 import sqlalchemy as sqla
 
 
 class ListService:
 
-    def get(self, current_user: User, board_id: int) -> typing.List[BoardList]:
+    def get(
+        self, current_user: User, board_id: int,
+        fieldset: typing.Optional[typing.List[str]] = None
+    ) -> typing.List[BoardList]:
         board = Board.get_or_404(board_id)
-        BoardAllowedUser.get_by_usr_or_403(
+        permission_resolver.get_member_or_403(
             board_id, current_user.id)
 
-        # Load cards into lists.
-        lists = []
-        for li in board.lists:
-            li.populate_listcards()
-            # self.populate_listcards(li)
-        return lists
+        # Load non-archived lists with cards.
+        return snapshot_loader.load_lists(
+            board.id, set(fieldset) if fieldset else None)
+
+    def get_cards(self, current_user: User, list_id: int, args: dict) -> dict:
+        """Gets a page of non-archived cards of the list. Cards are paged
+        by rank (keyset), so deep pages cost the same as the first.
+
+        Args:
+            current_user (User): Current logged in user
+            list_id (int): List id
+            args (dict): Args got from query (after_rank, after_id, limit)
+
+        Returns:
+            dict: Cards as items and has_more
+        """
+        board_list: BoardList = BoardList.get_or_404(list_id)
+        permission_resolver.get_member_or_403(
+            board_list.board_id, current_user.id)
+
+        query = Card.query.filter(
+            sqla.and_(
+                Card.list_id == board_list.id,
+                Card.archived == False
+            )
+        )
+        if args.get("after_rank") is not None:
+            after_rank = args["after_rank"]
+            if args.get("after_id") is None:
+                query = query.filter(Card.rank > after_rank)
+            else:
+                # Concurrent appends may share a rank, id breaks ties.
+                query = query.filter(sqla.or_(
+                    Card.rank > after_rank,
+                    sqla.and_(Card.rank == after_rank,
+                              Card.id > args["after_id"])
+                ))
+
+        fieldset = set(args["fieldset"]) if args.get("fieldset") else None
+        cards = query.options(
+            *snapshot_loader.card_options(fieldset)
+        ).order_by(
+            Card.rank.asc(), Card.id.asc()
+        ).limit(args["limit"] + 1).all()
+        return {
+            "items": cards[:args["limit"]],
+            "has_more": len(cards) > args["limit"]
+        }
 
     def post(self, current_user: User, board_id: int, data: dict) -> BoardList:
         board: Board = Board.get_or_404(board_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             board_id, current_user.id)
-        if current_member.has_permission(BoardPermission.LIST_CREATE):
-            position_max = db.engine.execute(
-                f"SELECT MAX(position) FROM list WHERE board_id={board.id}"
-            ).fetchone()
-
+        if permission_resolver.has_permission(current_member, BoardPermission.LIST_CREATE):
             boardlist = BoardList(**data)
-            if position_max[0] is not None:
-                boardlist.position = position_max[0] + 1
             board.lists.append(boardlist)
 
             board.activities.append(
@@ -96,6 +139,7 @@ class ListService:
                 Card.archived == False
             )
         ).update({"archived_by_list": True, "archived_on": datetime.utcnow()})
+        mark_board_changed(board_list.board_id)
 
         db.session.commit()
 
@@ -136,6 +180,9 @@ class ListService:
                 Card.archived == False
             )
         ).update({"archived_by_list": False, "archived_on": None})
+        # Cards of the list reappear, clients have to reload the board.
+        record_board_change(board_list.board_id, "board", board_list.board_id,
+                            BoardChangeOperation.RESET)
         db.session.commit()
 
         # Load cards into boardlist
@@ -157,18 +204,15 @@ class ListService:
     def patch(self, current_user: User, list_id: int, data: dict) -> BoardList:
         board_list: BoardList = BoardList.get_or_404(list_id)
 
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             board_list.board_id, current_user.id)
 
-        # self.populate_listcards(board_list)
-        board_list.populate_listcards()
-
-        if current_member.has_permission(BoardPermission.LIST_EDIT):
+        if permission_resolver.has_permission(current_member, BoardPermission.LIST_EDIT):
             old_title = board_list.title
 
             if board_list.wip_limit != data.get("wip_limit", board_list.wip_limit):
                 # Check if the WIP limit reached with the new value
-                if data["wip_limit"] < len(board_list.cards) and data["wip_limit"] != -1:
+                if data["wip_limit"] > 0 and data["wip_limit"] < board_list.card_count:
                     raise ValidationError(
                         {"wip_limit": "WIP limit cannot be lower than already assigned cards count to this list!"})
 
@@ -211,9 +255,9 @@ class ListService:
 
     def delete(self, current_user: User, list_id: int):
         board_list: BoardList = BoardList.get_or_404(list_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             board_list.board_id, current_user.id)
-        if current_member.has_permission(BoardPermission.LIST_DELETE):
+        if permission_resolver.has_permission(current_member, BoardPermission.LIST_DELETE):
             if not board_list.archived:
                 self.archive_list(current_member, board_list)
             else:
@@ -231,14 +275,13 @@ class ListService:
 
     def update_cards_position(self, current_user: User, list_id: int, data: typing.List[int]):
         board_list = BoardList.get_or_404(list_id)
-        current_member = BoardAllowedUser.get_by_usr_or_403(
+        current_member = permission_resolver.get_member_or_403(
             board_list.board_id, current_user.id)
-        if current_member.has_permission(BoardPermission.LIST_EDIT):
-            for index, item in enumerate(data):
-                db.session.query(Card).filter(
-                    sqla.and_(Card.id == item, Card.list_id == board_list.id)
-                ).update({"position": index})
+        if permission_resolver.has_permission(current_member, BoardPermission.LIST_EDIT):
+            changes = rank.reorder(Card, board_list.id, data)
             db.session.commit()
+            if rank.needs_rebalance(changes.values()):
+                rank.schedule_rebalance(Card, board_list.id)
 
             socketio.emit(
                 SIOEvent.CARD_UPDATE_ORDER.value,
@@ -247,5 +290,36 @@ class ListService:
                 to=f"board-{board_list.board_id}"
             )
 
+    def recount_cards(self, board_id: int = None) -> int:
+        """Recomputes card_count of lists from the card table with one
+        set-based update. Used to repair counters.
+
+        Args:
+            board_id (int, optional): Only recount lists of board.
+                Defaults to None (all lists).
+
+        Returns:
+            int: Count of updated lists
+        """
+        card_count = sqla.select(sqla.func.count(Card.id)).where(
+            Card.list_id == BoardList.id,
+            Card.archived == False
+        ).scalar_subquery()
+
+        query = db.session.query(BoardList).filter(
+            BoardList.card_count != card_count)
+        if board_id is not None:
+            query = query.filter(BoardList.board_id == board_id)
+        board_ids = [row[0] for row in query.with_entities(BoardList.board_id).distinct()]
+
+        updated = query.update(
+            {"card_count": card_count}, synchronize_session=False)
+        # Bulk update isn't journaled, clients of the boards reload.
+        for changed_board_id in board_ids:
+            record_board_change(changed_board_id, "board", changed_board_id,
+                                BoardChangeOperation.RESET)
+        db.session.commit()
+        return updated
+
 
 list_service = ListService()
@@ -0,0 +1,156 @@
+import typing
+
+import sqlalchemy as sqla
+import sqlalchemy.orm as sqla_orm
+from flask import current_app
+from sqlalchemy.orm.attributes import set_committed_value
+
+from api.app import db
+from api.model.board import Board, BoardAllowedUser
+from api.model.card import Card, CardMember
+from api.model.list import BoardList
+
+# Sparse fieldset, dotted field names relative to the loaded entity.
+Fieldset = typing.Optional[typing.Set[str]]
+# Card columns always loaded, required to group and order cards.
+CARD_REQUIRED_COLUMNS = ("id", "list_id", "board_id", "rank")
+
+
+def wants(fieldset: Fieldset, name: str) -> bool:
+    """Checks if field (or any of its nested fields) is in fieldset."""
+    return fieldset is None or name in fieldset or \
+        any(field.startswith(f"{name}.") for field in fieldset)
+
+
+def subfields(fieldset: Fieldset, name: str) -> Fieldset:
+    """Gets fieldset of a nested field, None if every field is required."""
+    if fieldset is None or name in fieldset:
+        return None
+    return {
+        field[len(name) + 1:] for field in fieldset
+        if field.startswith(f"{name}.")
+    }
+
+
+class BoardSnapshotLoader:
+    """
+    Loads the non-archived graph of a board (lists, cards and everything
+    the board view serializes for cards) with a fixed number of queries.
+
+    The query count does not depend on the count of lists or cards:
+        1. lists of board
+        2. cards of non-archived lists
+        3. card members (joined with board user and user),
+        4. card dates
+    Badge counts (comments, files, checklist progress) are card columns.
+    Only the first BOARD_LIST_CARD_WINDOW cards of each list are loaded,
+    the rest is paged with the list cards endpoint.
+    With a sparse fieldset only the requested relations and card columns
+    are loaded.
+    """
+
+    def card_options(self, fieldset: Fieldset = None) -> typing.List[sqla_orm.Load]:
+        """Eager load options for cards shown on the board view.
+
+        Args:
+            fieldset (Fieldset, optional): Card fields to load.
+                Defaults to None (all fields).
+        """
+        options = []
+        if wants(fieldset, "assigned_members"):
+            options.append(sqla_orm.selectinload(Card.assigned_members).joinedload(
+                CardMember.board_user).joinedload(BoardAllowedUser.user))
+        if wants(fieldset, "dates"):
+            options.append(sqla_orm.selectinload(Card.dates))
+        if fieldset is not None:
+            columns = {attr.key for attr in sqla.inspect(Card).column_attrs}
+            options.append(sqla_orm.load_only(*(
+                columns & fieldset | set(CARD_REQUIRED_COLUMNS)
+            )))
+        return options
+
+    def _windowed_cards(
+        self, filters, window: int, fieldset: Fieldset
+    ) -> typing.List[Card]:
+        """Loads the first cards of each list, ranked in one query with
+        a window function.
+        """
+        ranked = db.session.query(
+            Card.id.label("card_id"),
+            sqla.func.row_number().over(
+                partition_by=Card.list_id,
+                order_by=(Card.rank.asc(), Card.id.asc())
+            ).label("card_rank")
+        ).filter(filters).subquery()
+
+        return Card.query.join(
+            ranked, ranked.c.card_id == Card.id
+        ).filter(
+            ranked.c.card_rank <= window
+        ).options(
+            *self.card_options(fieldset)
+        ).order_by(Card.rank.asc(), Card.id.asc()).all()
+
+    def load_lists(self, board_id: int, fieldset: Fieldset = None) -> typing.List[BoardList]:
+        """Loads non-archived lists of board with their non-archived cards.
+
+        Args:
+            board_id (int): Board id
+            fieldset (Fieldset, optional): List fields to load (cards.title).
+                Defaults to None (all fields).
+
+        Returns:
+            typing.List[BoardList]: Lists ordered by rank, cards populated.
+        """
+        lists: typing.List[BoardList] = BoardList.query.filter(
+            sqla.and_(
+                BoardList.board_id == board_id,
+                BoardList.archived == False
+            )
+        ).order_by(BoardList.rank.asc(), BoardList.id.asc()).all()
+
+        cards_by_list = {li.id: [] for li in lists}
+        if lists and wants(fieldset, "cards"):
+            window = current_app.config.get("BOARD_LIST_CARD_WINDOW", 0)
+            filters = sqla.and_(
+                Card.board_id == board_id,
+                Card.list_id.in_(list(cards_by_list.keys())),
+                Card.archived == False
+            )
+            if window:
+                rows = self._windowed_cards(
+                    filters, window, subfields(fieldset, "cards"))
+            else:
+                rows = Card.query.filter(
+                    filters
+                ).options(
+                    *self.card_options(subfields(fieldset, "cards"))
+                ).order_by(Card.rank.asc(), Card.id.asc()).all()
+
+            for card in rows:
+                cards_by_list[card.list_id].append(card)
+
+        # Populate without marking the relationships as modified.
+        for li in lists:
+            set_committed_value(li, "cards", cards_by_list[li.id])
+        return lists
+
+    def load(self, board: Board, fieldset: Fieldset = None) -> Board:
+        """Populates board with the non-archived lists and cards.
+
+        Args:
+            board (Board): Board to populate
+            fieldset (Fieldset, optional): Board fields to load
+                (lists.cards.title). Defaults to None (all fields).
+
+        Returns:
+            Board: Same board object with lists populated.
+        """
+        lists = []
+        if wants(fieldset, "lists"):
+            lists = self.load_lists(board.id, subfields(fieldset, "lists"))
+        set_committed_value(board, "lists", lists)
+        return board
+
+
+snapshot_loader = BoardSnapshotLoader()
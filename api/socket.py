@@ -1,7 +1,11 @@
 import enum
-from flask_socketio import Namespace, join_room, leave_room, rooms
-from flask_jwt_extended import current_user, jwt_required
-from flask import current_app
+import time
+
+from flask_socketio import Namespace, disconnect, join_room, leave_room, rooms
+from flask_jwt_extended import current_user, get_jwt, jwt_required
+from flask import current_app, session
+
+from api.app import db, socketio
 
 
 class SIOEvent(enum.Enum):
@@ -18,6 +22,7 @@ class SIOEvent(enum.Enum):
     CARD_DELETE = "card.delete"
 
     CARD_UPDATE_ORDER = "card.update.order"
+    CARD_MOVE = "card.move"
 
     CARD_MEMBER_ASSIGNED = "card.member.assigned"
     CARD_MEMBER_DEASSIGNED = "card.member.deassigned"
@@ -51,19 +56,125 @@ class SIOEvent(enum.Enum):
     FILE_UPLOAD = "file.upload"
     FILE_DELETE = "file.delete"
 
+    # Connection closed by the server, client should reconnect
+    # (reason: expired, revoked or membership).
+    SESSION_RESET = "session.reset"
+
+
+def user_room(user_id: int) -> str:
+    return f"user-{user_id}"
+
+
+def token_room(jti: str) -> str:
+    return f"token-{jti}"
+
+
+def reset_user_sessions(user_id: int, reason: str):
+    """Closes Socket.IO connections of user, so reconnecting clients
+    authenticate again and resolve their boards. Called when every token
+    of the user is revoked or board access of the user changes.
+
+    Args:
+        user_id (int): User id
+        reason (str): Reason sent to the client
+    """
+    _reset_room_sessions(user_room(user_id), reason)
+
+
+def reset_token_sessions(jti: str, reason: str):
+    """Closes Socket.IO connections authenticated with token, connections
+    of the user with other tokens (other devices) are kept.
+
+    Args:
+        jti (str): Token id
+        reason (str): Reason sent to the client
+    """
+    _reset_room_sessions(token_room(jti), reason)
+
+
+def _reset_room_sessions(room: str, reason: str):
+    socketio.emit(SIOEvent.SESSION_RESET.value, {"reason": reason},
+                  namespace="/board", to=room)
+    server = getattr(socketio, "server", None)
+    if server is None:
+        return
+    # Connections of this worker, the message queue doesn't forward
+    # disconnects.
+    try:
+        participants = list(server.manager.get_participants("/board", room))
+    except KeyError:
+        # Nobody connected to the namespace yet.
+        return
+    for sid, _ in participants:
+        server.disconnect(sid, namespace="/board")
+
 
 class BoardNamespace(Namespace):
+    """
+    Board events. The identity and the boards of the user are resolved
+    once on connect and kept in the Socket.IO session, later events are
+    checked against it without decoding cookies or querying. Boards not
+    known on connect (e.g. created since) are looked up in the database
+    and added on access. Revocation and board access changes close the
+    connection (reset_token_sessions, reset_user_sessions), expiry is
+    checked from the stored token expiry.
+    """
 
     @jwt_required()
     def on_connect(self):
+        from api.model.board import BoardAllowedUser
+        token = get_jwt()
+        session["user_id"] = current_user.id
+        session["exp"] = token["exp"]
+        session["jti"] = token["jti"]
+        session["board_ids"] = {
+            board_id for board_id, in db.session.query(
+                BoardAllowedUser.board_id
+            ).filter(
+                BoardAllowedUser.user_id == current_user.id,
+                BoardAllowedUser.is_deleted == False
+            )
+        }
+        join_room(user_room(current_user.id))
+        join_room(token_room(token["jti"]))
         current_app.logger.debug(
             f"Client connected identity: {current_user.username}.")
 
     def on_disconnect(self):
         current_app.logger.debug("Client disconnected.")
 
-    @jwt_required()
+    def _check_session(self) -> bool:
+        if "user_id" not in session:
+            disconnect()
+            return False
+        if session["exp"] <= time.time():
+            self.emit(SIOEvent.SESSION_RESET.value, {"reason": "expired"})
+            disconnect()
+            return False
+        return True
+
+    def _can_access(self, board_id) -> bool:
+        from api.model.board import BoardAllowedUser
+        try:
+            board_id = int(board_id)
+        except (TypeError, ValueError):
+            return False
+        if board_id in session["board_ids"]:
+            return True
+        # Board created or joined since connect. Losing access closes the
+        # connection, so granted boards are kept until reconnect.
+        allowed = db.session.query(BoardAllowedUser.id).filter(
+            BoardAllowedUser.board_id == board_id,
+            BoardAllowedUser.user_id == session["user_id"],
+            BoardAllowedUser.is_deleted == False
+        ).first() is not None
+        if allowed:
+            session["board_ids"].add(board_id)
+        return allowed
+
     def on_board_change(self, data):
+        if not self._check_session() or not self._can_access(data.get("board_id")):
+            return
         room_name = f"board-{data['board_id']}"
         current_app.logger.debug(
             f"Subscribing to new board events: {data}")
@@ -77,8 +188,14 @@ class BoardNamespace(Namespace):
         join_room(room_name)
         current_app.logger.debug(rooms())
 
-    @jwt_required()
     def on_card_change(self, data):
+        from api.model.card import Card
+        if not self._check_session():
+            return
+        board_id = db.session.query(Card.board_id).filter(
+            Card.id == data.get("card_id")).scalar()
+        if not self._can_access(board_id):
+            return
         room_name = f"card-{data['card_id']}"
         current_app.logger.debug(f"Subscribing to new card events: {data}")
         # Leave all other card rooms
@@ -0,0 +1,11 @@
+from api.app import celery
+from api.util import rank
+
+
+@celery.task(bind=True)
+def rebalance_ranks(self, table_name: str, parent_id: int):
+    model = next(
+        model for model in rank.RANKED_MODELS
+        if model.__tablename__ == table_name
+    )
+    return rank.rebalance(model, parent_id)
@@ -0,0 +1,12 @@
+from flask import current_app
+
+from api.app import celery
+from api.model.user import Token
+
+
+@celery.task(bind=True)
+def prune_expired_tokens(self):
+    return Token.prune_expired(
+        batch_size=current_app.config["TOKEN_PRUNE_BATCH_SIZE"],
+        max_batches=current_app.config["TOKEN_PRUNE_MAX_BATCHES"] or None
+    )
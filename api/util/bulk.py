@@ -0,0 +1,62 @@
+import typing
+
+import sqlalchemy as sqla
+
+from api.app import db
+
+# Rows per statement, keeps SQLite under its bound parameter limit.
+BULK_CHUNK_SIZE = 1000
+
+
+def bulk_reposition(
+    model: typing.Type[db.Model],
+    column: str,
+    values: typing.Mapping[int, typing.Any],
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> int:
+    """Sets column of many rows by id with one set-based UPDATE per chunk
+    in the current transaction, instead of one UPDATE per row.
+
+    On PostgreSQL the values are joined as a VALUES list
+    (UPDATE ... FROM (VALUES ...)) and rows already holding their value
+    are skipped; other databases use a CASE expression.
+
+    Args:
+        model (typing.Type[db.Model]): Model with integer id primary key
+        column (str): Column to set, e.g. rank
+        values (typing.Mapping[int, typing.Any]): New values by row id
+        chunk_size (int, optional): Rows per statement.
+            Defaults to BULK_CHUNK_SIZE.
+
+    Returns:
+        int: Count of updated rows
+    """
+    table = model.__table__
+    target = table.c[column]
+    items = list(values.items())
+    use_values = db.engine.dialect.name == "postgresql"
+
+    updated = 0
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start:start + chunk_size]
+        if use_values:
+            new_values = sqla.values(
+                sqla.column("id", sqla.Integer),
+                sqla.column("value", target.type),
+                name="new_values"
+            ).data(chunk)
+            stmt = table.update().where(
+                sqla.and_(
+                    table.c.id == new_values.c.id,
+                    target.is_distinct_from(new_values.c.value)
+                )
+            ).values({column: new_values.c.value})
+        else:
+            stmt = table.update().where(
+                table.c.id.in_([id for id, _ in chunk])
+            ).values({
+                column: sqla.case(dict(chunk), value=table.c.id)
+            })
+        updated += db.session.execute(
+            stmt.execution_options(synchronize_session=False)).rowcount
+    return updated
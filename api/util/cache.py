@@ -0,0 +1,589 @@
+import gzip
+import json
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+from flask import Flask, Response, current_app, request
+
+
+def redis_call(client, fn: typing.Callable, default=None, name: str = "Cache"):
+    """Runs a Redis command, falls back to default if Redis unavailable."""
+    import redis
+    try:
+        return fn(client)
+    except redis.RedisError:
+        current_app.logger.exception(f"{name}: Redis unavailable")
+        return default
+
+
+class CachedSnapshot:
+    """Serialized board snapshot, optionally stored gzip compressed."""
+
+    __slots__ = ("data", "gzipped")
+
+    def __init__(self, data: bytes, gzipped: bool = False):
+        self.data = data
+        self.gzipped = gzipped
+
+    def to_response(self) -> Response:
+        """Creates response from cached bytes without re-encoding.
+        Compressed data sent as is when the client accepts gzip.
+        """
+        if not self.gzipped:
+            return Response(self.data, mimetype="application/json")
+
+        if "gzip" in request.accept_encodings:
+            resp = Response(self.data, mimetype="application/json")
+            resp.headers["Content-Encoding"] = "gzip"
+            resp.vary.add("Accept-Encoding")
+            return resp
+        return Response(gzip.decompress(self.data), mimetype="application/json")
+
+
+class BoardSnapshotCache:
+    """
+    Caches serialized board snapshots keyed by board id, board revision
+    and fieldset variant (see serializer.fieldset_key).
+
+    Entries are kept in a local LRU, with an optional Redis tier shared
+    between workers (BOARD_CACHE_REDIS_URL). Since the revision is part of
+    the key, a changed board never returns stale data: writers only have to
+    bump Board.revision, old entries age out.
+    """
+
+    def __init__(self, app: Flask = None):
+        self.enabled = False
+        self.size = 0
+        self.ttl = 0
+        self.compress_level = 0
+        self._redis = None
+        self._lock = threading.Lock()
+        self._entries: typing.OrderedDict[typing.Tuple[int, int, str],
+                                          CachedSnapshot] = OrderedDict()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask):
+        self.enabled = app.config.get("BOARD_CACHE_ENABLED", True)
+        self.size = app.config.get("BOARD_CACHE_SIZE", 64)
+        self.ttl = app.config.get("BOARD_CACHE_TTL", 3600)
+        self.compress_level = app.config.get("BOARD_CACHE_COMPRESS_LEVEL", 0)
+
+        self._redis = None
+        if app.config.get("BOARD_CACHE_REDIS_URL"):
+            import redis
+            self._redis = redis.Redis.from_url(
+                app.config["BOARD_CACHE_REDIS_URL"])
+
+        with self._lock:
+            self._entries.clear()
+        app.extensions["board_cache"] = self
+
+    def _redis_call(self, fn: typing.Callable, default=None):
+        return redis_call(self._redis, fn, default, "Board cache")
+
+    def evict(self, board_ids: typing.Iterable[int]):
+        """Drops local entries of changed boards to free memory.
+
+        Args:
+            board_ids (typing.Iterable[int]): Changed boards
+        """
+        board_ids = set(board_ids)
+        if not board_ids:
+            return
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in board_ids]:
+                del self._entries[key]
+
+    @staticmethod
+    def _redis_key(board_id: int, revision: int, variant: str) -> str:
+        key = f"board-snapshot:{board_id}:{revision}"
+        return f"{key}:{variant}" if variant else key
+
+    def get(
+        self, board_id: int, revision: int, variant: str = ""
+    ) -> typing.Optional[CachedSnapshot]:
+        """Gets cached snapshot for board revision.
+
+        Returns:
+            typing.Optional[CachedSnapshot]: Snapshot or None on cache miss.
+        """
+        if not self.enabled:
+            return None
+        key = (board_id, revision, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        if self._redis is not None:
+            data = self._redis_call(
+                lambda r: r.get(self._redis_key(board_id, revision, variant)))
+            if data:
+                entry = CachedSnapshot(data[1:], data[:1] == b"z")
+                self._store_local(key, entry)
+                return entry
+        return None
+
+    def set(
+        self, board_id: int, revision: int, data: dict, variant: str = ""
+    ) -> CachedSnapshot:
+        """Encodes dumped board and stores it for revision.
+
+        Args:
+            board_id (int): Board id
+            revision (int): Revision the data belongs to
+            data (dict): Dumped board
+            variant (str, optional): Fieldset variant. Defaults to "".
+
+        Returns:
+            CachedSnapshot: Encoded snapshot
+        """
+        payload = f"{current_app.json.dumps(data)}\n".encode()
+        if self.compress_level:
+            entry = CachedSnapshot(
+                gzip.compress(payload, self.compress_level), True)
+        else:
+            entry = CachedSnapshot(payload)
+
+        if not self.enabled:
+            return entry
+
+        self._store_local((board_id, revision, variant), entry)
+        if self._redis is not None:
+            # First byte marks if data is compressed.
+            self._redis_call(lambda r: r.set(
+                self._redis_key(board_id, revision, variant),
+                (b"z" if entry.gzipped else b"r") + entry.data,
+                ex=self.ttl
+            ))
+        return entry
+
+    def _store_local(self, key: typing.Tuple[int, int, str], entry: CachedSnapshot):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+class PermissionCache:
+    """
+    Caches resolved board members with the permission mask of their role,
+    keyed by board id and user id.
+
+    With PERMISSION_CACHE_REDIS_URL the entries are kept in Redis (one key
+    per member with its own TTL) and shared between workers. Without Redis
+    invalidations can't reach other workers, so the cache is disabled
+    unless PERMISSION_CACHE_LOCAL allows a local LRU per worker.
+
+    Every key includes a generation of its board and a global one.
+    Invalidation bumps the generation instead of deleting entries, so an
+    entry read from the database before an invalidation and stored after
+    it lands under the old generation and is never read. Services
+    invalidate entries when membership or roles change, the TTL bounds
+    staleness of changes made outside of the services.
+    """
+    GENERATION_KEY = "board-permissions-gen"
+
+    def __init__(self, app: Flask = None):
+        self.enabled = False
+        self.size = 0
+        self.ttl = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._redis = None
+        self._lock = threading.Lock()
+        self._entries: typing.OrderedDict[typing.Tuple[str, str],
+                                          typing.Tuple[float, dict]] = OrderedDict()
+        self._generation = 0
+        self._board_generations: typing.Dict[str, int] = {}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask):
+        self.size = app.config.get("PERMISSION_CACHE_SIZE", 4096)
+        self.ttl = app.config.get("PERMISSION_CACHE_TTL", 300)
+
+        self._redis = None
+        if app.config.get("PERMISSION_CACHE_REDIS_URL"):
+            import redis
+            self._redis = redis.Redis.from_url(
+                app.config["PERMISSION_CACHE_REDIS_URL"])
+        self.enabled = app.config.get("PERMISSION_CACHE_ENABLED", True) and (
+            self._redis is not None or
+            app.config.get("PERMISSION_CACHE_LOCAL", False)
+        )
+
+        with self._lock:
+            self._entries.clear()
+            self._board_generations.clear()
+            self.hits = self.misses = self.invalidations = 0
+        app.extensions["permission_cache"] = self
+
+    def _redis_call(self, fn: typing.Callable, default=None):
+        return redis_call(self._redis, fn, default, "Permission cache")
+
+    @classmethod
+    def _generation_key(cls, board_id) -> str:
+        return f"{cls.GENERATION_KEY}:{board_id}"
+
+    @staticmethod
+    def _redis_key(board_id, user_id, version: str) -> str:
+        return f"board-permissions:{board_id}:{version}:{user_id}"
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, board_id, user_id) -> typing.Tuple[typing.Optional[dict], str]:
+        """Gets cached member entry and the version of the board entries.
+        Read the database on a miss and pass the version to set.
+
+        Returns:
+            typing.Tuple[typing.Optional[dict], str]: Entry or None on cache
+                miss, version
+        """
+        if not self.enabled:
+            return None, ""
+
+        if self._redis is not None:
+            generations = self._redis_call(lambda r: r.mget(
+                self.GENERATION_KEY, self._generation_key(board_id)))
+            if generations is None:
+                return None, ""
+            version = ".".join(str(int(gen or 0)) for gen in generations)
+            data = self._redis_call(
+                lambda r: r.get(self._redis_key(board_id, user_id, version)))
+            self._count(data is not None)
+            return (json.loads(data) if data is not None else None), version
+
+        key = (str(board_id), str(user_id))
+        with self._lock:
+            version = self._local_version(key[0])
+            expires, entry = self._entries.get(key, (0, None))
+            if entry is not None and expires < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        self._count(entry is not None)
+        return entry, version
+
+    def _local_version(self, board_id: str) -> str:
+        return f"{self._generation}.{self._board_generations.get(board_id, 0)}"
+
+    def set(self, board_id, user_id, entry: dict, version: str):
+        """Stores member entry, skipped if the board was invalidated since
+        the lookup returning version.
+
+        Args:
+            board_id: Board id
+            user_id: User id
+            entry (dict): JSON serializable member entry
+            version (str): Version returned by lookup
+        """
+        if not self.enabled or not version:
+            return
+
+        if self._redis is not None:
+            # Stale versions are written to keys nobody reads.
+            self._redis_call(lambda r: r.set(
+                self._redis_key(board_id, user_id, version),
+                json.dumps(entry), ex=self.ttl))
+            return
+
+        key = (str(board_id), str(user_id))
+        with self._lock:
+            if self._local_version(key[0]) != version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, board_id, user_id=None):
+        """Drops entries of board by bumping its generation. The user
+        is not used by the cache, every member of the board is dropped.
+
+        Args:
+            board_id: Board id
+            user_id (optional): User id. Defaults to None (every member).
+        """
+        with self._lock:
+            self.invalidations += 1
+            board_id = str(board_id)
+            self._board_generations[board_id] = \
+                self._board_generations.get(board_id, 0) + 1
+            for key in [k for k in self._entries if k[0] == board_id]:
+                del self._entries[key]
+
+        if self._redis is not None:
+            self._redis_call(lambda r: r.incr(self._generation_key(board_id)))
+
+    def clear(self):
+        """Drops entries of every board, e.g. after role masks were
+        rewritten with bulk updates."""
+        with self._lock:
+            self.invalidations += 1
+            self._generation += 1
+            self._entries.clear()
+
+        if self._redis is not None:
+            self._redis_call(lambda r: r.incr(self.GENERATION_KEY))
+
+    def stats(self) -> dict:
+        """Gets hit/miss counters of this worker."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+
+class RevocationStore:
+    """
+    Revoked JWT ids for the token_in_blocklist check.
+
+    With AUTH_CACHE_REDIS_URL revoked ids are kept in Redis for
+    REVOCATION_TTL (the longest token lifetime) and a check is a single
+    Redis round trip. The store is trusted only while its sync marker
+    exists, i.e. it was filled from the database (see sync), otherwise
+    and without Redis the check goes to the database. Revocations seen
+    by this worker are remembered locally.
+    """
+    SYNC_KEY = "revoked-jti:synced"
+
+    def __init__(self, app: Flask = None):
+        self.ttl = 0
+        self._redis = None
+        self._lock = threading.Lock()
+        self._revoked: typing.Dict[str, float] = {}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask):
+        self.ttl = int(app.config.get("REVOCATION_TTL", 730 * 24 * 3600))
+
+        self._redis = None
+        if app.config.get("AUTH_CACHE_REDIS_URL"):
+            import redis
+            self._redis = redis.Redis.from_url(
+                app.config["AUTH_CACHE_REDIS_URL"])
+
+        with self._lock:
+            self._revoked.clear()
+        app.extensions["revocation_store"] = self
+
+    def _redis_call(self, fn: typing.Callable, default=None):
+        return redis_call(self._redis, fn, default, "Revocation store")
+
+    @staticmethod
+    def _redis_key(jti: str) -> str:
+        return f"revoked-jti:{jti}"
+
+    def _remember(self, jtis: typing.Iterable[str]):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for jti in jtis:
+                self._revoked[jti] = expires
+
+    def is_revoked(self, jti: str, load: typing.Callable[[str], bool]) -> bool:
+        """Checks if token revoked.
+
+        Args:
+            jti (str): Token id
+            load (typing.Callable[[str], bool]): Checks revocation in the
+                database, used when the store can't answer.
+
+        Returns:
+            bool: Token revoked
+        """
+        with self._lock:
+            if self._revoked.get(jti, 0) > time.monotonic():
+                return True
+
+        if self._redis is not None:
+            def check(r):
+                pipe = r.pipeline()
+                pipe.exists(self.SYNC_KEY)
+                pipe.exists(self._redis_key(jti))
+                return pipe.execute()
+            synced, revoked = self._redis_call(check, (0, 0))
+            if synced:
+                if revoked:
+                    self._remember((jti,))
+                return bool(revoked)
+
+        revoked = load(jti)
+        if revoked:
+            self._remember((jti,))
+        return revoked
+
+    def revoke(self, jtis: typing.Iterable[str]):
+        """Adds revoked token ids, call after the revocation committed.
+
+        Args:
+            jtis (typing.Iterable[str]): Revoked token ids
+        """
+        jtis = list(jtis)
+        if not jtis:
+            return
+        self._remember(jtis)
+        if self._redis is not None:
+            def store(r):
+                pipe = r.pipeline()
+                for jti in jtis:
+                    pipe.set(self._redis_key(jti), 1, ex=self.ttl)
+                pipe.execute()
+            if self._redis_call(store, False) is False:
+                # Other workers can't see this revocation, make them
+                # check the database until the store is synced again.
+                self._redis_call(lambda r: r.delete(self.SYNC_KEY))
+
+    def needs_sync(self) -> bool:
+        """Checks if the Redis store has to be filled from the database."""
+        if self._redis is None:
+            return False
+        return not self._redis_call(lambda r: r.exists(self.SYNC_KEY), 0)
+
+    def sync(self, jtis: typing.Iterable[str]):
+        """Fills Redis with every revoked token id from the database
+        and marks the store trusted.
+
+        Args:
+            jtis (typing.Iterable[str]): All revoked, unexpired token ids
+        """
+        if self._redis is None:
+            return
+
+        def store(r):
+            pipe = r.pipeline()
+            for jti in jtis:
+                pipe.set(self._redis_key(jti), 1, ex=self.ttl)
+            pipe.set(self.SYNC_KEY, 1)
+            pipe.execute()
+        self._redis_call(store)
+
+
+class IdentityCache:
+    """
+    Short lived cache of user rows (with role names) for the JWT user
+    lookup. Entries are kept in Redis with AUTH_CACHE_REDIS_URL, otherwise
+    in a local LRU. Changed users are invalidated on commit, IDENTITY_CACHE_TTL
+    bounds staleness in other workers without Redis.
+    """
+
+    def __init__(self, app: Flask = None):
+        self.enabled = False
+        self.size = 0
+        self.ttl = 0
+        self.hits = 0
+        self.misses = 0
+        self._redis = None
+        self._lock = threading.Lock()
+        self._entries: typing.OrderedDict[str, typing.Tuple[float, dict]] = OrderedDict()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask):
+        self.ttl = app.config.get("IDENTITY_CACHE_TTL", 30)
+        self.enabled = self.ttl > 0
+        self.size = app.config.get("IDENTITY_CACHE_SIZE", 4096)
+
+        self._redis = None
+        if app.config.get("AUTH_CACHE_REDIS_URL"):
+            import redis
+            self._redis = redis.Redis.from_url(
+                app.config["AUTH_CACHE_REDIS_URL"])
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+        app.extensions["identity_cache"] = self
+
+    def _redis_call(self, fn: typing.Callable, default=None):
+        return redis_call(self._redis, fn, default, "Identity cache")
+
+    @staticmethod
+    def _redis_key(user_id) -> str:
+        return f"identity:{user_id}"
+
+    def get(self, user_id) -> typing.Optional[dict]:
+        """Gets cached user entry.
+
+        Returns:
+            typing.Optional[dict]: Entry or None on cache miss.
+        """
+        if not self.enabled:
+            return None
+
+        if self._redis is not None:
+            data = self._redis_call(lambda r: r.get(self._redis_key(user_id)))
+            entry = json.loads(data) if data is not None else None
+        else:
+            key = str(user_id)
+            with self._lock:
+                expires, entry = self._entries.get(key, (0, None))
+                if entry is not None and expires < time.monotonic():
+                    del self._entries[key]
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+
+        with self._lock:
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry
+
+    def set(self, user_id, entry: dict):
+        """Stores JSON serializable user entry."""
+        if not self.enabled:
+            return
+
+        if self._redis is not None:
+            self._redis_call(lambda r: r.set(
+                self._redis_key(user_id), json.dumps(entry), ex=self.ttl))
+            return
+
+        key = str(user_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids: typing.Iterable):
+        """Drops entries of changed users."""
+        keys = [str(user_id) for user_id in user_ids]
+        if not keys:
+            return
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        if self._redis is not None:
+            self._redis_call(lambda r: r.delete(
+                *(self._redis_key(key) for key in keys)))
+
+    def stats(self) -> dict:
+        """Gets hit/miss counters of this worker."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._entries)}
@@ -1,21 +1,24 @@
 from api.util import schemas
+from api.util.serializer import FastSchema
 
 
 class CardDTO:
-    card_schema = schemas.CardSchema()
+    card_schema = FastSchema(schemas.CardSchema())
     update_card_schema = schemas.CardSchema()
 
     comment_schema = schemas.CardCommentSchema()
 
-    activity_schema = schemas.BoardActivitySchema()
-    activity_paginated_schema = schemas.BoardActivityPaginatedSchema()
+    activity_schema = FastSchema(schemas.BoardActivitySchema())
+    activity_paginated_schema = FastSchema(
+        schemas.BoardActivityPaginatedSchema())
     activity_schema_query = schemas.BoardActivityQuerySchema()
 
     file_upload_schema = schemas.CardFileUploadSchema()
 
-    member_schema = schemas.CardMemberSchema()
+    member_schema = FastSchema(schemas.CardMemberSchema())
     date_schema = schemas.CardDateSchema()
     query_schema = schemas.CardQuerySchema()
+    move_schema = schemas.CardMoveSchema()
 
 
 class ChecklistDTO:
@@ -25,32 +28,42 @@ class ChecklistDTO:
 
 
 class SIODTO:
-    event_schema = schemas.SIOEventSchema()
-    delete_event_scehma = schemas.SIODeleteEventSchema()
-    checklist_event_schema = schemas.SIOCheckListEventSchema()
-    delete_checklist_event_schema = schemas.SIOChecklistItemDeleteSchema()
+    event_schema = FastSchema(schemas.SIOEventSchema())
+    card_move_event_schema = FastSchema(schemas.SIOCardMoveEventSchema())
+    delete_event_scehma = FastSchema(schemas.SIODeleteEventSchema())
+    checklist_event_schema = FastSchema(schemas.SIOCheckListEventSchema())
+    delete_checklist_event_schema = FastSchema(
+        schemas.SIOChecklistItemDeleteSchema())
 
 
 class ListDTO:
-    lists_schema = schemas.BoardListSchema()
-    update_list_schema = schemas.BoardListSchema(exclude=("cards",))
+    lists_schema = FastSchema(schemas.BoardListSchema())
+    update_list_schema = FastSchema(
+        schemas.BoardListSchema(exclude=("cards",)))
+    cards_page_schema = FastSchema(schemas.ListCardsPageSchema())
+    cards_query_schema = schemas.ListCardsQuerySchema()
     list_query_schema = schemas.ArchivableEntityQuerySchema()
+    fieldset_query_schema = schemas.FieldsetQuerySchema()
 
 
 class BoardDTO:
-    board_schema = schemas.BoardSchema()
+    board_schema = FastSchema(schemas.BoardSchema())
     board_query_schema = schemas.ArchivableEntityQuerySchema()
-    boards_schema = schemas.BoardSchema(exclude=("lists",))
+    fieldset_query_schema = schemas.FieldsetQuerySchema()
+    boards_schema = FastSchema(schemas.BoardSchema(exclude=("lists",)))
     allowed_user_schema = schemas.BoardAllowedUserSchema()
     allowed_users_schema = schemas.BoardAllowedUserSchema(
         exclude=("role.permissions",))
     roles_schema = schemas.BoardRoleSchema()
 
-    archived_cards_schema = schemas.CardSchema(only=(
-        "id", "title", "archived_on", "archived", "board_list.title", "board_list.id", "board_list.archived",))
-    archived_lists_schema = schemas.BoardListSchema(only=(
+    change_schema = schemas.BoardChangeSchema()
+    change_query_schema = schemas.BoardChangeQuerySchema()
+
+    archived_cards_schema = FastSchema(schemas.CardSchema(only=(
+        "id", "title", "archived_on", "archived", "board_list.title", "board_list.id", "board_list.archived",)))
+    archived_lists_schema = FastSchema(schemas.BoardListSchema(only=(
         "id", "title", "archived_on", "cards.id", "cards.title",
-    ))
+    )))
 
 
 class UserDTO:
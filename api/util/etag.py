@@ -0,0 +1,53 @@
+import functools
+import typing
+
+from flask import make_response, request
+from flask_jwt_extended import current_user
+
+from api.model.board import Board
+from api.util.permission import permission_resolver
+from api.util.serializer import fieldset_key
+
+
+def _client_etags() -> typing.Set[str]:
+    """Gets the If-None-Match tags of the request without the content
+    encoding suffix (Flask-Compress appends ":gzip" or ":br" to ETags).
+    """
+    return {
+        tag.split(":", 1)[0] for tag in
+        request.if_none_match.as_set(include_weak=True)
+    }
+
+
+def board_revision_etag(view: typing.Callable) -> typing.Callable:
+    """
+    Sets ETag on board content responses from the board revision and
+    answers 304 Not Modified if the client already has the revision.
+    Only the board revision is queried for unchanged boards, the view
+    isn't called.
+
+    The view must have a board_id argument.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        board_id = kwargs["board_id"]
+        revision = Board.get_revision_or_404(board_id)
+        permission_resolver.get_member_or_403(board_id, current_user.id)
+
+        etag = f"{board_id}-{revision}"
+        if request.args.get("fields"):
+            # Sparse fieldsets are different representations.
+            etag += f"-{fieldset_key(request.args['fields'].split(','))}"
+        if request.if_none_match.star_tag or etag in _client_etags():
+            resp = make_response("", 304)
+            resp.set_etag(etag)
+            return resp
+
+        resp = make_response(view(*args, **kwargs))
+        encoding = resp.headers.get("Content-Encoding")
+        # Responses compressed by the view follow Flask-Compress ETag format.
+        resp.set_etag(f"{etag}:{encoding}" if encoding else etag)
+        resp.cache_control.private = True
+        resp.cache_control.no_cache = True
+        return resp
+    return wrapper
@@ -0,0 +1,93 @@
+import typing
+from datetime import datetime
+
+import sqlalchemy as sqla
+import sqlalchemy.orm as sqla_orm
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from api.app import db, identity_cache
+from api.model.user import Role, User
+
+# Never stored in the cache, loaded on access (check_password).
+UNCACHED_USER_FIELDS = ("password",)
+
+
+def _user_columns() -> typing.List[sqla_orm.ColumnProperty]:
+    return [
+        attr for attr in sqla.inspect(User).column_attrs
+        if attr.key not in UNCACHED_USER_FIELDS
+    ]
+
+
+def _dump_user(usr: User) -> dict:
+    columns = {}
+    for attr in _user_columns():
+        value = getattr(usr, attr.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        columns[attr.key] = value
+    return {
+        "user": columns,
+        "roles": [[role.id, role.name] for role in usr.roles],
+    }
+
+
+def _attach(model: typing.Type, **columns):
+    """Attaches cached row to the session without querying."""
+    obj = model(**columns)
+    make_transient_to_detached(obj)
+    return db.session.merge(obj, load=False)
+
+
+def _load_user(entry: dict) -> User:
+    columns = dict(entry["user"])
+    for attr in _user_columns():
+        if isinstance(attr.columns[0].type, sqla.DateTime) and columns.get(attr.key):
+            columns[attr.key] = datetime.fromisoformat(columns[attr.key])
+    usr = _attach(User, **columns)
+    set_committed_value(usr, "roles", [
+        _attach(Role, id=role_id, name=name) for role_id, name in entry["roles"]
+    ])
+    return usr
+
+
+def load_user(user_id: int) -> typing.Optional[User]:
+    """Loads user of JWT identity, served from identity cache
+    when possible.
+
+    Args:
+        user_id (int): User id (JWT sub)
+
+    Returns:
+        typing.Optional[User]: User or None if not exists.
+    """
+    entry = identity_cache.get(user_id)
+    if entry is not None:
+        return _load_user(entry)
+
+    usr = User.query.options(
+        sqla_orm.selectinload(User.roles)
+    ).filter(User.id == user_id).one_or_none()
+    if usr is not None:
+        identity_cache.set(user_id, _dump_user(usr))
+    return usr
+
+
+@sqla.event.listens_for(db.session, "after_flush")
+def collect_changed_users(session: Session, flush_context):
+    # Role assignment changes mark the user dirty too.
+    user_ids = session.info.setdefault("changed_users", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            user_ids.add(obj.id)
+
+
+@sqla.event.listens_for(db.session, "after_commit")
+def invalidate_changed_users(session: Session):
+    identity_cache.invalidate(session.info.pop("changed_users", set()))
+
+
+@sqla.event.listens_for(db.session, "after_rollback")
+def discard_changed_users(session: Session):
+    session.info.pop("changed_users", None)
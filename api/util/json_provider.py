@@ -0,0 +1,122 @@
+import typing
+import zlib
+
+from flask import Flask, Response, current_app, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider encoding with orjson, output is equal to the default
+    provider. Types not supported by orjson (datetime, date, Decimal) are
+    converted with the default provider's converter, and objects orjson
+    can't encode (e.g. too large integers) fall back to the default provider.
+    Custom dumps/loads arguments always go to the default provider.
+    """
+
+    def _options(self, pretty: bool = False) -> int:
+        # Same datetime format as the default provider (HTTP date).
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        sort_keys = self._app.config.get("JSON_SORT_KEYS")
+        if sort_keys is None:
+            sort_keys = self.sort_keys
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumpb(self, obj: typing.Any, pretty: bool = False) -> bytes:
+        """Serializes data as JSON bytes."""
+        try:
+            return orjson.dumps(obj, default=self.default,
+                                option=self._options(pretty))
+        except orjson.JSONEncodeError:
+            return super().dumps(obj).encode()
+
+    def dumps(self, obj: typing.Any, **kwargs: typing.Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumpb(obj).decode()
+
+    def loads(self, s: typing.Union[str, bytes], **kwargs: typing.Any) -> typing.Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: typing.Any, **kwargs: typing.Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or \
+            (self.compact is None and self._app.debug)
+        # Bytes passed to response, no extra str copy.
+        return self._app.response_class(
+            self.dumpb(obj, pretty) + b"\n", mimetype=self.mimetype)
+
+
+def init_json_provider(app: Flask):
+    """Uses orjson provider if enabled and orjson installed."""
+    if app.config.get("ORJSON_ENABLED", True) and orjson is not None:
+        app.json = OrjsonProvider(app)
+
+
+def _gzip_chunks(chunks: typing.Iterable[bytes], level: int) -> typing.Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_json_array(
+    items: typing.Iterable,
+    dump: typing.Callable[[typing.Any], typing.Any],
+    chunk_size: int = 64 * 1024
+) -> Response:
+    """Creates a streamed (chunked) JSON array response. Items are dumped
+    and encoded one by one, so the whole array is never materialized
+    as one string. The response is gzip compressed on the fly when
+    the client accepts gzip (Flask-Compress skips streamed responses).
+
+    Args:
+        items (typing.Iterable): Items to dump, e.g. a query with yield_per
+        dump (typing.Callable[[typing.Any], typing.Any]): Dumps one item,
+            e.g. schema.dump
+        chunk_size (int, optional): Bytes buffered before sending a chunk.
+            Defaults to 64 KiB.
+
+    Returns:
+        Response: Streamed response
+    """
+    json = current_app.json
+    encode = json.dumpb if isinstance(json, OrjsonProvider) \
+        else lambda obj: json.dumps(obj).encode()
+
+    def generate() -> typing.Iterator[bytes]:
+        buffer = bytearray(b"[")
+        for index, item in enumerate(items):
+            if index:
+                buffer += b","
+            buffer += encode(dump(item))
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b"]\n"
+        yield bytes(buffer)
+
+    chunks = stream_with_context(generate())
+    if "gzip" not in request.accept_encodings:
+        return Response(chunks, mimetype="application/json")
+
+    resp = Response(
+        _gzip_chunks(chunks, current_app.config.get("COMPRESS_LEVEL", 6)),
+        mimetype="application/json"
+    )
+    resp.headers["Content-Encoding"] = "gzip"
+    resp.vary.add("Accept-Encoding")
+    return resp
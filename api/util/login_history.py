@@ -0,0 +1,132 @@
+import atexit
+import os
+import threading
+import time
+import typing
+from datetime import datetime
+
+from flask import Flask, current_app
+
+from api.app import db, identity_cache
+from api.model.user import User
+
+# Login date and ip
+LoginEntry = typing.Tuple[datetime, typing.Optional[str]]
+
+
+class LoginHistoryBuffer:
+    """
+    Records login history of users.
+
+    By default the history is written in the login transaction. With
+    LOGIN_HISTORY_FLUSH_INTERVAL set, logins are buffered per worker and
+    written with one executemany UPDATE when the buffer is full, and by
+    a background thread (a greenlet under gevent) every interval, so
+    logins only commit their tokens. At most an interval of history of
+    a worker is lost if the process is killed.
+    """
+
+    def __init__(self):
+        self.interval = 0
+        self.max_size = 0
+        self._app = None
+        self._lock = threading.Lock()
+        # User id -> (previous login in buffer, last login)
+        self._entries: typing.Dict[
+            int, typing.Tuple[typing.Optional[LoginEntry], LoginEntry]] = {}
+        self._flushed_at = time.monotonic()
+        # Process running the flusher, restarted in forked workers.
+        self._flusher_pid = None
+        self._stop_flusher = threading.Event()
+
+    def init_app(self, app: Flask):
+        self.interval = app.config.get("LOGIN_HISTORY_FLUSH_INTERVAL", 0)
+        self.max_size = app.config.get("LOGIN_HISTORY_BUFFER_SIZE", 1000)
+        if self._app is None:
+            atexit.register(self._flush_at_exit)
+        self._app = app
+
+    def record(self, usr: User, remote_addr: str):
+        """Records login of user.
+
+        Args:
+            usr (User): Logged in user
+            remote_addr (str): Client address
+        """
+        if not self.interval:
+            usr.update_login_history(remote_addr)
+            return
+
+        self._start_flusher()
+        entry = (datetime.now(), remote_addr)
+        with self._lock:
+            previous = self._entries.get(usr.id)
+            self._entries[usr.id] = (previous[1] if previous else None, entry)
+            due = len(self._entries) >= self.max_size or \
+                time.monotonic() - self._flushed_at >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes buffered logins in its own transaction.
+
+        Returns:
+            int: Count of updated users
+        """
+        with self._lock:
+            entries, self._entries = self._entries, {}
+            self._flushed_at = time.monotonic()
+        if not entries:
+            return 0
+
+        params = [{
+            "user_id": user_id,
+            "login_at": last[0],
+            "login_ip": last[1],
+            "prev_at": previous[0] if previous else None,
+            "prev_ip": previous[1] if previous else None,
+        } for user_id, (previous, last) in entries.items()]
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(User.login_history_update(), params)
+        except Exception:
+            current_app.logger.exception("Login history: flush failed")
+            return 0
+        identity_cache.invalidate(set(entries))
+        return len(entries)
+
+    def _start_flusher(self):
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+            self._stop_flusher = threading.Event()
+            threading.Thread(
+                target=self._run_flusher, args=(self._stop_flusher,),
+                name="login-history-flush", daemon=True
+            ).start()
+
+    def _run_flusher(self, stop: threading.Event):
+        while not stop.wait(self.interval):
+            if time.monotonic() - self._flushed_at < self.interval:
+                # Flushed by a full buffer meanwhile.
+                continue
+            with self._app.app_context():
+                self.flush()
+
+    def stop_flusher(self):
+        """Stops the background flush, it's started again by the next
+        buffered login."""
+        with self._lock:
+            self._stop_flusher.set()
+            self._flusher_pid = None
+
+    def _flush_at_exit(self):
+        with self._app.app_context():
+            self.flush()
+
+
+login_history = LoginHistoryBuffer()
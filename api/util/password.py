@@ -0,0 +1,76 @@
+import os
+import typing
+
+from flask import Flask
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+def _gevent_patched() -> bool:
+    try:
+        from gevent import monkey
+    except ImportError:  # pragma: no cover
+        return False
+    return monkey.is_module_patched("socket")
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords off the event loop.
+
+    PBKDF2 is CPU-bound and blocks every greenlet of a gevent worker
+    while it runs. When gevent has patched the process, hashing runs in a
+    bounded pool of native threads (hashlib releases the GIL), and the
+    calling greenlet yields until the result is ready. Without gevent,
+    or with PASSWORD_HASH_POOL_SIZE = 0, hashing runs inline.
+    """
+
+    def __init__(self, app: Flask = None):
+        self.pool_size = 0
+        self._pool = None
+        self._pid = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask):
+        self.pool_size = app.config.get("PASSWORD_HASH_POOL_SIZE", 2)
+        self._pool = None
+
+    def _get_pool(self):
+        if not self.pool_size or not _gevent_patched():
+            return None
+        # Native threads don't survive fork, create the pool per worker.
+        if self._pool is None or self._pid != os.getpid():
+            from gevent.threadpool import ThreadPool
+            self._pool = ThreadPool(self.pool_size)
+            self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, fn: typing.Callable, *args):
+        pool = self._get_pool()
+        if pool is None:
+            return fn(*args)
+        return pool.apply(fn, args)
+
+    def hash(self, password: str) -> str:
+        """Generates password hash.
+
+        Args:
+            password (str): Plain password
+
+        Returns:
+            str: Password hash
+        """
+        return self._run(generate_password_hash, password)
+
+    def check(self, pwhash: str, password: str) -> bool:
+        """Checks password against hash.
+
+        Args:
+            pwhash (str): Password hash
+            password (str): Plain password
+
+        Returns:
+            bool: Password matches
+        """
+        return self._run(check_password_hash, pwhash, password)
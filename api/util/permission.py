@@ -0,0 +1,131 @@
+import typing
+
+from flask import Flask, g, has_app_context
+from sqlalchemy.orm import make_transient_to_detached
+
+from api.app import db, permission_cache
+from api.model import BoardPermission
+from api.model.board import BoardAllowedUser, BoardRole
+
+# Key of the resolver state on flask.g
+G_KEY = "_permission_resolver"
+# Member columns kept in the permission cache
+MEMBER_COLUMNS = ("id", "user_id", "board_id", "board_role_id",
+                  "is_owner", "is_deleted")
+
+
+class PermissionResolver:
+    """
+    Resolves board membership and role permissions once per request.
+    The member row and the permission mask of its role are kept on
+    flask.g, so further checks in the same request are bitwise ANDs.
+    Between requests members come from the permission cache, attached
+    to the session without a query.
+    """
+
+    def init_app(self, app: Flask):
+        app.teardown_request(self._teardown)
+
+    def _teardown(self, exc: typing.Optional[BaseException]):
+        g.pop(G_KEY, None)
+
+    def _state(self) -> dict:
+        if not has_app_context():
+            return {"members": {}, "masks": {}}
+        if G_KEY not in g:
+            setattr(g, G_KEY, {"members": {}, "masks": {}})
+        return getattr(g, G_KEY)
+
+    def get_member_or_403(self, board_id: int, user_id: int) -> BoardAllowedUser:
+        """Gets active board member of user.
+
+        Args:
+            board_id (int): Board id
+            user_id (int): User id
+
+        Raises:
+            Forbidden: User not member of board.
+
+        Returns:
+            BoardAllowedUser: Board member
+        """
+        state = self._state()
+        # Ids from URL rules may be strings.
+        key = (str(board_id), str(user_id))
+        member = state["members"].get(key)
+        if member is not None:
+            return member
+
+        entry, version = permission_cache.lookup(board_id, user_id)
+        if entry is not None:
+            member = self._member_from_entry(entry)
+        else:
+            member = BoardAllowedUser.get_by_usr_or_403(board_id, user_id)
+            entry = {
+                "member": {
+                    column: getattr(member, column)
+                    for column in MEMBER_COLUMNS
+                },
+                "permission_mask": member.role.permission_mask if member.role else 0
+            }
+            permission_cache.set(board_id, user_id, entry, version)
+        state["members"][key] = member
+        state["masks"][member.board_role_id] = entry["permission_mask"]
+        return member
+
+    def _member_from_entry(self, entry: dict) -> BoardAllowedUser:
+        """Attaches cached member to the session without querying."""
+        member = BoardAllowedUser(**entry["member"])
+        make_transient_to_detached(member)
+        return db.session.merge(member, load=False)
+
+    def get_permission_mask(self, member: BoardAllowedUser) -> int:
+        """Gets permission mask of member's role.
+
+        Args:
+            member (BoardAllowedUser): Board member
+
+        Returns:
+            int: Permission mask, bits of BoardPermission.mask
+        """
+        masks = self._state()["masks"]
+        role_id = member.board_role_id
+        if role_id not in masks:
+            masks[role_id] = db.session.query(
+                BoardRole.permission_mask
+            ).filter(BoardRole.id == role_id).scalar() or 0
+        return masks[role_id]
+
+    def has_permission(self, member: BoardAllowedUser, permission: BoardPermission) -> bool:
+        """Checks if member's role allows permission.
+
+        Args:
+            member (BoardAllowedUser): Board member
+            permission (BoardPermission): Permission to check
+
+        Returns:
+            bool: Permission allowed
+        """
+        if member.is_deleted:
+            return False
+        return bool(self.get_permission_mask(member) & permission.mask)
+
+    def invalidate(self, board_id: int, user_id: int = None):
+        """Forgets resolved member (or all members of board) in the request
+        and in the permission cache, called when membership or roles change.
+
+        Args:
+            board_id (int): Board id
+            user_id (int, optional): User id. Defaults to None (every member).
+        """
+        state = self._state()
+        state["masks"].clear()
+        for key in [
+            k for k in state["members"]
+            if k[0] == str(board_id) and (user_id is None or k[1] == str(user_id))
+        ]:
+            del state["members"][key]
+        permission_cache.invalidate(board_id, user_id)
+
+
+permission_resolver = PermissionResolver()
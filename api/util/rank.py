@@ -0,0 +1,403 @@
+"""Lexicographic ranks ordering lists, cards and checklist items.
+
+A rank is a base 36 fraction written without the leading "0." and
+without trailing zeros ("i" is 0.5), so comparing ranks as strings
+compares the fractions. A rank can always be made between two others,
+so moving an element writes only its own row. Ranks get longer as
+elements are squeezed into the same gap, parents with too long ranks
+are rebalanced in the background.
+"""
+import typing
+
+import sqlalchemy as sqla
+from flask import current_app
+from sqlalchemy.orm import Session, object_session
+
+from api.app import db
+from api.model import BoardChangeOperation
+from api.model.board import Board
+from api.model.card import Card
+from api.model.checklist import CardChecklist, ChecklistItem
+from api.model.list import BoardList
+from api.util.bulk import bulk_reposition
+from api.util.revision import ENTITY_TYPES, record_board_change
+
+ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(ALPHABET)
+# Digits of appended ranks, 36^4 slots before appends get longer.
+APPEND_WIDTH = 4
+
+# Ranked models: parent id column, parent model and its position counter.
+RANKED_MODELS = {
+    BoardList: ("board_id", Board, "list_seq"),
+    Card: ("list_id", BoardList, "card_seq"),
+    ChecklistItem: ("checklist_id", CardChecklist, "item_seq"),
+}
+# Key of the appends per parent of the current flush on session.info
+SESSION_KEY = "rank_appends"
+
+
+def _digit(rank: str, index: int) -> int:
+    return ALPHABET.index(rank[index]) if index < len(rank) else 0
+
+
+def rank_between(before: typing.Optional[str], after: typing.Optional[str]) -> str:
+    """Creates rank between two ranks, as short as possible.
+
+    Args:
+        before (typing.Optional[str]): Lower rank, None for the start.
+        after (typing.Optional[str]): Upper rank, None for the end.
+
+    Raises:
+        ValueError: before isn't lower than after
+
+    Returns:
+        str: Rank
+    """
+    before = before or ""
+    if after is not None and not before < after:
+        raise ValueError(f"Rank {before!r} isn't lower than {after!r}.")
+
+    if after is not None:
+        # Keep the common prefix
+        index = 0
+        while index < len(after) and _digit(before, index) == _digit(after, index):
+            index += 1
+        if index:
+            return after[:index] + rank_between(before[index:], after[index:])
+
+    low = _digit(before, 0)
+    high = _digit(after, 0) if after is not None else BASE
+    if high - low > 1:
+        return ALPHABET[(low + high) // 2]
+    # Adjacent digits, continue on the next digit.
+    if after is not None and len(after) > 1:
+        return after[:1]
+    return ALPHABET[low] + rank_between(before[1:], None)
+
+
+def rank_after(rank: typing.Optional[str]) -> str:
+    """Creates rank for appending after rank. Increments the last of
+    APPEND_WIDTH digits, so repeated appends keep the same length.
+
+    Args:
+        rank (typing.Optional[str]): Last rank, None if no elements.
+
+    Returns:
+        str: Rank
+    """
+    if not rank:
+        return ALPHABET[BASE // 2]
+    # Incrementing the first digits gives a rank after every rank
+    # starting with them.
+    digits = [ALPHABET.index(char)
+              for char in rank[:APPEND_WIDTH].ljust(APPEND_WIDTH, "0")]
+    for index in range(len(digits) - 1, -1, -1):
+        if digits[index] < BASE - 1:
+            digits[index] += 1
+            del digits[index + 1:]
+            return "".join(ALPHABET[digit] for digit in digits)
+    # Only "z" digits left
+    return rank_between(rank, None)
+
+
+def ranks_between(
+    before: typing.Optional[str], after: typing.Optional[str], count: int
+) -> typing.List[str]:
+    """Creates count ascending ranks between two ranks, splitting the
+    gap evenly so the length grows with log(count).
+    """
+    if count <= 0:
+        return []
+    middle = rank_between(before, after)
+    left = (count - 1) // 2
+    return ranks_between(before, middle, left) + [middle] + \
+        ranks_between(middle, after, count - 1 - left)
+
+
+def spread_ranks(count: int) -> typing.List[str]:
+    """Creates count ranks evenly spread with the shortest length,
+    used for initial ranks and rebalancing.
+    """
+    width = 1
+    while BASE ** width <= count + 1:
+        width += 1
+    step = BASE ** width // (count + 1)
+    ranks = []
+    for index in range(1, count + 1):
+        value = index * step
+        digits = []
+        for _ in range(0, width):
+            value, digit = divmod(value, BASE)
+            digits.append(ALPHABET[digit])
+        ranks.append("".join(reversed(digits)).rstrip("0"))
+    return ranks
+
+
+def _kept_indexes(ranks: typing.Sequence[typing.Optional[str]]) -> typing.Set[int]:
+    """Indexes of the longest ascending run of ranks (longest increasing
+    subsequence), these elements keep their ranks."""
+    tails: typing.List[int] = []
+    parents: typing.List[typing.Optional[int]] = [None] * len(ranks)
+    for index, rank in enumerate(ranks):
+        if rank is None:
+            continue
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if ranks[tails[middle]] < rank:
+                low = middle + 1
+            else:
+                high = middle
+        parents[index] = tails[low - 1] if low else None
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+
+    kept = set()
+    index = tails[-1] if tails else None
+    while index is not None:
+        kept.add(index)
+        index = parents[index]
+    return kept
+
+
+def reorder_ranks(
+    ordered: typing.Sequence[typing.Tuple[typing.Any, typing.Optional[str]]]
+) -> typing.Dict[typing.Any, str]:
+    """Calculates rank changes for a new order. The longest run of
+    elements already in order keeps its ranks, only the others are
+    ranked between their neighbours: moving one element changes one rank.
+
+    Args:
+        ordered (typing.Sequence[typing.Tuple[typing.Any, typing.Optional[str]]]):
+            (id, current rank) pairs in the new order.
+
+    Returns:
+        typing.Dict[typing.Any, str]: New ranks by id, changed ones only.
+    """
+    ranks = [rank for _, rank in ordered]
+    kept = _kept_indexes(ranks)
+    changes = {}
+    before = None
+    pending = []
+    for index, (key, rank) in enumerate(ordered):
+        if index not in kept:
+            pending.append(key)
+            continue
+        for key_, new_rank in zip(pending, ranks_between(before, rank, len(pending))):
+            changes[key_] = new_rank
+        pending = []
+        before = rank
+    for key_, new_rank in zip(pending, ranks_between(before, None, len(pending))):
+        changes[key_] = new_rank
+    return changes
+
+
+def _parent_column(model: typing.Type[db.Model]) -> sqla.Column:
+    return getattr(model, RANKED_MODELS[model][0])
+
+
+def last_rank(model: typing.Type[db.Model], parent_id: int) -> typing.Optional[str]:
+    """Gets the highest rank under parent (index scan)."""
+    return db.session.query(sqla.func.max(model.rank)).filter(
+        _parent_column(model) == parent_id).scalar()
+
+
+def reorder(
+    model: typing.Type[db.Model], parent_id: int, ordered_ids: typing.List[int]
+) -> typing.Dict[int, str]:
+    """Orders elements of parent as ordered_ids in the current
+    transaction, writing only the rows whose rank has to change.
+    Ids of other parents are ignored.
+
+    Args:
+        model (typing.Type[db.Model]): Ranked model
+        parent_id (int): Parent id
+        ordered_ids (typing.List[int]): Element ids in the new order
+
+    Returns:
+        typing.Dict[int, str]: Changed ranks by id
+    """
+    ordered_ids = [int(id) for id in ordered_ids]
+    rows = {
+        id: (board_id, rank) for id, board_id, rank in db.session.query(
+            model.id, model.board_id, model.rank
+        ).filter(
+            _parent_column(model) == parent_id,
+            model.id.in_(ordered_ids)
+        )
+    }
+    changes = reorder_ranks([
+        (id, rows[id][1]) for id in dict.fromkeys(ordered_ids) if id in rows
+    ])
+    bulk_reposition(model, "rank", changes)
+    for id, rank in changes.items():
+        record_board_change(rows[id][0], ENTITY_TYPES[model], id,
+                            BoardChangeOperation.UPDATE, {"rank": rank})
+    return changes
+
+
+def rank_for_placement(
+    model: typing.Type[db.Model],
+    parent_id: int,
+    before_id: typing.Optional[int] = None,
+    after_id: typing.Optional[int] = None,
+    exclude_id: typing.Optional[int] = None
+) -> typing.Optional[str]:
+    """Creates rank for placing an element before or after a sibling,
+    reading only the sibling and its neighbour (index scans). Appends
+    after the last element if no sibling is given.
+
+    Args:
+        model (typing.Type[db.Model]): Ranked model
+        parent_id (int): Parent id
+        before_id (typing.Optional[int], optional): Place before this element.
+        after_id (typing.Optional[int], optional): Place after this element.
+        exclude_id (typing.Optional[int], optional): Element being placed,
+            ignored as a neighbour.
+
+    Returns:
+        typing.Optional[str]: Rank, None if the sibling isn't under parent.
+    """
+    criteria = [_parent_column(model) == parent_id]
+    if exclude_id is not None:
+        criteria.append(model.id != exclude_id)
+
+    anchor_id = before_id if before_id is not None else after_id
+    if anchor_id is None:
+        return rank_after(db.session.query(
+            sqla.func.max(model.rank)).filter(*criteria).scalar())
+    if anchor_id == exclude_id:
+        return None
+    anchor = db.session.query(model.rank).filter(
+        model.id == anchor_id, *criteria).scalar()
+    if anchor is None:
+        return None
+
+    if before_id is not None:
+        lower = db.session.query(sqla.func.max(model.rank)).filter(
+            model.rank < anchor, *criteria).scalar()
+        return rank_between(lower, anchor)
+    upper = db.session.query(sqla.func.min(model.rank)).filter(
+        model.rank > anchor, *criteria).scalar()
+    return rank_between(anchor, upper)
+
+
+def needs_rebalance(ranks: typing.Iterable[str]) -> bool:
+    limit = current_app.config["RANK_REBALANCE_LENGTH"]
+    return any(len(rank) > limit for rank in ranks)
+
+
+def rebalance(model: typing.Type[db.Model], parent_id: int) -> int:
+    """Rewrites ranks of every element under parent evenly spread,
+    keeping the order. Commits.
+
+    Returns:
+        int: Count of changed ranks
+    """
+    rows = db.session.query(model.id, model.board_id, model.rank).filter(
+        _parent_column(model) == parent_id
+    ).order_by(model.rank.asc(), model.id.asc()).all()
+    changes = {}
+    for (id, board_id, rank), new_rank in zip(rows, spread_ranks(len(rows))):
+        if rank != new_rank:
+            changes[id] = new_rank
+            record_board_change(board_id, ENTITY_TYPES[model], id,
+                                BoardChangeOperation.UPDATE, {"rank": new_rank})
+    bulk_reposition(model, "rank", changes)
+    db.session.commit()
+    return len(changes)
+
+
+def schedule_rebalance(model: typing.Type[db.Model], parent_id: int):
+    """Rebalances ranks of parent in the task queue, inline if the
+    queue is unavailable."""
+    from api.task_queue.rank import rebalance_ranks
+    try:
+        rebalance_ranks.apply_async(
+            (model.__tablename__, parent_id), retry=False)
+    except Exception:
+        current_app.logger.warning(
+            "Rank rebalance: task queue unavailable, running inline.")
+        rebalance(model, parent_id)
+
+
+def allocate_positions(
+    connection: sqla.engine.Connection,
+    model: typing.Type[db.Model],
+    parent_id: int,
+    count: int = 1
+) -> int:
+    """Allocates positions under parent from its counter column with one
+    UPDATE (RETURNING where supported) in the current transaction. The
+    UPDATE locks the parent row until commit, so concurrent appends to
+    the same parent wait for each other instead of reading the same last
+    rank or position.
+
+    Args:
+        connection (sqla.engine.Connection): Connection of the transaction
+        model (typing.Type[db.Model]): Ranked model
+        parent_id (int): Parent id
+        count (int, optional): Count of positions. Defaults to 1.
+
+    Returns:
+        int: First allocated position
+    """
+    _, parent, counter = RANKED_MODELS[model]
+    table = parent.__table__
+    stmt = table.update().where(table.c.id == parent_id).values(
+        {counter: table.c[counter] + count})
+    if connection.dialect.full_returning:
+        value = connection.execute(stmt.returning(table.c[counter])).scalar()
+    else:
+        connection.execute(stmt)
+        value = connection.execute(
+            sqla.select(table.c[counter]).where(table.c.id == parent_id)
+        ).scalar()
+    return (value or count) - count
+
+
+@sqla.event.listens_for(BoardList, "before_insert")
+@sqla.event.listens_for(Card, "before_insert")
+@sqla.event.listens_for(ChecklistItem, "before_insert")
+def append_element(mapper, connection, target):
+    """Gives new elements the next position and a rank after the last
+    element of their parent. Parents are locked and read once per flush,
+    further appends of the flush are counted in session.info.
+    """
+    model = type(target)
+    # Parent ids are set by now, also for parents in the same flush.
+    parent_id = getattr(target, RANKED_MODELS[model][0])
+    appends = object_session(target).info.setdefault(SESSION_KEY, {})
+    key = (model, parent_id)
+    if key not in appends:
+        position = allocate_positions(connection, model, parent_id)
+        # Read after the allocation locked the parent.
+        last = connection.execute(
+            sqla.select(sqla.func.max(model.rank)).where(
+                _parent_column(model) == parent_id)
+        ).scalar()
+        appends[key] = {"position": position, "rank": last, "count": 0}
+
+    append = appends[key]
+    if append["count"]:
+        append["position"] += 1
+    append["count"] += 1
+    if target.position is None:
+        target.position = append["position"]
+    if target.rank is None:
+        target.rank = append["rank"] = rank_after(append["rank"])
+    elif append["rank"] is None or target.rank > append["rank"]:
+        append["rank"] = target.rank
+
+
+@sqla.event.listens_for(db.session, "after_flush")
+def allocate_appended_positions(session: Session, flush_context):
+    """Allocates positions taken by further appends of the flush, the
+    parents are locked already."""
+    for (model, parent_id), append in session.info.pop(SESSION_KEY, {}).items():
+        if append["count"] > 1:
+            allocate_positions(session.connection(), model,
+                               parent_id, append["count"] - 1)
@@ -0,0 +1,265 @@
+import enum
+import json
+import typing
+from datetime import datetime
+
+import sqlalchemy as sqla
+from sqlalchemy.orm import Session
+
+from api.app import db, board_cache
+from api.model import BoardChangeOperation
+from api.model.board import Board, BoardAllowedUser, BoardChange
+from api.model.card import Card, CardDate, CardMember
+from api.model.checklist import CardChecklist, ChecklistItem
+from api.model.list import BoardList
+from api.model.user import User
+
+# Models which are part of the board snapshot.
+TRACKED_MODELS = (
+    Board, BoardList, Card, CardDate, CardMember, CardChecklist, ChecklistItem
+)
+# User fields which are dumped as part of the board snapshot.
+TRACKED_USER_FIELDS = ("username", "name", "avatar_url")
+# Columns never part of journal payloads.
+UNJOURNALED_FIELDS = ("revision", "list_seq", "card_seq", "item_seq")
+# Entity type names used in the board change journal.
+ENTITY_TYPES = {
+    Board: "board",
+    BoardList: "list",
+    Card: "card",
+    CardDate: "card_date",
+    CardMember: "card_member",
+    CardChecklist: "checklist",
+    ChecklistItem: "checklist_item",
+    User: "user",
+}
+
+
+def mark_board_changed(board_id: int, session: Session = None):
+    """Marks board changed by current transaction, the revision of the
+    board is incremented on commit.
+    Required for bulk updates (Query.update), which are not seen by flush.
+
+    Args:
+        board_id (int): Board id
+        session (Session, optional): Session. Defaults to db.session.
+    """
+    session = session or db.session
+    session.info.setdefault("changed_boards", set()).add(int(board_id))
+
+
+def record_board_change(
+    board_id: int,
+    entity_type: str,
+    entity_id: int,
+    operation: BoardChangeOperation,
+    payload: dict = None,
+    session: Session = None
+):
+    """Records a change in the board change journal of current transaction.
+    Changes of ORM objects are recorded on flush, this is required
+    for bulk updates (Query.update).
+
+    Args:
+        board_id (int): Board id
+        entity_type (str): Entity type, see ENTITY_TYPES
+        entity_id (int): Entity id
+        operation (BoardChangeOperation): Operation
+        payload (dict, optional): Changed values. Defaults to None.
+        session (Session, optional): Session. Defaults to db.session.
+    """
+    session = session or db.session
+    mark_board_changed(board_id, session)
+    _add_change(session, int(board_id), entity_type, int(entity_id),
+                operation, payload=payload)
+
+
+def _add_change(
+    session: Session,
+    board_id: int,
+    entity_type: str,
+    entity_id: int,
+    operation: BoardChangeOperation,
+    obj=None,
+    keys: typing.Iterable[str] = (),
+    payload: dict = None
+):
+    """Merges change into the pending changes of the session.
+    The payload of created and updated objects is read on commit,
+    so values set with SQL expressions are journaled correctly.
+    """
+    changes = session.info.setdefault("board_changes", {})
+    entry = changes.get((board_id, entity_type, entity_id))
+    if entry is None:
+        changes[(board_id, entity_type, entity_id)] = {
+            "operation": operation, "obj": obj,
+            "keys": set(keys), "payload": dict(payload or {})
+        }
+        return
+
+    # Created objects stay created, deletes override everything.
+    if operation == BoardChangeOperation.DELETE or \
+            entry["operation"] == BoardChangeOperation.UPDATE:
+        entry["operation"] = operation
+    if operation == BoardChangeOperation.DELETE:
+        entry["obj"] = None
+        entry["keys"] = set()
+        entry["payload"] = dict(payload or {})
+        return
+    entry["obj"] = entry["obj"] or obj
+    entry["keys"].update(keys)
+    entry["payload"].update(payload or {})
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _column_keys(obj) -> typing.List[str]:
+    return [
+        attr.key for attr in sqla.inspect(obj).mapper.column_attrs
+        if attr.key not in UNJOURNALED_FIELDS
+    ]
+
+
+def _changed_keys(obj) -> typing.List[str]:
+    state = sqla.inspect(obj)
+    return [
+        attr.key for attr in state.mapper.column_attrs
+        if attr.key not in UNJOURNALED_FIELDS and
+        state.attrs[attr.key].history.has_changes()
+    ]
+
+
+def _parent_payload(obj) -> dict:
+    """Foreign keys of deleted object, so clients can find it."""
+    state = sqla.inspect(obj)
+    return {
+        attr.key: _dump_value(state.attrs[attr.key].loaded_value)
+        for attr in state.mapper.column_attrs
+        if any(column.foreign_keys for column in attr.columns)
+    }
+
+
+def get_board_ids(session: Session, obj) -> typing.List[int]:
+    """Gets the boards affected by a changed ORM object.
+
+    Returns:
+        typing.List[int]: Board ids
+    """
+    if isinstance(obj, Board):
+        return [obj.id]
+    if isinstance(obj, CardMember):
+        card = session.get(Card, obj.card_id)
+        return [card.board_id] if card else []
+    if isinstance(obj, User):
+        return [
+            row.board_id for row in session.query(
+                BoardAllowedUser.board_id
+            ).filter(BoardAllowedUser.user_id == obj.id)
+        ]
+    return [obj.board_id]
+
+
+@sqla.event.listens_for(db.session, "after_flush")
+def collect_changed_boards(session: Session, flush_context):
+    changed = [
+        (obj, BoardChangeOperation.CREATE, _column_keys(obj))
+        for obj in session.new if isinstance(obj, TRACKED_MODELS)
+    ]
+    changed += [
+        (obj, BoardChangeOperation.DELETE, ())
+        for obj in session.deleted if isinstance(obj, TRACKED_MODELS)
+    ]
+    changed += [
+        (obj, BoardChangeOperation.UPDATE, _changed_keys(obj))
+        for obj in session.dirty
+        if isinstance(obj, TRACKED_MODELS) and
+        session.is_modified(obj, include_collections=False)
+    ]
+    # Users are dumped on card members.
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            keys = [
+                key for key in TRACKED_USER_FIELDS
+                if sqla.inspect(obj).attrs[key].history.has_changes()
+            ]
+            if keys:
+                changed.append((obj, BoardChangeOperation.UPDATE, keys))
+
+    for obj, operation, keys in changed:
+        for board_id in get_board_ids(session, obj):
+            if board_id is None:
+                continue
+            mark_board_changed(board_id, session)
+            if operation == BoardChangeOperation.DELETE:
+                _add_change(session, board_id, ENTITY_TYPES[type(obj)],
+                            obj.id, operation, payload=_parent_payload(obj))
+            else:
+                _add_change(session, board_id, ENTITY_TYPES[type(obj)],
+                            obj.id, operation, obj=obj, keys=keys)
+
+
+@sqla.event.listens_for(db.session, "before_commit")
+def bump_board_revisions(session: Session):
+    # Flush pending changes first, so they are collected too.
+    session.flush()
+    board_ids = session.info.get("changed_boards")
+    changes = session.info.pop("board_changes", {})
+    if not board_ids:
+        return
+
+    # Incremented in SQL within the same transaction, so concurrent
+    # writers can't lose increments.
+    session.execute(
+        sqla.update(Board).where(
+            Board.id.in_(sorted(board_ids))
+        ).values(
+            revision=Board.revision + 1
+        ).execution_options(synchronize_session=False)
+    )
+    if not changes:
+        return
+
+    # Deleted boards are missing, their changes are not journaled.
+    revisions = dict(session.execute(
+        sqla.select(Board.id, Board.revision).where(
+            Board.id.in_({key[0] for key in changes}))
+    ).all())
+
+    now = datetime.utcnow()
+    rows = []
+    for (board_id, entity_type, entity_id), entry in changes.items():
+        if board_id not in revisions:
+            continue
+        payload = {
+            key: _dump_value(getattr(entry["obj"], key))
+            for key in entry["keys"]
+        }
+        payload.update(entry["payload"])
+        rows.append({
+            "board_id": board_id,
+            "revision": revisions[board_id],
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "operation": entry["operation"].value,
+            "payload": json.dumps(payload),
+            "created_on": now,
+        })
+    if rows:
+        session.execute(sqla.insert(BoardChange), rows)
+
+
+@sqla.event.listens_for(db.session, "after_commit")
+def evict_changed_boards(session: Session):
+    board_cache.evict(session.info.pop("changed_boards", set()))
+
+
+@sqla.event.listens_for(db.session, "after_rollback")
+def discard_changed_boards(session: Session):
+    session.info.pop("changed_boards", None)
+    session.info.pop("board_changes", None)
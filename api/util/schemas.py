@@ -1,17 +1,20 @@
+import json
+import typing
 from urllib.parse import urlencode
 
 from flask import request
 from marshmallow import (Schema, ValidationError,
                          fields, validate, validates_schema, EXCLUDE)
 from marshmallow_sqlalchemy import SQLAlchemySchema
+from webargs.fields import DelimitedList
 
 from api.model.board import (
-    Board, BoardAllowedUser, BoardRole, BoardRolePermission
+    Board, BoardAllowedUser, BoardChange, BoardRole
 )
 from api.model.card import Card, CardComment, CardDate, CardFileUpload
 from api.model.checklist import ChecklistItem, CardChecklist
 from api.model.list import BoardList
-from api.model import user
+from api.model import BoardPermission, user
 
 
 class PaginatedSchema(Schema):
@@ -56,6 +59,17 @@ class PaginatedQuerySchema(Schema):
     order = fields.String(validate=validate.OneOf(("asc", "desc",)))
 
 
+class FieldsetQuerySchema(Schema):
+    # Sparse fieldset, e.g. ?fields=id,title,lists.id
+    fieldset = DelimitedList(fields.String(), data_key="fields", missing=None)
+
+
+class ListCardsQuerySchema(FieldsetQuerySchema):
+    after_rank = fields.String()
+    after_id = fields.Integer()
+    limit = fields.Integer(missing=50, validate=validate.Range(min=1, max=500))
+
+
 class ResetPasswordSchema(Schema):
     reset_token = fields.String(required=True, load_only=True)
     password = fields.String(required=True, load_only=True)
@@ -137,6 +151,7 @@ class BoardListSchema(SQLAlchemySchema):
     board_id = fields.Integer()
     title = fields.String(required=True)
     position = fields.Integer()
+    rank = fields.String(dump_only=True)
 
     archived = fields.Boolean()
     archived_on = fields.DateTime("%Y-%m-%d %H:%M:%S", dump_only=True)
@@ -148,12 +163,16 @@ class BoardListSchema(SQLAlchemySchema):
     list_bgcolor = fields.String(allow_none=True)
     list_textcolor = fields.String(allow_none=True)
 
+    # Count of non-archived cards, cards holds only the first ones of
+    # large lists.
+    card_count = fields.Integer(dump_only=True)
     cards = fields.Nested(
         lambda: CardSchema,
         many=True,
-        only=("id", "title", "position", "list_id",
-              "assigned_members", "dates", "checklists.id",
-              "checklists.title", "checklists.items.completed", "checklists.items.id"),
+        only=("id", "title", "position", "rank", "list_id",
+              "assigned_members", "dates", "comment_count",
+              "file_upload_count", "member_count",
+              "checklist_total", "checklist_completed"),
         dump_only=True
     )
 
@@ -173,22 +192,32 @@ class BoardSchema(SQLAlchemySchema):
 
     archived = fields.Boolean(dump_only=True)
     archived_on = fields.DateTime("%Y-%m-%d %H:%M:%S", dump_only=True)
+    revision = fields.Integer(dump_only=True)
 
     class Meta:
         model = Board
 
 
-class ArchivableEntityQuerySchema(Schema):
-    archived = fields.Boolean(missing=False)
+class BoardChangeSchema(SQLAlchemySchema):
+    revision = fields.Integer(dump_only=True)
+    entity_type = fields.String(dump_only=True)
+    entity_id = fields.Integer(dump_only=True)
+    operation = fields.String(dump_only=True)
+    payload = fields.Method("get_payload", dump_only=True)
 
-
-class BoardRolePermissionSchema(SQLAlchemySchema):
-    id = fields.Integer(dump_only=True)
-    name = fields.String(dump_only=True)
-    allow = fields.Boolean()
+    def get_payload(self, obj: BoardChange) -> dict:
+        return json.loads(obj.payload)
 
     class Meta:
-        model = BoardRolePermission
+        model = BoardChange
+
+
+class BoardChangeQuerySchema(Schema):
+    since = fields.Integer(required=True, validate=validate.Range(min=0))
+
+
+class ArchivableEntityQuerySchema(Schema):
+    archived = fields.Boolean(missing=False)
 
 
 class BoardRoleSchema(SQLAlchemySchema):
@@ -196,8 +225,13 @@ class BoardRoleSchema(SQLAlchemySchema):
     board_role_id = fields.Integer(dump_only=True)
     name = fields.String()
     is_admin = fields.Boolean(load_default=False)
-    permissions = fields.Nested(
-        BoardRolePermissionSchema, many=True, dump_only=True)
+    permissions = fields.Method("get_permissions", dump_only=True)
+
+    def get_permissions(self, obj: BoardRole) -> typing.List[dict]:
+        return [
+            {"name": permission.value, "allow": obj.has_permission(permission)}
+            for permission in BoardPermission
+        ]
 
     class Meta:
         model = BoardRole
@@ -270,7 +304,20 @@ class BoardActivityPaginatedSchema(PaginatedSchema):
     )
 
 
-class BoardActivityQuerySchema(PaginatedQuerySchema):
+class ListCardsPageSchema(Schema):
+    data = fields.Nested(
+        lambda: CardSchema,
+        attribute="items",
+        many=True,
+        only=("id", "title", "position", "rank", "list_id",
+              "assigned_members", "dates", "comment_count",
+              "file_upload_count", "member_count",
+              "checklist_total", "checklist_completed")
+    )
+    has_more = fields.Boolean()
+
+
+class BoardActivityQuerySchema(PaginatedQuerySchema, FieldsetQuerySchema):
     type = fields.String(
         validate=validate.OneOf(["all", "comment"]), missing="comment")
 
@@ -298,6 +345,7 @@ class ChecklistItemSchema(SQLAlchemySchema):
     completed = fields.Boolean(load_default=False, allow_none=False)
     marked_complete_on = fields.DateTime(dump_only=True)
     position = fields.Integer()
+    rank = fields.String(dump_only=True)
 
     marked_complete_user = fields.Nested(
         BoardAllowedUserSchema(only=("user", "id",)),
@@ -373,6 +421,7 @@ class CardSchema(SQLAlchemySchema):
     title = fields.String(required=True)
     description = fields.String(allow_none=True)
     position = fields.Integer()
+    rank = fields.String(dump_only=True)
 
     archived = fields.Boolean()
     archived_by_list = fields.Boolean(dump_only=True)
@@ -381,6 +430,11 @@ class CardSchema(SQLAlchemySchema):
     created_on = fields.DateTime("%Y-%m-%d %H:%M:%S", dump_only=True)
 
     checklists = fields.Nested(CardChecklistSchema, many=True, dump_only=True)
+    comment_count = fields.Integer(dump_only=True)
+    file_upload_count = fields.Integer(dump_only=True)
+    member_count = fields.Integer(dump_only=True)
+    checklist_total = fields.Integer(dump_only=True)
+    checklist_completed = fields.Integer(dump_only=True)
     assigned_members = fields.Nested(
         CardMemberSchema(many=True),
         dump_only=True
@@ -401,16 +455,37 @@ class CardSchema(SQLAlchemySchema):
         unknown = EXCLUDE
 
 
-class CardQuerySchema(Schema):
+class CardQuerySchema(FieldsetQuerySchema):
     activity_count = fields.Integer(missing=50)
 
 
+class CardMoveSchema(Schema):
+    list_id = fields.Integer(required=True)
+    before_id = fields.Integer()
+    after_id = fields.Integer()
+
+    @validates_schema
+    def validate_schema(self, data, **kwargs):
+        if "before_id" in data.keys() and "after_id" in data.keys():
+            raise ValidationError({
+                "before_id": ["Can't be used together with after_id!"],
+                "after_id": ["Can't be used together with before_id!"]
+            })
+
+
 class SIOEventSchema(Schema):
     list_id = fields.Integer(required=True)
     card_id = fields.Integer(required=True)
     entity = fields.Dict(required=True)
 
 
+class SIOCardMoveEventSchema(Schema):
+    card_id = fields.Integer(required=True)
+    from_list_id = fields.Integer(required=True)
+    list_id = fields.Integer(required=True)
+    rank = fields.String(required=True)
+
+
 class SIODeleteEventSchema(Schema):
     list_id = fields.Integer()
     card_id = fields.Integer()
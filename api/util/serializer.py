@@ -0,0 +1,257 @@
+import hashlib
+import threading
+import typing
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from flask import current_app
+from marshmallow import Schema, ValidationError, fields, missing, utils
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+
+# Count of only= variants kept per schema.
+VARIANT_CACHE_SIZE = 32
+
+# Function dumping a single object with a compiled schema.
+DumpFunc = typing.Callable[[typing.Any], dict]
+# Output key, field name, attribute, converter and bound field for fallback.
+FieldPlan = typing.Tuple[
+    str, str, str, typing.Optional[typing.Callable], fields.Field]
+
+
+def _get_value(obj, attr: str):
+    """Same lookup as marshmallow.utils.get_value for plain keys."""
+    if isinstance(obj, Mapping):
+        return obj.get(attr, missing)
+    return getattr(obj, attr, missing)
+
+
+def _number_converter(field: fields.Number) -> typing.Callable:
+    format_num = field._format_num
+
+    def convert(value):
+        return None if value is None else format_num(value)
+    return convert
+
+
+def _string_converter(field: fields.String) -> typing.Callable:
+    def convert(value):
+        return None if value is None else utils.ensure_text_type(value)
+    return convert
+
+
+def _boolean_converter(field: fields.Boolean) -> typing.Callable:
+    serialize = field._serialize
+
+    def convert(value):
+        # Bools are most common, others use the truthy/falsy sets.
+        if value is True or value is False:
+            return value
+        return serialize(value, None, None)
+    return convert
+
+
+def _datetime_converter(field: fields.DateTime) -> typing.Optional[typing.Callable]:
+    data_format = field.format or field.DEFAULT_FORMAT
+    if data_format in field.SERIALIZATION_FUNCS:
+        format_func = field.SERIALIZATION_FUNCS[data_format]
+
+        def convert(value):
+            return None if value is None else format_func(value)
+    else:
+        def convert(value):
+            return None if value is None else value.strftime(data_format)
+    return convert
+
+
+def _nested_converter(field: fields.Nested) -> typing.Optional[typing.Callable]:
+    nested = field.schema
+    dump_one = compile_schema(nested)
+    if dump_one is None:
+        return None
+
+    if nested.many or field.many:
+        def convert(value):
+            return None if value is None else [dump_one(obj) for obj in value]
+    else:
+        def convert(value):
+            return None if value is None else dump_one(value)
+    return convert
+
+
+def _field_converter(field: fields.Field) -> typing.Optional[typing.Callable]:
+    """Gets converter which produces the same result as field._serialize.
+    Returns None for fields which have to go through field.serialize.
+    """
+    field_type = type(field)
+    if field.dump_default is not missing or not field._CHECK_ATTRIBUTE or \
+            field_type.get_value is not fields.Field.get_value:
+        return None
+
+    if field_type in (fields.Integer, fields.Float) and not field.as_string:
+        return _number_converter(field)
+    if field_type in (fields.String, fields.Email):
+        return _string_converter(field)
+    if field_type is fields.Boolean:
+        return _boolean_converter(field)
+    if field_type is fields.DateTime:
+        return _datetime_converter(field)
+    if field_type is fields.Raw:
+        return lambda value: value
+    if field_type is fields.Nested:
+        return _nested_converter(field)
+    return None
+
+
+def _build_plan(schema: Schema) -> typing.List[FieldPlan]:
+    plan = []
+    for attr_name, field in schema.dump_fields.items():
+        key = field.data_key if field.data_key is not None else attr_name
+        attr = attr_name if field.attribute is None else field.attribute
+        converter = _field_converter(field) if "." not in attr else None
+        plan.append((key, attr_name, attr, converter, field))
+    return plan
+
+
+def compile_schema(schema: Schema) -> typing.Optional[DumpFunc]:
+    """Compiles the field plan of schema (with only/exclude applied) into
+    a function dumping one object. Fields without fast converter are
+    serialized by marshmallow, so the output is the same as schema.dump.
+
+    Args:
+        schema (Schema): Schema instance
+
+    Returns:
+        typing.Optional[DumpFunc]: Dump function, None if the schema
+            can't be compiled (dump processors or custom attribute getter).
+    """
+    if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP) \
+            or type(schema).get_attribute is not Schema.get_attribute:
+        return None
+
+    plan = _build_plan(schema)
+    dict_class = schema.dict_class
+    get_attribute = schema.get_attribute
+
+    def dump_one(obj) -> dict:
+        ret = dict_class()
+        for key, attr_name, attr, converter, field in plan:
+            if converter is None:
+                value = field.serialize(attr_name, obj, accessor=get_attribute)
+                if value is missing:
+                    continue
+            else:
+                value = _get_value(obj, attr)
+                if value is missing:
+                    continue
+                value = converter(value)
+            ret[key] = value
+        return ret
+    return dump_one
+
+
+def fieldset_key(fieldset: typing.Optional[typing.Iterable[str]]) -> str:
+    """Short stable key of a sparse fieldset, empty for all fields.
+    Used in cache keys and ETags."""
+    if not fieldset:
+        return ""
+    return hashlib.sha1(
+        ",".join(sorted(set(fieldset))).encode()).hexdigest()[:16]
+
+
+def _resolve_nested(schema: Schema):
+    """Creates nested schemas, so invalid nested only= names raise now
+    instead of on dump."""
+    for field in schema.dump_fields.values():
+        if isinstance(field, fields.Nested):
+            _resolve_nested(field.schema)
+
+
+class FastSchema:
+    """
+    Wraps a marshmallow schema, dumps with the compiled field plan when
+    FAST_SERIALIZER_ENABLED is set. Everything else (load, validate, ...)
+    is delegated to the wrapped schema.
+    """
+
+    def __init__(self, schema: Schema):
+        self.schema = schema
+        self._dump_one: typing.Optional[DumpFunc] = None
+        self._compiled = False
+        self._variants: typing.OrderedDict[typing.FrozenSet[str],
+                                           "FastSchema"] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def variant(
+        self,
+        only: typing.Optional[typing.Iterable[str]],
+        prefix: str = None
+    ) -> "FastSchema":
+        """Gets schema dumping only the given fields (sparse fieldset).
+        Variants are created once and kept in a small LRU.
+
+        Args:
+            only (typing.Optional[typing.Iterable[str]]): Field names,
+                nested fields with dot notation (lists.cards.id).
+            prefix (str, optional): Nested field the names belong to,
+                other fields of schema are kept (e.g. pagination data).
+
+        Raises:
+            ValidationError: Unknown field name
+
+        Returns:
+            FastSchema: Variant or self if only is empty.
+        """
+        if not only:
+            return self
+        key = frozenset(only)
+        with self._lock:
+            variant = self._variants.get(key)
+            if variant is not None:
+                self._variants.move_to_end(key)
+                return variant
+
+        names = set(key)
+        if prefix:
+            names = {f"{prefix}.{name}" for name in names} | {
+                name for name in self.schema.dump_fields if name != prefix
+            }
+        if self.schema.only is not None:
+            names &= set(self.schema.only)
+        try:
+            schema = type(self.schema)(
+                only=names,
+                exclude=self.schema.exclude,
+                many=self.schema.many
+            )
+            _resolve_nested(schema)
+        except ValueError as e:
+            raise ValidationError({"fields": [str(e)]})
+
+        variant = FastSchema(schema)
+        with self._lock:
+            self._variants[key] = variant
+            while len(self._variants) > VARIANT_CACHE_SIZE:
+                self._variants.popitem(last=False)
+        return variant
+
+    def __getattr__(self, name: str):
+        return getattr(self.schema, name)
+
+    def compile(self) -> typing.Optional[DumpFunc]:
+        if not self._compiled:
+            self._dump_one = compile_schema(self.schema)
+            self._compiled = True
+        return self._dump_one
+
+    def dump(self, obj: typing.Any, *, many: bool = None):
+        if not current_app.config.get("FAST_SERIALIZER_ENABLED"):
+            return self.schema.dump(obj, many=many)
+
+        dump_one = self.compile()
+        if dump_one is None:
+            return self.schema.dump(obj, many=many)
+
+        many = self.schema.many if many is None else bool(many)
+        if many and obj is not None:
+            return [dump_one(item) for item in obj]
+        return dump_one(obj)
@@ -0,0 +1,94 @@
+"""Reordering a large list: one UPDATE per row vs bulk_reposition.
+
+Reverses the ranks of every card of a list with 1k and 10k cards on an
+in-memory SQLite database (CASE statement, PostgreSQL uses VALUES):
+
+    python benchmarks/bench_bulk_reposition.py --sizes 1000 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from api.app import create_app, db  # noqa: E402
+from api.model.board import Board  # noqa: E402
+from api.model.card import Card  # noqa: E402
+from api.model.list import BoardList  # noqa: E402
+from api.model.user import Role, User  # noqa: E402
+from api.util.bulk import bulk_reposition  # noqa: E402
+from api.util.rank import spread_ranks  # noqa: E402
+
+
+def setup(size: int) -> int:
+    usr = User.create(
+        username="bench", password="bench", email="bench@localhost.com",
+        roles=[Role.find_or_create("user")]
+    )
+    db.session.add(usr)
+    db.session.commit()
+    board = Board(owner_id=usr.id, title="Benchmark")
+    db.session.add(board)
+    db.session.flush()
+    board_list = BoardList(board_id=board.id, title="List")
+    db.session.add(board_list)
+    db.session.flush()
+    db.session.bulk_insert_mappings(Card, [
+        {"board_id": board.id, "list_id": board_list.id,
+         "title": f"Card {index}", "position": index, "rank": rank}
+        for index, rank in enumerate(spread_ranks(size))
+    ])
+    db.session.commit()
+    return board_list.id
+
+
+def reversed_ranks(list_id: int) -> dict:
+    rows = db.session.query(Card.id, Card.rank).filter(
+        Card.list_id == list_id).order_by(Card.rank).all()
+    return {
+        id: rank for (id, _), (_, rank) in zip(rows, reversed(rows))
+    }
+
+
+def per_row(values: dict):
+    for id, rank in values.items():
+        db.session.query(Card).filter(Card.id == id).update(
+            {"rank": rank}, synchronize_session=False)
+
+
+def bulk(values: dict):
+    bulk_reposition(Card, "rank", values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'cards':>8}{'per row':>14}{'bulk':>14}{'speedup':>10}")
+    for size in args.sizes:
+        app = create_app()
+        app.config.update({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+        with app.app_context():
+            db.create_all()
+            list_id = setup(size)
+            timings = {}
+            for name, apply in (("per row", per_row), ("bulk", bulk)):
+                elapsed = []
+                for _ in range(0, args.runs):
+                    values = reversed_ranks(list_id)
+                    start = time.perf_counter()
+                    apply(values)
+                    db.session.commit()
+                    elapsed.append(time.perf_counter() - start)
+                timings[name] = sorted(elapsed)[len(elapsed) // 2]
+            db.session.remove()
+        print(f"{size:>8}{timings['per row'] * 1000:>12.1f}ms"
+              f"{timings['bulk'] * 1000:>12.1f}ms"
+              f"{timings['per row'] / timings['bulk']:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Per-request memory of the JWT refresh hook on streamed responses.
+
+Compares the current header/state based refresh hook with the previous
+hook, which read the response body twice to look for "Token revoked".
+Reading the body only costs memory where the body isn't materialized
+anyway, so the responses measured are:
+
+    stream    streamed JSON array (GET /board/<id>/archived-cards)
+    download  file download with send_file (GET /card-upload/<id>)
+    hook      the after_request hook alone on a streamed 50 MB body
+
+Responses are consumed chunk by chunk like a WSGI server sends them.
+Runs on an in-memory SQLite database and a temporary upload directory:
+
+    python benchmarks/bench_jwt_refresh.py --cards 5000 --file-mb 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from flask import Response
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from api.app import create_app, db  # noqa: E402
+from api.model.board import Board  # noqa: E402
+from api.model.card import Card, CardFileUpload  # noqa: E402
+from api.model.list import BoardList  # noqa: E402
+from api.model.user import Role, User  # noqa: E402
+
+
+def legacy_refresh_hook(response):
+    """Body scan of the previous refresh hook.
+
+    Like the old hook, it's inside the try block, so on direct passthrough
+    responses (send_file) get_data raises and the token isn't refreshed.
+    """
+    try:
+        if "Token revoked" in str(response.get_data()) or \
+                "Token expired" in str(response.get_data()):
+            return response
+    except RuntimeError:
+        return response
+    return response
+
+
+def setup(app, cards: int, file_mb: int) -> dict:
+    with app.app_context():
+        db.create_all()
+        usr = User.create(
+            username="bench", password="bench", email="bench@localhost.com",
+            roles=[Role.find_or_create("user")]
+        )
+        db.session.add(usr)
+        db.session.commit()
+
+        board = Board(owner_id=usr.id, title="Benchmark")
+        db.session.add(board)
+        db.session.flush()
+        board_list = BoardList(board_id=board.id, title="List")
+        db.session.add(board_list)
+        db.session.flush()
+        db.session.add_all([
+            Card(board_id=board.id, list_id=board_list.id, archived=True,
+                 title=f"Card {j} " + "x" * 200)
+            for j in range(0, cards)
+        ])
+        db.session.flush()
+        card = Card.query.filter(Card.board_id == board.id).first()
+
+        upload = CardFileUpload(
+            board_id=board.id, card_id=card.id, file_name="bench.bin")
+        db.session.add(upload)
+        db.session.commit()
+
+        upload_dir = os.path.join(
+            app.config["USER_UPLOAD_DIR"], str(board.id), str(card.id))
+        os.makedirs(upload_dir, exist_ok=True)
+        with open(os.path.join(upload_dir, "bench.bin"), "wb") as f:
+            for _ in range(0, file_mb):
+                f.write(os.urandom(1024 * 1024))
+        return {"board_id": board.id, "upload_id": upload.id}
+
+
+def measure(app, url: str, headers: dict, runs: int):
+    client = app.test_client()
+    peaks, times, size = [], [], 0
+    for _ in range(0, runs):
+        tracemalloc.start()
+        start = time.perf_counter()
+        resp = client.get(url, headers=headers, buffered=False)
+        size = 0
+        for chunk in resp.response:
+            size += len(chunk)
+        resp.close()
+        times.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert resp.status_code == 200, resp.status_code
+    return size, sorted(peaks)[len(peaks) // 2], sorted(times)[len(times) // 2]
+
+
+def measure_hook(app, hook, runs: int, size_mb: int = 50):
+    chunk = b"x" * (64 * 1024)
+    chunks = size_mb * 16
+    peaks, times = [], []
+    for _ in range(0, runs):
+        with app.test_request_context():
+            response = Response(chunk for _ in range(0, chunks))
+            tracemalloc.start()
+            start = time.perf_counter()
+            response = hook(response)
+            for _ in response.response:
+                pass
+            times.append(time.perf_counter() - start)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return len(chunk) * chunks, sorted(peaks)[len(peaks) // 2], \
+        sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=5000)
+    parser.add_argument("--file-mb", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as upload_dir:
+        for name in ("legacy", "current"):
+            app = create_app()
+            app.config.update({
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+                "JWT_TOKEN_LOCATION": ["headers"],
+                "USER_UPLOAD_DIR": os.path.join(upload_dir, name),
+            })
+            if name == "legacy":
+                app.after_request(legacy_refresh_hook)
+
+            ids = setup(app, args.cards, args.file_mb)
+            tokens = app.test_client().post(
+                "/api/v1/auth/login", json={"username": "bench", "password": "bench"}
+            ).json
+            headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+            results[("stream", name)] = measure(
+                app, f"/api/v1/board/{ids['board_id']}/archived-cards",
+                headers, args.runs)
+            results[("download", name)] = measure(
+                app, f"/api/v1/card-upload/{ids['upload_id']}",
+                headers, args.runs)
+            results[("hook", name)] = measure_hook(
+                app,
+                legacy_refresh_hook if name == "legacy"
+                else app.after_request_funcs[None][0],
+                args.runs
+            )
+
+    print(f"{'response':<10}{'hook':<10}{'body':>12}{'peak memory':>16}{'time':>12}")
+    for (scenario, name), (size, peak, elapsed) in results.items():
+        print(f"{scenario:<10}{name:<10}{size / 1024:>10.0f}KB"
+              f"{peak / 1024:>14.0f}KB{elapsed * 1000:>10.1f}ms")
+    for scenario in ("stream", "download", "hook"):
+        drop = results[(scenario, "legacy")][1] - results[(scenario, "current")][1]
+        print(f"Peak memory drop, {scenario}: {drop / 1024:.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
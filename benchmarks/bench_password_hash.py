@@ -0,0 +1,88 @@
+"""Event loop latency of a gevent worker during a login storm.
+
+A probe greenlet sleeps 10 ms in a loop, like a socket handler waiting
+for messages; its oversleep is the delay every socket connection sees.
+Meanwhile logins check passwords (PBKDF2) inline or in the native thread
+pool of PasswordHasher:
+
+    python benchmarks/bench_password_hash.py --logins 50 --pool-size 2
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+from flask import Flask  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from api.util.password import PasswordHasher  # noqa: E402
+
+PROBE_INTERVAL = 0.01
+
+
+def run(pool_size: int, logins: int, concurrency: int):
+    app = Flask(__name__)
+    app.config["PASSWORD_HASH_POOL_SIZE"] = pool_size
+    hasher = PasswordHasher(app)
+    pwhash = generate_password_hash("password")
+
+    delays = []
+    done = False
+
+    def probe():
+        while not done:
+            start = time.perf_counter()
+            gevent.sleep(PROBE_INTERVAL)
+            delays.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+    def login_worker(count: int):
+        for _ in range(0, count):
+            assert hasher.check(pwhash, "password")
+
+    prober = gevent.spawn(probe)
+    gevent.sleep(PROBE_INTERVAL * 5)
+    start = time.perf_counter()
+    gevent.joinall([
+        gevent.spawn(login_worker, logins // concurrency)
+        for _ in range(0, concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    done = True
+    prober.join()
+
+    delays.sort()
+    return {
+        "logins/s": logins / elapsed,
+        "p50 ms": delays[len(delays) // 2] * 1000,
+        "p99 ms": delays[int(len(delays) * 0.99)] * 1000,
+        "max ms": delays[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+
+    results = {
+        "inline": run(0, args.logins, args.concurrency),
+        f"pool({args.pool_size})": run(
+            args.pool_size, args.logins, args.concurrency),
+    }
+    columns = list(next(iter(results.values())))
+    print(f"{'hashing':<10}" + "".join(f"{c:>12}" for c in columns))
+    for name, result in results.items():
+        print(f"{name:<10}" + "".join(f"{result[c]:>12.1f}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
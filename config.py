@@ -68,6 +68,74 @@ class Config:
 
     REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
     REDIS_PORT = os.environ.get("REDIS_PORT", 6379)
+
+    # Board snapshot cache
+    BOARD_CACHE_ENABLED = strtobool(
+        os.environ.get("BOARD_CACHE_ENABLED", "1"))
+    BOARD_CACHE_SIZE = int(os.environ.get("BOARD_CACHE_SIZE", 64))
+    BOARD_CACHE_TTL = int(os.environ.get("BOARD_CACHE_TTL", 3600))
+    # Stores snapshots gzip compressed, 0 disables compression.
+    BOARD_CACHE_COMPRESS_LEVEL = int(
+        os.environ.get("BOARD_CACHE_COMPRESS_LEVEL", 6))
+    # Redis tier shared by workers, leave empty for local cache only.
+    BOARD_CACHE_REDIS_URL = os.environ.get("BOARD_CACHE_REDIS_URL")
+
+    # Board member permissions cached between requests.
+    PERMISSION_CACHE_ENABLED = strtobool(
+        os.environ.get("PERMISSION_CACHE_ENABLED", "1"))
+    PERMISSION_CACHE_SIZE = int(os.environ.get("PERMISSION_CACHE_SIZE", 4096))
+    # Seconds an entry is used at most, bounds staleness of changes made
+    # outside of the services.
+    PERMISSION_CACHE_TTL = int(os.environ.get("PERMISSION_CACHE_TTL", 300))
+    # Shared between workers, e.g. the Celery Redis on another database.
+    # Without it the cache is disabled unless PERMISSION_CACHE_LOCAL is set.
+    PERMISSION_CACHE_REDIS_URL = os.environ.get("PERMISSION_CACHE_REDIS_URL")
+    # Local cache per worker without Redis. Invalidations reach only the
+    # worker making the change, other workers may keep serving a removed
+    # member or an old role for up to PERMISSION_CACHE_TTL seconds.
+    # Safe with a single worker process.
+    PERMISSION_CACHE_LOCAL = strtobool(
+        os.environ.get("PERMISSION_CACHE_LOCAL", "0"))
+
+    # Revoked tokens and user rows for JWT checks, shared between workers.
+    AUTH_CACHE_REDIS_URL = os.environ.get("AUTH_CACHE_REDIS_URL")
+    # Seconds to remember revoked tokens, the longest token lifetime.
+    REVOCATION_TTL = int(os.environ.get("REVOCATION_TTL", 730 * 24 * 3600))
+    # Seconds a cached user row is used, 0 disables.
+    IDENTITY_CACHE_TTL = int(os.environ.get("IDENTITY_CACHE_TTL", 30))
+
+    # Native threads hashing passwords under gevent, 0 hashes inline.
+    PASSWORD_HASH_POOL_SIZE = int(os.environ.get("PASSWORD_HASH_POOL_SIZE", 2))
+
+    # Seconds login history is buffered before written by a background
+    # flush per worker, 0 writes it in the login transaction.
+    LOGIN_HISTORY_FLUSH_INTERVAL = int(
+        os.environ.get("LOGIN_HISTORY_FLUSH_INTERVAL", 0))
+    LOGIN_HISTORY_BUFFER_SIZE = int(
+        os.environ.get("LOGIN_HISTORY_BUFFER_SIZE", 1000))
+
+    # Encode JSON with orjson if installed.
+    ORJSON_ENABLED = strtobool(os.environ.get("ORJSON_ENABLED", "1"))
+    # Dump hot DTOs with compiled field plans instead of marshmallow.
+    FAST_SERIALIZER_ENABLED = strtobool(
+        os.environ.get("FAST_SERIALIZER_ENABLED", "0"))
+
+    # Board change journal, clients behind more changes get a full snapshot.
+    BOARD_CHANGES_MAX = int(os.environ.get("BOARD_CHANGES_MAX", 500))
+    BOARD_CHANGES_RETENTION_DAYS = int(
+        os.environ.get("BOARD_CHANGES_RETENTION_DAYS", 7))
+    # Cards per list in board payloads, 0 loads every card.
+    BOARD_LIST_CARD_WINDOW = int(
+        os.environ.get("BOARD_LIST_CARD_WINDOW", 100))
+    # Ranks longer than this trigger a rebalance of their list/board/checklist.
+    RANK_REBALANCE_LENGTH = int(os.environ.get("RANK_REBALANCE_LENGTH", 12))
+    # Expired token rows deleted per batch by the prune task/CLI.
+    TOKEN_PRUNE_BATCH_SIZE = int(os.environ.get("TOKEN_PRUNE_BATCH_SIZE", 1000))
+    # Batches per task run, 0 runs until no expired token left.
+    TOKEN_PRUNE_MAX_BATCHES = int(
+        os.environ.get("TOKEN_PRUNE_MAX_BATCHES", 100))
+    # Seconds between prune task runs (celery beat).
+    TOKEN_PRUNE_INTERVAL = int(os.environ.get("TOKEN_PRUNE_INTERVAL", 3600))
     CELERY_CONFIG = {
         "broker_url": f"redis://{REDIS_HOST}:{REDIS_PORT}/0",
         "result_backend": f"redis://{REDIS_HOST}:{REDIS_PORT}/0",
@@ -78,6 +146,14 @@ class Config:
         "accept_content": ["json"],
         "result_expires": timedelta(days=365),
         "include": [
-            "api.task_queue.sendmail"
-        ]
+            "api.task_queue.sendmail",
+            "api.task_queue.token",
+            "api.task_queue.rank"
+        ],
+        "beat_schedule": {
+            "prune-expired-tokens": {
+                "task": "api.task_queue.token.prune_expired_tokens",
+                "schedule": timedelta(seconds=TOKEN_PRUNE_INTERVAL),
+            }
+        }
     }
@@ -1,10 +1,14 @@
 import typing
+from datetime import datetime
+
 import pytest
 
 import sqlalchemy as sqla
 
 from api.app import create_app, db
 from api.model.board import Board, BoardRole
+from api.model.card import Card, CardDate, CardMember
+from api.model.checklist import CardChecklist, ChecklistItem
 from api.model.list import BoardList
 from api.model.user import Role, User
 
@@ -176,3 +180,57 @@ def test_cards(app, test_boardlists):
             db.session.add_all([factory.create_card(list.board.owner, list)
                                 for _ in range(0, 5)])
             db.session.commit()
+
+
+def create_board_graph(owner: User, list_count: int, card_count: int) -> int:
+    """Creates a board with lists, every list has cards with
+    a checklist (2 items), a member assignment and a date.
+
+    Returns:
+        int: Created board id
+    """
+    board = Board(owner_id=owner.id, title=f"Graph {list_count}x{card_count}")
+    db.session.add(board)
+    db.session.flush()
+    owner_member = board.board_users[0]
+    for i in range(0, list_count):
+        board_list = BoardList(title=f"List {i}", position=i)
+        board.lists.append(board_list)
+        db.session.flush()
+        for j in range(0, card_count):
+            card = Card(
+                title=f"Card {i}-{j}",
+                position=j,
+                board_id=board.id,
+                list_id=board_list.id,
+                member_count=1,
+                checklist_total=2,
+                checklist_completed=1
+            )
+            checklist = CardChecklist(title="Checklist", board_id=board.id)
+            checklist.items.append(ChecklistItem(
+                title="Item 1", board_id=board.id, completed=True))
+            checklist.items.append(ChecklistItem(
+                title="Item 2", board_id=board.id))
+            card.checklists.append(checklist)
+            card.assigned_members.append(
+                CardMember(board_user_id=owner_member.id))
+            card.dates.append(CardDate(
+                board_id=board.id, dt_to=datetime(2023, 1, 1)))
+            db.session.add(card)
+    db.session.commit()
+    return board.id
+
+
+@pytest.fixture()
+def test_board_graphs(app, test_users):
+    """Creates two boards owned by usr1 with different sizes:
+    small: 2 lists with 2 cards each,
+    large: 6 lists with 10 cards each
+    """
+    with app.app_context():
+        usr1 = User.find_user("usr1")
+        return {
+            "small": create_board_graph(usr1, 2, 2),
+            "large": create_board_graph(usr1, 6, 10),
+        }
@@ -277,3 +277,150 @@ def test_delete_user(client, app, test_users):
         assert resp_valid_admin.status_code == 200
         usr = User.query.get(2)
         assert usr is None
+
+
+def test_cached_identity(client, app, test_users):
+    """User lookup is cached and revoked tokens are rejected."""
+    import sqlalchemy as sqla
+    from api.app import db, identity_cache
+
+    tokens = do_login(client, "usr1", "usr1")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    with app.app_context():
+        client.get("/api/v1/auth/users/me", headers=headers)
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sqla.event.listen(db.engine, "before_cursor_execute",
+                          before_cursor_execute)
+        try:
+            resp = client.get("/api/v1/auth/users/me", headers=headers)
+        finally:
+            sqla.event.remove(db.engine, "before_cursor_execute",
+                              before_cursor_execute)
+        assert resp.status_code == 200
+        assert resp.json["roles"] == ["user"]
+        # Only the revocation check, no Redis configured.
+        assert not any('FROM "user"' in s or "FROM user" in s
+                       for s in statements)
+        assert identity_cache.stats()["hits"] >= 1
+
+        # Changed user invalidated on commit
+        usr = User.find_user("usr1")
+        usr.name = "Changed Name"
+        db.session.commit()
+        resp = client.get("/api/v1/auth/users/me", headers=headers)
+        assert resp.json["name"] == "Changed Name"
+
+    resp = client.post("/api/v1/auth/logout", headers=headers)
+    assert resp.status_code == 200
+    resp = client.get("/api/v1/auth/users/me", headers=headers)
+    assert resp.status_code == 401
+
+
+def test_prune_expired_tokens(client, app, test_users):
+    """Expired tokens are deleted in batches, live tokens are kept."""
+    from datetime import datetime, timedelta
+    from api.app import db
+    from api.model.user import Token
+
+    do_login(client, "usr1", "usr1")
+    with app.app_context():
+        live = Token.query.count()
+        assert live >= 2
+        assert Token.query.filter(Token.expires_at == None).count() == 0
+
+        usr = User.find_user("usr1")
+        db.session.add_all([
+            Token(user_id=usr.id, jti=f"expired-{i}", type="access",
+                  created_at=datetime.now() - timedelta(days=2),
+                  expires_at=datetime.now() - timedelta(days=1))
+            for i in range(0, 5)
+        ] + [
+            # Stored before expiry was recorded
+            Token(user_id=usr.id, jti="legacy", type="refresh",
+                  created_at=datetime.now() - timedelta(
+                      seconds=app.config["REVOCATION_TTL"] + 1))
+        ])
+        db.session.commit()
+
+        assert Token.prune_expired(batch_size=2, max_batches=1) == 2
+        assert Token.prune_expired(batch_size=2) == 4
+        assert Token.query.count() == live
+
+
+def test_password_hasher_pool(app, monkeypatch):
+    """Passwords hashed in the native thread pool under gevent."""
+    import api.util.password as password
+    from api.app import password_hasher
+
+    monkeypatch.setattr(password, "_gevent_patched", lambda: True)
+    pwhash = password_hasher.hash("secret")
+    assert password_hasher._pool is not None
+    assert password_hasher.check(pwhash, "secret")
+    assert not password_hasher.check(pwhash, "other")
+
+
+def test_login_history(client, app, test_users):
+    """Login history written with the login or buffered."""
+    from api.app import db
+    from api.util.login_history import login_history
+
+    do_login(client, "usr1", "usr1")
+    with app.app_context():
+        usr = User.find_user("usr1")
+        first_login = usr.current_login_at
+        assert first_login is not None
+        assert usr.current_login_ip is not None
+
+    do_login(client, "usr1", "usr1")
+    with app.app_context():
+        usr = User.find_user("usr1")
+        assert usr.last_login_at == first_login
+        assert usr.current_login_at > first_login
+
+    login_history.interval = 3600
+    try:
+        do_login(client, "usr1", "usr1")
+        do_login(client, "usr1", "usr1")
+        with app.app_context():
+            usr = User.find_user("usr1")
+            assert usr.last_login_at == first_login
+
+            assert login_history.flush() == 1
+            db.session.expire_all()
+            usr = User.find_user("usr1")
+            assert usr.last_login_at > first_login
+            assert usr.current_login_at > usr.last_login_at
+    finally:
+        login_history.interval = 0
+        login_history.stop_flusher()
+
+
+def test_login_history_flushed_in_background(client, app, test_users):
+    """Buffered logins are written without a further login."""
+    import time
+    from api.app import db
+    from api.util.login_history import login_history
+
+    login_history.interval = 0.2
+    try:
+        # Not due at login
+        login_history._flushed_at = time.monotonic()
+        do_login(client, "usr1", "usr1")
+        with app.app_context():
+            assert User.find_user("usr1").current_login_at is None
+        deadline = time.monotonic() + 5
+        with app.app_context():
+            while True:
+                db.session.expire_all()
+                if User.find_user("usr1").current_login_at is not None:
+                    break
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+    finally:
+        login_history.interval = 0
+        login_history.stop_flusher()
@@ -1,4 +1,6 @@
+import pytest
 import sqlalchemy as sqla
+from werkzeug.exceptions import Forbidden
 
 from api.model.board import Board, BoardRole
 from api.model.user import User
@@ -344,3 +346,430 @@ def test_add_member(app, client, test_users, test_boards):
         assert resp_valid.status_code == 200
         assert resp_valid.json["user_id"] == test_data_board1["user_id"]
         assert resp_valid.json["board_role_id"] == test_data_board1["board_role_id"]
+
+
+def test_get_board_query_count(app, client, test_users, test_board_graphs):
+    """Loading and serializing a board needs the same query count
+    regardless of list and card count."""
+    from api.app import db
+    from api.service.snapshot import snapshot_loader
+    from api.util.dto import BoardDTO
+
+    def count_queries(board_id: int) -> int:
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        board = Board.query.get(board_id)
+        db.session.expire_all()
+        sqla.event.listen(db.engine, "before_cursor_execute",
+                          before_cursor_execute)
+        try:
+            data = BoardDTO.board_schema.dump(snapshot_loader.load(board))
+        finally:
+            sqla.event.remove(db.engine, "before_cursor_execute",
+                              before_cursor_execute)
+        assert len(data["lists"]) > 0
+        return len(statements)
+
+    with app.app_context():
+        assert count_queries(test_board_graphs["small"]) == \
+            count_queries(test_board_graphs["large"])
+
+        tokens = do_login(client, "usr1", "usr1")
+        resp = client.get(
+            f"/api/v1/board/{test_board_graphs['large']}",
+            headers={"Authorization": f"Bearer {tokens['access_token']}"}
+        )
+        assert resp.status_code == 200
+        assert len(resp.json["lists"]) == 6
+        for board_list in resp.json["lists"]:
+            assert len(board_list["cards"]) == 10
+            for card in board_list["cards"]:
+                assert len(card["assigned_members"]) == 1
+                assert len(card["dates"]) == 1
+                # Checklist progress aggregated, items not shipped.
+                assert card["checklist_total"] == 2
+                assert card["checklist_completed"] == 1
+                assert "checklists" not in card
+
+
+def test_get_board_cached(app, client, test_users, test_board_graphs):
+    from api.app import board_cache, db
+    from api.model.card import Card
+
+    with app.app_context():
+        tokens = do_login(client, "usr1", "usr1")
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        board_id = test_board_graphs["small"]
+
+        resp = client.get(f"/api/v1/board/{board_id}", headers=headers)
+        assert resp.status_code == 200
+        revision = Board.query.get(board_id).revision
+        assert board_cache.get(board_id, revision) is not None
+
+        # Cache hit returns same payload
+        resp_cached = client.get(f"/api/v1/board/{board_id}", headers=headers)
+        assert resp_cached.json == resp.json
+
+        # Changing a card bumps the revision.
+        card = Card.query.filter(Card.board_id == board_id).first()
+        card.title = "Changed title"
+        db.session.commit()
+        assert Board.query.get(board_id).revision == revision + 1
+
+        resp_changed = client.get(
+            f"/api/v1/board/{board_id}", headers=headers)
+        titles = [
+            c["title"] for li in resp_changed.json["lists"] for c in li["cards"]
+        ]
+        assert "Changed title" in titles
+
+
+def test_get_board_not_modified(app, client, test_users, test_board_graphs):
+    from api.app import db
+    from api.model.card import Card
+
+    with app.app_context():
+        tokens = do_login(client, "usr1", "usr1")
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        board_id = test_board_graphs["small"]
+
+        for url in (f"/api/v1/board/{board_id}", f"/api/v1/board/{board_id}/list"):
+            resp = client.get(url, headers=headers)
+            assert resp.status_code == 200
+            etag = resp.headers["ETag"]
+
+            resp_unchanged = client.get(
+                url, headers={**headers, "If-None-Match": etag})
+            assert resp_unchanged.status_code == 304
+            assert resp_unchanged.data == b""
+
+        # Other users can't probe the revision.
+        tokens_usr2 = do_login(client, "usr2", "usr2")
+        resp_forbidden = client.get(
+            f"/api/v1/board/{board_id}",
+            headers={
+                "Authorization": f"Bearer {tokens_usr2['access_token']}",
+                "If-None-Match": etag
+            }
+        )
+        assert resp_forbidden.status_code == 403
+
+        card = Card.query.filter(Card.board_id == board_id).first()
+        card.title = "Changed title"
+        db.session.commit()
+
+        resp_changed = client.get(
+            f"/api/v1/board/{board_id}",
+            headers={**headers, "If-None-Match": etag}
+        )
+        assert resp_changed.status_code == 200
+        assert resp_changed.headers["ETag"] != etag
+
+
+def test_get_board_changes(app, client, test_users, test_board_graphs):
+    from api.app import db
+    from api.model.card import Card
+    from api.util.revision import mark_board_changed
+
+    with app.app_context():
+        tokens = do_login(client, "usr1", "usr1")
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        board_id = test_board_graphs["small"]
+
+        revision = client.get(
+            f"/api/v1/board/{board_id}", headers=headers).json["revision"]
+
+        resp = client.get(
+            f"/api/v1/board/{board_id}/changes?since={revision}", headers=headers)
+        assert resp.status_code == 200
+        assert resp.json["changes"] == []
+
+        card = Card.query.filter(Card.board_id == board_id).first()
+        card.title = "Changed title"
+        db.session.commit()
+
+        lists = client.get(
+            f"/api/v1/board/{board_id}/list", headers=headers).json
+        card_ids = [c["id"] for c in lists[0]["cards"]]
+        resp_order = client.patch(
+            f"/api/v1/list/{lists[0]['id']}/cards-order",
+            headers=headers, json=list(reversed(card_ids))
+        )
+        assert resp_order.status_code == 200
+
+        resp = client.get(
+            f"/api/v1/board/{board_id}/changes?since={revision}", headers=headers)
+        assert resp.json["revision"] == revision + 2
+        assert resp.json["snapshot"] is None
+        changes = resp.json["changes"]
+        assert changes[0] == {
+            "revision": revision + 1, "entity_type": "card",
+            "entity_id": card.id, "operation": "update",
+            "payload": {"title": "Changed title"}
+        }
+        # Reversing keeps the rank of one card.
+        assert len(changes) == len(card_ids)
+        ranks = {c["id"]: c["rank"] for c in lists[0]["cards"]}
+        ranks.update({
+            change["entity_id"]: change["payload"]["rank"]
+            for change in changes[1:]
+        })
+        assert sorted(ranks, key=ranks.get) == list(reversed(card_ids))
+
+        # Unknown revision falls back to snapshot
+        resp = client.get(
+            f"/api/v1/board/{board_id}/changes?since={revision + 10}", headers=headers)
+        assert resp.json["changes"] is None
+        assert len(resp.json["snapshot"]["lists"]) == 2
+
+        # Revision without journal entries in the middle
+        mark_board_changed(board_id)
+        db.session.commit()
+        card.title = "Changed again"
+        db.session.commit()
+        resp = client.get(
+            f"/api/v1/board/{board_id}/changes?since={revision}", headers=headers)
+        assert resp.json["revision"] == revision + 4
+        assert resp.json["changes"] is None
+
+        app.config["BOARD_CHANGES_MAX"] = 1
+        resp = client.get(
+            f"/api/v1/board/{board_id}/changes?since={revision}", headers=headers)
+        assert resp.json["changes"] is None
+
+
+def test_get_board_fieldset(app, client, test_users, test_board_graphs):
+    with app.app_context():
+        tokens = do_login(client, "usr1", "usr1")
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        board_id = test_board_graphs["small"]
+
+        resp_full = client.get(f"/api/v1/board/{board_id}", headers=headers)
+
+        url = f"/api/v1/board/{board_id}?fields=id,title,lists.id,lists.cards.id"
+        resp = client.get(url, headers=headers)
+        assert resp.status_code == 200
+        assert set(resp.json.keys()) == {"id", "title", "lists"}
+        assert set(resp.json["lists"][0].keys()) == {"id", "cards"}
+        assert resp.json["lists"][0]["cards"][0] == {
+            "id": resp_full.json["lists"][0]["cards"][0]["id"]
+        }
+        # Sparse representation has its own ETag
+        assert resp.headers["ETag"] != resp_full.headers["ETag"]
+        assert client.get(url, headers={
+            **headers, "If-None-Match": resp.headers["ETag"]
+        }).status_code == 304
+
+        resp_lists = client.get(
+            f"/api/v1/board/{board_id}/list?fields=id,title", headers=headers)
+        assert resp_lists.json[0].keys() == {"id", "title"}
+
+        resp_invalid = client.get(
+            f"/api/v1/board/{board_id}?fields=id,unknown", headers=headers)
+        assert resp_invalid.status_code == 400
+
+
+def test_get_board_card_window(app, client, test_users, test_board_graphs):
+    with app.app_context():
+        tokens = do_login(client, "usr1", "usr1")
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        app.config["BOARD_LIST_CARD_WINDOW"] = 4
+
+        resp = client.get(
+            f"/api/v1/board/{test_board_graphs['large']}", headers=headers)
+        assert resp.status_code == 200
+        board_list = resp.json["lists"][0]
+        assert board_list["card_count"] == 10
+        assert [c["position"] for c in board_list["cards"]] == [0, 1, 2, 3]
+
+        # Page the rest of the list by rank.
+        cards = board_list["cards"]
+        while True:
+            resp_page = client.get(
+                f"/api/v1/list/{board_list['id']}/cards?limit=4"
+                f"&after_rank={cards[-1]['rank']}&after_id={cards[-1]['id']}",
+                headers=headers
+            )
+            assert resp_page.status_code == 200
+            cards += resp_page.json["data"]
+            if not resp_page.json["has_more"]:
+                break
+        assert [c["position"] for c in cards] == list(range(0, 10))
+
+        resp_sparse = client.get(
+            f"/api/v1/list/{board_list['id']}/cards?fields=id", headers=headers)
+        assert resp_sparse.json["data"][0].keys() == {"id"}
+
+
+def test_permission_resolver(app, test_users, test_board_graphs):
+    """Member and role permissions are queried once per request."""
+    from api.app import db
+    from api.model import BoardPermission
+    from api.util.permission import permission_resolver
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    board_id = test_board_graphs["small"]
+    with app.test_request_context():
+        user = User.find_user("usr1")
+        usr2 = User.find_user("usr2")
+        sqla.event.listen(db.engine, "before_cursor_execute",
+                          before_cursor_execute)
+        try:
+            for _ in range(0, 3):
+                member = permission_resolver.get_member_or_403(
+                    str(board_id), user.id)
+                assert permission_resolver.has_permission(
+                    member, BoardPermission.CARD_EDIT)
+                assert permission_resolver.has_permission(
+                    member, BoardPermission.LIST_CREATE)
+        finally:
+            sqla.event.remove(db.engine, "before_cursor_execute",
+                              before_cursor_execute)
+        assert len(statements) == 2
+
+        with pytest.raises(Forbidden):
+            permission_resolver.get_member_or_403(board_id, usr2.id)
+
+
+def test_permission_mask(app, test_users, test_board_graphs):
+    from api.model import PERMISSION_BITS, BoardPermission
+
+    # Every permission has its own bit.
+    assert set(PERMISSION_BITS.keys()) == set(BoardPermission)
+    assert len(set(PERMISSION_BITS.values())) == len(PERMISSION_BITS)
+
+    with app.app_context():
+        roles = {
+            role.name: role for role in BoardRole.query.filter(
+                BoardRole.board_id == test_board_graphs["small"])
+        }
+        assert all(roles["Member"].has_permission(p) for p in BoardPermission)
+        assert not any(roles["Observer"].has_permission(p)
+                       for p in BoardPermission)
+
+        roles["Observer"].permission_mask = BoardPermission.CARD_COMMENT.mask
+        assert roles["Observer"].has_permission(BoardPermission.CARD_COMMENT)
+        assert not roles["Observer"].has_permission(BoardPermission.CARD_EDIT)
+
+
+def test_permission_cache(app, test_users, test_board_graphs):
+    """Members are cached between requests and dropped on role change."""
+    from api.app import db, permission_cache
+    from api.model import BoardPermission
+    from api.service.board import member_man_service
+    from api.util.permission import permission_resolver
+
+    board_id = test_board_graphs["small"]
+    # Single worker, no Redis
+    app.config["PERMISSION_CACHE_LOCAL"] = True
+    permission_cache.init_app(app)
+
+    def resolve(user_id: int):
+        with app.test_request_context():
+            member = permission_resolver.get_member_or_403(board_id, user_id)
+            return permission_resolver.has_permission(
+                member, BoardPermission.CARD_EDIT)
+
+    with app.app_context():
+        usr1 = User.find_user("usr1")
+        usr2 = User.find_user("usr2")
+        roles = {
+            role.name: role.id for role in
+            BoardRole.query.filter(BoardRole.board_id == board_id)
+        }
+        with app.test_request_context():
+            member_man_service.add_member(
+                usr1, board_id, usr2.id, roles["Observer"])
+
+        assert not resolve(usr2.id)
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sqla.event.listen(db.engine, "before_cursor_execute",
+                          before_cursor_execute)
+        try:
+            assert not resolve(usr2.id)
+        finally:
+            sqla.event.remove(db.engine, "before_cursor_execute",
+                              before_cursor_execute)
+        assert statements == []
+        assert permission_cache.stats()["hits"] >= 1
+
+        with app.test_request_context():
+            member_man_service.update_member_role(
+                usr1, board_id, usr2.id, roles["Member"])
+        assert resolve(usr2.id)
+
+        with app.test_request_context():
+            member_man_service.remove_member(board_id, usr1, usr2.id)
+        with pytest.raises(Forbidden):
+            resolve(usr2.id)
+
+
+def test_permission_cache_versions(app):
+    """Entries read before an invalidation are not stored after it."""
+    from api.app import permission_cache
+
+    app.config["PERMISSION_CACHE_LOCAL"] = True
+    permission_cache.init_app(app)
+    entry = {"member": {"id": 1}, "permission_mask": 1}
+
+    _, version = permission_cache.lookup(1, 2)
+    permission_cache.invalidate(1, 3)
+    permission_cache.set(1, 2, entry, version)
+    assert permission_cache.lookup(1, 2)[0] is None
+
+    _, version = permission_cache.lookup(1, 2)
+    permission_cache.set(1, 2, entry, version)
+    assert permission_cache.lookup(1, 2)[0] == entry
+    permission_cache.clear()
+    assert permission_cache.lookup(1, 2)[0] is None
+
+    # Without Redis the cache is off unless allowed.
+    app.config["PERMISSION_CACHE_LOCAL"] = False
+    permission_cache.init_app(app)
+    _, version = permission_cache.lookup(1, 2)
+    permission_cache.set(1, 2, entry, version)
+    assert permission_cache.lookup(1, 2)[0] is None
+
+
+def test_check_permission_integrity(app, test_users, test_board_graphs, monkeypatch):
+    import api.model.board as board_model
+    from api.app import db, permission_cache
+    from api.model import BoardPermission
+    from api.model.board import check_permission_integrity
+
+    with app.app_context():
+        # First run records the permission set, next runs skip.
+        check_permission_integrity()
+        assert not check_permission_integrity()
+
+        # Simulate a new permission on bit 20 and a removed one on bit 30.
+        new_bit, removed_bit = 1 << 20, 1 << 30
+        BoardRole.query.update(
+            {BoardRole.permission_mask: BoardRole.permission_mask + removed_bit})
+        db.session.commit()
+        monkeypatch.setattr(board_model, "ALL_PERMISSIONS_MASK",
+                            board_model.ALL_PERMISSIONS_MASK | new_bit)
+        monkeypatch.setattr(board_model, "permission_fingerprint",
+                            lambda: "changed")
+        invalidations = permission_cache.stats()["invalidations"]
+        assert check_permission_integrity()
+        assert permission_cache.stats()["invalidations"] == invalidations + 1
+
+        for role in BoardRole.query.all():
+            assert not role.permission_mask & removed_bit
+            assert bool(role.permission_mask & new_bit) == \
+                (role.name != "Observer")
+            assert role.has_permission(BoardPermission.CARD_EDIT) == \
+                (role.name != "Observer")
+        assert not check_permission_integrity()
@@ -255,3 +255,102 @@ def test_post_card_comment(app, client, test_cards):
         assert resp_valid.json["card_id"] == board3.lists[0].cards[0].id
         assert resp_valid.json["comment"]["comment"] == test_data["comment"]
         assert resp_valid.json["comment"]["user_id"] == usr2.id
+
+
+def test_card_counters(app, client, test_board_graphs):
+    from api.app import db
+    from api.model.card import Card
+    from api.service.card import card_service
+
+    with app.app_context():
+        tokens = do_login(client, "usr1", "usr1")
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        card = Card.query.filter(
+            Card.board_id == test_board_graphs["small"]).first()
+
+        resp = client.post(
+            f"/api/v1/card/{card.id}/comment",
+            headers=headers, json={"comment": "Test comment"}
+        )
+        assert resp.status_code == 200
+        db.session.refresh(card)
+        assert card.comment_count == 1
+
+        checklist = card.checklists[0]
+        resp = client.patch(
+            f"/api/v1/checklist/item/{checklist.items[1].id}",
+            headers=headers, json={"completed": True}
+        )
+        assert resp.status_code == 200
+        db.session.refresh(card)
+        assert (card.checklist_total, card.checklist_completed) == (2, 2)
+
+        resp = client.delete(
+            f"/api/v1/checklist/{checklist.id}", headers=headers)
+        assert resp.status_code == 200
+        db.session.refresh(card)
+        assert (card.checklist_total, card.checklist_completed) == (0, 0)
+
+        # Repair broken counters
+        card.comment_count = 10
+        card.member_count = 0
+        db.session.commit()
+        revision = client.get(f"/api/v1/board/{test_board_graphs['small']}",
+                              headers=headers).json["revision"]
+        assert card_service.recount_counters(test_board_graphs["small"]) == 1
+        db.session.refresh(card)
+        assert card.comment_count == 1
+        assert card.member_count == 1
+        # Delta clients reload the board, correct cards are left alone.
+        resp = client.get(
+            f"/api/v1/board/{test_board_graphs['small']}/changes?since={revision}",
+            headers=headers)
+        assert resp.json["changes"] is None
+        assert card_service.recount_counters(test_board_graphs["small"]) == 0
+
+
+def test_move_card(app, client, test_board_graphs):
+    from api.app import db
+    from api.model.card import Card
+
+    with app.app_context():
+        tokens = do_login(client, "usr1", "usr1")
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        source, target = BoardList.query.filter(
+            BoardList.board_id == test_board_graphs["small"]
+        ).order_by(BoardList.rank).all()[:2]
+
+        def card_ids(board_list):
+            return [card.id for card in Card.query.filter(
+                Card.list_id == board_list.id).order_by(Card.rank)]
+
+        moved, other = card_ids(source)
+        first, last = card_ids(target)
+
+        resp = client.post(f"/api/v1/card/{moved}/move", headers=headers,
+                           json={"list_id": target.id, "before_id": last})
+        assert resp.status_code == 200
+        assert resp.json["list_id"] == target.id
+        assert card_ids(target) == [first, moved, last]
+
+        resp = client.post(f"/api/v1/card/{moved}/move", headers=headers,
+                           json={"list_id": target.id, "after_id": last})
+        assert resp.status_code == 200
+        assert card_ids(target) == [first, last, moved]
+
+        resp = client.post(f"/api/v1/card/{moved}/move", headers=headers,
+                           json={"list_id": target.id, "before_id": other})
+        assert resp.status_code == 400
+
+        # WIP limit
+        source.wip_limit = 1
+        db.session.commit()
+        resp = client.post(f"/api/v1/card/{first}/move", headers=headers,
+                           json={"list_id": source.id})
+        assert resp.status_code == 400
+        source.wip_limit = 2
+        db.session.commit()
+        resp = client.post(f"/api/v1/card/{first}/move", headers=headers,
+                           json={"list_id": source.id})
+        assert resp.status_code == 200
+        assert card_ids(source) == [other, first]
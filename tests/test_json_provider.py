@@ -0,0 +1,42 @@
+import gzip
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+from api.util.json_provider import OrjsonProvider
+from .conftest import do_login
+
+
+def test_orjson_provider(app):
+    data = {
+        "b": [1, 2.5, None, True, "ő"],
+        "a": {"date": datetime(2023, 1, 2, 3, 4, 5), "decimal": Decimal("1.5")},
+        "big": 2 ** 70,
+    }
+    assert isinstance(app.json, OrjsonProvider)
+    assert app.json.loads(app.json.dumps(data)) == \
+        json.loads(DefaultJSONProvider(app).dumps(data))
+
+
+def test_stream_json_array(app, client, test_users, test_board_graphs):
+    with app.app_context():
+        tokens = do_login(client, "usr1", "usr1")
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+        resp = client.get("/api/v1/board", headers=headers)
+        assert resp.status_code == 200
+        assert resp.is_streamed
+        assert {board["id"] for board in resp.json} == \
+            set(test_board_graphs.values())
+
+        resp_gzip = client.get(
+            "/api/v1/board", headers={**headers, "Accept-Encoding": "gzip"})
+        assert resp_gzip.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(resp_gzip.data)) == resp.json
+
+        resp_users = client.get("/api/v1/auth/users", headers=headers)
+        assert resp_users.status_code == 200
+        assert [usr["username"] for usr in resp_users.json] == \
+            ["admin", "usr1", "usr2"]
@@ -98,3 +98,65 @@ def test_delete_boardlist(app, client, test_users, test_boardlists):
         )
         assert resp.status_code == 200
         assert BoardList.query.get(1) is None
+
+
+def test_list_card_count(app, client, test_board_graphs):
+    from api.app import db
+    from api.model.card import Card
+    from api.service.list import list_service
+
+    with app.app_context():
+        tokens = do_login(client, "usr1", "usr1")
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        source, target = BoardList.query.filter(
+            BoardList.board_id == test_board_graphs["small"]
+        ).order_by(BoardList.rank).all()[:2]
+        assert (source.card_count, target.card_count) == (2, 2)
+
+        def counts():
+            db.session.refresh(source)
+            db.session.refresh(target)
+            return source.card_count, target.card_count
+
+        resp = client.post(f"/api/v1/list/{source.id}/card",
+                           headers=headers, json={"title": "New card"})
+        assert resp.status_code == 200
+        card_id = resp.json["id"]
+        assert counts() == (3, 2)
+
+        resp = client.post(f"/api/v1/card/{card_id}/move",
+                           headers=headers, json={"list_id": target.id})
+        assert resp.status_code == 200
+        assert counts() == (2, 3)
+
+        resp = client.patch(f"/api/v1/card/{card_id}",
+                            headers=headers, json={"archived": True})
+        assert resp.status_code == 200
+        assert counts() == (2, 2)
+
+        resp = client.patch(f"/api/v1/card/{card_id}",
+                            headers=headers, json={"archived": False})
+        assert resp.status_code == 200
+        assert counts() == (2, 3)
+
+        db.session.delete(Card.query.get(card_id))
+        db.session.commit()
+        assert counts() == (2, 2)
+
+        resp = client.get(
+            f"/api/v1/board/{test_board_graphs['small']}/list", headers=headers)
+        assert [li["card_count"] for li in resp.json] == [2, 2]
+
+        # Repair broken counters
+        source.card_count = 10
+        db.session.commit()
+        revision = client.get(f"/api/v1/board/{test_board_graphs['small']}",
+                              headers=headers).json["revision"]
+        assert list_service.recount_cards(test_board_graphs["small"]) == 1
+        assert counts() == (2, 2)
+        # Delta clients reload the board.
+        resp = client.get(
+            f"/api/v1/board/{test_board_graphs['small']}/changes?since={revision}",
+            headers=headers)
+        assert resp.json["changes"] is None
+        assert resp.json["snapshot"] is not None
@@ -0,0 +1,164 @@
+import random
+
+import sqlalchemy as sqla
+
+from .conftest import do_login
+from api.util import rank
+
+
+def test_rank_between():
+    rng = random.Random(42)
+    ranks = [rank.rank_between(None, None)]
+    for _ in range(0, 500):
+        index = rng.randint(0, len(ranks))
+        before = ranks[index - 1] if index > 0 else None
+        after = ranks[index] if index < len(ranks) else None
+        new_rank = rank.rank_between(before, after)
+        assert (before or "") < new_rank
+        assert after is None or new_rank < after
+        assert not new_rank.endswith("0")
+        ranks.insert(index, new_rank)
+    assert ranks == sorted(ranks)
+
+
+def test_rank_after_and_spread():
+    ranks = [rank.rank_after(None)]
+    for _ in range(0, 2000):
+        ranks.append(rank.rank_after(ranks[-1]))
+    assert ranks == sorted(set(ranks))
+    assert max(len(r) for r in ranks) == rank.APPEND_WIDTH
+    assert rank.rank_after("i001i") > "i001i"
+    assert rank.rank_after("zzzz") > "zzzz"
+
+    spread = rank.spread_ranks(1000)
+    assert spread == sorted(set(spread))
+    assert max(len(r) for r in spread) == 2
+
+
+def test_reorder_ranks():
+    ids = list(range(0, 10))
+    ranks = dict(zip(ids, rank.spread_ranks(10)))
+
+    # Moving one element changes one rank.
+    order = ids[:]
+    order.insert(2, order.pop(7))
+    changes = rank.reorder_ranks([(id, ranks[id]) for id in order])
+    assert list(changes) == [7]
+    ranks.update(changes)
+    assert sorted(ids, key=ranks.get) == order
+
+    order = list(reversed(order))
+    changes = rank.reorder_ranks([(id, ranks[id]) for id in order])
+    assert len(changes) == 9
+    ranks.update(changes)
+    assert sorted(ids, key=ranks.get) == order
+
+
+def test_move_card_writes_one_row(app, client, test_board_graphs):
+    from api.app import db
+    from api.model.card import Card
+
+    tokens = do_login(client, "usr1", "usr1")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    with app.app_context():
+        lists = client.get(
+            f"/api/v1/board/{test_board_graphs['large']}/list",
+            headers=headers).json
+        list_id = lists[0]["id"]
+        card_ids = [card["id"] for card in lists[0]["cards"]]
+        card_ids.insert(0, card_ids.pop())
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sqla.event.listen(db.engine, "before_cursor_execute",
+                          before_cursor_execute)
+        try:
+            resp = client.patch(f"/api/v1/list/{list_id}/cards-order",
+                                headers=headers, json=card_ids)
+        finally:
+            sqla.event.remove(db.engine, "before_cursor_execute",
+                              before_cursor_execute)
+        assert resp.status_code == 200
+        assert len([s for s in statements
+                    if s.startswith("UPDATE card SET rank")]) == 1
+
+        assert [card.id for card in Card.query.filter(
+            Card.list_id == list_id
+        ).order_by(Card.rank, Card.id)] == card_ids
+
+
+def test_rebalance(app, test_board_graphs):
+    from api.app import db
+    from api.model.card import Card
+    from api.model.list import BoardList
+
+    with app.app_context():
+        board_list = BoardList.query.filter(
+            BoardList.board_id == test_board_graphs["large"]).first()
+        cards = Card.query.filter(
+            Card.list_id == board_list.id).order_by(Card.rank).all()
+        order = [card.id for card in cards]
+        # Squeeze cards into the first gap
+        before, after = cards[0].rank, cards[1].rank
+        for card in reversed(cards[2:]):
+            card.rank = after = rank.rank_between(before, after)
+        db.session.commit()
+        order = order[:1] + order[2:] + order[1:2]
+
+        assert rank.rebalance(Card, board_list.id) == len(cards)
+        cards = Card.query.filter(
+            Card.list_id == board_list.id).order_by(Card.rank).all()
+        assert [card.id for card in cards] == order
+        assert max(len(card.rank) for card in cards) == 1
+
+
+def test_bulk_reposition(app, test_board_graphs):
+    from api.app import db
+    from api.model.card import Card
+    from api.util.bulk import bulk_reposition
+
+    with app.app_context():
+        cards = Card.query.filter(
+            Card.board_id == test_board_graphs["large"]).all()
+        values = {card.id: f"x{card.id}" for card in cards}
+        assert bulk_reposition(Card, "rank", values, chunk_size=7) == len(cards)
+        db.session.commit()
+        assert {
+            card.id: card.rank for card in
+            Card.query.filter(Card.board_id == test_board_graphs["large"])
+        } == values
+
+
+def test_append_allocates_positions(app, test_board_graphs):
+    from api.app import db
+    from api.model.card import Card
+    from api.model.list import BoardList
+
+    with app.app_context():
+        board_list = BoardList.query.filter(
+            BoardList.board_id == test_board_graphs["large"]).first()
+        last = rank.last_rank(Card, board_list.id)
+        seq = board_list.card_seq
+
+        cards = [
+            Card(board_id=board_list.board_id, list_id=board_list.id,
+                 title=f"Card {index}")
+            for index in range(0, 5)
+        ]
+        db.session.add_all(cards)
+        db.session.flush()
+        db.session.add(Card(board_id=board_list.board_id,
+                            list_id=board_list.id, title="Card 5"))
+        db.session.commit()
+
+        cards = Card.query.filter(
+            Card.list_id == board_list.id, Card.rank > last
+        ).order_by(Card.rank).all()
+        assert [card.title for card in cards] == [
+            f"Card {index}" for index in range(0, 6)]
+        assert [card.position for card in cards] == list(range(seq, seq + 6))
+        db.session.refresh(board_list)
+        assert board_list.card_seq == seq + 6
@@ -0,0 +1,61 @@
+import json
+
+from api.model.board import Board
+from api.model.card import BoardActivity, Card, CardComment
+from api.service.snapshot import snapshot_loader
+from api.util.dto import BoardDTO, CardDTO, ListDTO, SIODTO
+from api.util.serializer import FastSchema
+
+
+def dump_both(app, schema: FastSchema, obj, **kwargs) -> tuple:
+    app.config["FAST_SERIALIZER_ENABLED"] = False
+    expected = json.dumps(schema.dump(obj, **kwargs))
+    app.config["FAST_SERIALIZER_ENABLED"] = True
+    result = json.dumps(schema.dump(obj, **kwargs))
+    return expected, result
+
+
+def test_serializer_parity(app, test_board_graphs):
+    from api.app import db
+
+    with app.app_context():
+        board = snapshot_loader.load(Board.query.get(test_board_graphs["small"]))
+        card: Card = board.lists[0].cards[0]
+        activity = BoardActivity(
+            card_id=card.id,
+            board_id=card.board_id,
+            board_user_id=board.board_users[0].id,
+            event="card.comment",
+            comment=CardComment(
+                board_user_id=board.board_users[0].id,
+                board_id=card.board_id,
+                comment="Comment"
+            )
+        )
+        card.activities.append(activity)
+        db.session.commit()
+
+        board = snapshot_loader.load(Board.query.get(test_board_graphs["small"]))
+        card = board.lists[0].cards[0]
+        cases = [
+            (BoardDTO.board_schema, board, {}),
+            (BoardDTO.boards_schema, [board], {"many": True}),
+            (BoardDTO.archived_cards_schema, board.lists[0].cards, {"many": True}),
+            (BoardDTO.archived_lists_schema, board.lists, {"many": True}),
+            (ListDTO.lists_schema, board.lists, {"many": True}),
+            (ListDTO.update_list_schema, board.lists[0], {}),
+            (CardDTO.card_schema, card, {}),
+            (CardDTO.member_schema, card.assigned_members[0], {}),
+            (CardDTO.activity_schema, BoardActivity.query.get(activity.id), {}),
+            (SIODTO.event_schema, {
+                "list_id": card.list_id, "card_id": card.id,
+                "entity": {"id": 1}
+            }, {}),
+            (SIODTO.delete_checklist_event_schema, {
+                "list_id": card.list_id, "card_id": card.id, "entity_id": 1
+            }, {}),
+        ]
+        for schema, obj, kwargs in cases:
+            assert schema.compile() is not None
+            expected, result = dump_both(app, schema, obj, **kwargs)
+            assert expected == result
@@ -0,0 +1,83 @@
+import sqlalchemy as sqla
+
+from .conftest import do_login
+from api.app import db, socketio
+
+
+def connect(app, client, username: str):
+    tokens = do_login(client, username, username)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    sio_client = socketio.test_client(
+        app, namespace="/board", headers=headers, flask_test_client=client)
+    return sio_client, headers
+
+
+def received_in_room(sio_client, room: str) -> bool:
+    sio_client.get_received("/board")
+    socketio.emit("ping.room", {}, namespace="/board", to=room)
+    return any(
+        msg["name"] == "ping.room" for msg in sio_client.get_received("/board")
+    )
+
+
+def test_board_change_uses_session(app, client, test_board_graphs):
+    """Room switches are checked against boards resolved on connect."""
+    board_id = test_board_graphs["small"]
+    sio_client, _ = connect(app, client, "usr1")
+    assert sio_client.is_connected("/board")
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        sqla.event.listen(db.engine, "before_cursor_execute",
+                          before_cursor_execute)
+        try:
+            sio_client.emit("board_change", {"board_id": board_id},
+                            namespace="/board")
+        finally:
+            sqla.event.remove(db.engine, "before_cursor_execute",
+                              before_cursor_execute)
+    assert statements == []
+    assert received_in_room(sio_client, f"board-{board_id}")
+
+    # Not a member of the board
+    other_client, _ = connect(app, client, "usr2")
+    other_client.emit("board_change", {"board_id": board_id},
+                      namespace="/board")
+    assert not received_in_room(other_client, f"board-{board_id}")
+
+
+def test_revocation_closes_connection(app, client, test_board_graphs):
+    """Logout pushes a session reset and closes the connection."""
+    sio_client, headers = connect(app, client, "usr1")
+    assert sio_client.is_connected("/board")
+
+    resp = client.post("/api/v1/auth/logout", headers=headers)
+    assert resp.status_code == 200
+    assert not sio_client.is_connected("/board")
+
+
+def test_subscribe_to_created_board(app, client, test_board_graphs):
+    """Boards created after connect are checked once and then kept."""
+    sio_client, headers = connect(app, client, "usr1")
+    resp = client.post("/api/v1/board", headers=headers,
+                       json={"title": "Created after connect"})
+    assert resp.status_code == 200
+    board_id = resp.json["id"]
+
+    sio_client.emit("board_change", {"board_id": board_id}, namespace="/board")
+    assert received_in_room(sio_client, f"board-{board_id}")
+
+
+def test_revocation_closes_token_connections(app, client, test_board_graphs):
+    """Logout closes only the connections of the revoked token."""
+    sio_client, headers = connect(app, client, "usr1")
+    other_client, _ = connect(app, client, "usr1")
+
+    resp = client.post("/api/v1/auth/logout", headers=headers)
+    assert resp.status_code == 200
+    assert not sio_client.is_connected("/board")
+    assert other_client.is_connected("/board")